@@ -0,0 +1,77 @@
+# Synthetic command handlers for the benchmarks. Each one stands for a shape of command
+# whose cost we care about: many params, long arrays, long normalizer / validator chains, and uploads.
+from commands.base import *
+from commands.types import *
+from commands.decorators import *
+from commands.normalizers import strip, lowercase
+from commands.validators.strings import not_blank, email
+
+
+class EmptyHandler(CommandHandlerBase):
+	command_name = 'BENCH_EMPTY'
+
+	def handle(self, data):
+		return self.success(None)
+
+
+# builds a handler that takes the given number of integer and string params
+def params_handler(count):
+
+	class ParamsHandler(CommandHandlerBase):
+		command_name = 'BENCH_PARAMS_{0}'.format(count)
+		params = [Param('p{0}'.format(index), Types.INTEGER if index % 2 else Types.STRING) for index in range(count)]
+
+		# reads every param, so the benchmark pays for all of them however lazily they're loaded
+		def handle(self, data):
+			return self.success(len([getattr(data, param.name) for param in self.params]))
+
+	return ParamsHandler
+
+
+# builds a handler that takes a float array, which the benchmarks fill with the given number of entries
+def array_handler(length):
+
+	class ArrayHandler(CommandHandlerBase):
+		command_name = 'BENCH_ARRAY_{0}'.format(length)
+		params = [Param('values', Types.FLOAT_ARRAY)]
+
+		def handle(self, data):
+			return self.success(sum(data.values))
+
+	return ArrayHandler
+
+
+class ChainsHandler(CommandHandlerBase):
+	command_name = 'BENCH_CHAINS'
+	params = [Param('address', Types.STRING), Param('name', Types.STRING)]
+
+	normalize_address_strip = strip('address')
+	normalize_address_lower = lowercase('address', order=1)
+	normalize_name_strip = strip('name')
+
+	validate_address_blank = not_blank('address', 'The address cannot be blank.')
+	validate_address_email = email('address', 'The address must be an email address.', order=1)
+	validate_name_blank = not_blank('name', 'The name cannot be blank.')
+
+	@validator('name', 'The name is too long.', order=1)
+	def validate_name_length(name):
+		return len(name) < 100
+
+	def handle(self, data):
+		return self.success([data.address, data.name])
+
+
+class BlobHandler(CommandHandlerBase):
+	command_name = 'BENCH_BLOB'
+	params = [Param('blob', Types.BLOB)]
+
+	def handle(self, data):
+		return self.success(data.blob.size)
+
+
+PARAM_COUNTS = (1, 10, 50)
+ARRAY_LENGTHS = (10, 1000, 100000)
+BLOB_SIZES = (1024, 1024 * 1024)
+
+PARAMS_HANDLERS = {count: params_handler(count) for count in PARAM_COUNTS}
+ARRAY_HANDLERS = {length: array_handler(length) for length in ARRAY_LENGTHS}
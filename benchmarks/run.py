@@ -0,0 +1,188 @@
+"""
+	Benchmarks for command dispatch. Run from the root of the repository:
+
+		python -m benchmarks.run                    # run and report
+		python -m benchmarks.run --save-baseline    # run and store the results as the baseline
+		python -m benchmarks.run --compare          # run and compare against the baseline
+
+	Everything runs in process through Django's test client, so no network is needed.
+	Each case reports operations per second, p50 and p99 latency, and the peak memory
+	allocated during a single operation.
+"""
+import os, sys
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django
+django.setup()
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import RequestContext, Template
+from django.test import Client, RequestFactory
+from commands.services import CommandService
+from benchmarks.handlers import *
+from time import perf_counter
+import argparse, json, tracemalloc
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+client = Client()
+factory = RequestFactory()
+service = CommandService()
+
+
+def anonymous_request():
+	request = factory.get('/')
+	request.user = AnonymousUser()
+	return request
+
+
+# posts to the command endpoint, failing the benchmark if the command didn't succeed. a case that is
+# rejected early would otherwise look much faster than the work it is meant to measure.
+def post(name, data, **extra):
+	response = client.post('/commands/', data, **extra)
+	if response.status_code != 200:
+		raise AssertionError('{0} returned {1}: {2}'.format(name, response.status_code, response.content[:200]))
+	return response
+
+
+def post_form(name, params):
+	data = {key: json.dumps(value) for key, value in params.items()}
+	data['command'] = json.dumps(name)
+	return lambda: post(name, data)
+
+
+def post_json(name, params):
+	body = json.dumps({'command': name, 'params': params})
+	return lambda: post(name, body, content_type='application/json')
+
+
+def post_packed(name, values):
+	content = PackedArray('d', values).tobytes()
+	return lambda: post(name, {'command': json.dumps(name), 'values': SimpleUploadedFile('values', content)})
+
+
+def post_blob(size):
+	content = b'x' * size
+	return lambda: post(BlobHandler.command_name, {'command': json.dumps(BlobHandler.command_name), 'blob': SimpleUploadedFile('blob', content)})
+
+
+# checks the params against the handler's param types, failing the benchmark if they aren't valid
+def check_params(handler_class, content):
+	valid, result = handler_class.validate_param_types(content)
+	if not valid:
+		raise AssertionError('{0} rejected its params: {1}'.format(handler_class.command_name, result))
+	return result
+
+
+# builds every case as (name, operation, iterations)
+def build_cases():
+	cases = [('dispatch empty', post_form(EmptyHandler.command_name, {}), 2000)]
+
+	for count, handler_class in PARAMS_HANDLERS.items():
+		params = {param.name: (1 if param.type == Types.INTEGER else 'value') for param in handler_class.params}
+		cases.append(('dispatch {0} params (form)'.format(count), post_form(handler_class.command_name, params), 1000))
+		cases.append(('dispatch {0} params (json)'.format(count), post_json(handler_class.command_name, params), 1000))
+
+		content = {key: json.dumps(value) for key, value in params.items()}
+		cases.append(('validate_param_types {0} params'.format(count), lambda handler_class=handler_class, content=content: check_params(handler_class, content), 5000))
+
+	for length, handler_class in ARRAY_HANDLERS.items():
+		params = {'values': [float(index) for index in range(length)]}
+		iterations = max(20, 100000 // length)
+		cases.append(('dispatch float[{0}] (form)'.format(length), post_form(handler_class.command_name, params), iterations))
+		cases.append(('dispatch float[{0}] (json)'.format(length), post_json(handler_class.command_name, params), iterations))
+		cases.append(('dispatch float[{0}] (binary)'.format(length), post_packed(handler_class.command_name, params['values']), iterations))
+
+	chains = {'address': '  Someone@Example.com ', 'name': ' someone '}
+	cases.append(('dispatch normalizers and validators', post_form(ChainsHandler.command_name, chains), 1000))
+
+	for size in BLOB_SIZES:
+		cases.append(('dispatch blob {0}KB'.format(size // 1024), post_blob(size), max(20, 1000 * 1024 // size)))
+
+	cases.append(('get_available_definitions', lambda: service.get_available_definitions(anonymous_request()), 2000))
+
+	template = Template('{% load commands %}{% commands %}')
+	cases.append(('{% commands %} tag', lambda: template.render(RequestContext(anonymous_request())), 2000))
+
+	return cases
+
+
+# runs the operation and returns its ops/sec, p50 and p99 latency in milliseconds, and peak kilobytes per operation
+def measure(operation, iterations):
+	for _ in range(min(50, iterations)):
+		operation()
+
+	timings = []
+	started = perf_counter()
+	for _ in range(iterations):
+		before = perf_counter()
+		operation()
+		timings.append(perf_counter() - before)
+	elapsed = perf_counter() - started
+
+	# allocations are measured separately since tracing slows everything down
+	peaks = []
+	tracemalloc.start()
+	for _ in range(min(20, iterations)):
+		tracemalloc.reset_peak()
+		baseline = tracemalloc.get_traced_memory()[0]
+		operation()
+		peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+	tracemalloc.stop()
+
+	timings.sort()
+	return {
+		'ops': iterations / elapsed,
+		'p50': timings[len(timings) // 2] * 1000,
+		'p99': timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000,
+		'peak_kb': sum(peaks) / len(peaks) / 1024
+	}
+
+
+def report(name, result, previous=None):
+	line = '{0:<40} {1:>10.0f} ops/s {2:>9.3f}ms p50 {3:>9.3f}ms p99 {4:>10.1f}KB'.format(
+		name, result['ops'], result['p50'], result['p99'], result['peak_kb'])
+	if previous:
+		line += ' {0:>+7.1%} ops/s'.format(result['ops'] / previous['ops'] - 1)
+	print(line)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmarks for command dispatch.')
+	parser.add_argument('--save-baseline', action='store_true', help='Store the results as the baseline.')
+	parser.add_argument('--compare', action='store_true', help='Compare the results against the baseline.')
+	parser.add_argument('--threshold', type=float, default=0.1, help='The drop in ops/s that counts as a regression.')
+	parser.add_argument('--filter', default='', help='Only run the cases whose names contain this.')
+	options = parser.parse_args()
+
+	baseline = {}
+	if options.compare:
+		if not os.path.exists(BASELINE):
+			parser.error('No baseline has been saved yet. Run with --save-baseline first.')
+		with open(BASELINE) as handle:
+			baseline = json.load(handle)
+
+	results, regressions = {}, []
+	for name, operation, iterations in build_cases():
+		if options.filter not in name:
+			continue
+		results[name] = measure(operation, iterations)
+		report(name, results[name], baseline.get(name))
+		if name in baseline and results[name]['ops'] < baseline[name]['ops'] * (1 - options.threshold):
+			regressions.append(name)
+
+	if options.save_baseline:
+		with open(BASELINE, 'w') as handle:
+			json.dump(results, handle, indent=2, sort_keys=True)
+		print('Saved the baseline to {0}'.format(BASELINE))
+
+	if regressions:
+		print('Regressions: {0}'.format(', '.join(regressions)))
+		sys.exit(1)
+
+
+if __name__ == '__main__':
+	main()
@@ -1,7 +1,40 @@
 from .mixins import *
 from .types import *
 from .decorators import *
-import json
+from .manifest import *
+from .schemas import SchemaError, compile_schema
+from .codecs import get_codec
+from .caching import invalidate_tags
+from .limits import CommandLimiter
+from .compat import is_authenticated
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import close_old_connections
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from itertools import groupby
+import asyncio, inspect, json, os
+
+# stands in for the outcome of a validator whose param had no value, so it was never called
+UNMAPPED = object()
+
+_validation_pool = None
+
+
+# returns the pool of threads that concurrent validators run on, sized by the COMMANDS_VALIDATOR_WORKERS setting
+def get_validation_pool():
+	global _validation_pool
+	if _validation_pool is None:
+		_validation_pool = ThreadPoolExecutor(max_workers=getattr(settings, 'COMMANDS_VALIDATOR_WORKERS', 8))
+	return _validation_pool
+
+
+# calls the function on a thread of the validation pool. each thread keeps its own database
+# connection, which is checked before every call in the same way as at the start of a request.
+def call_in_pool(func, *args):
+	close_old_connections()
+	return func(*args)
 
 def build_param_message(missing_params):
 	return "The following parameters were missing: {0}".format(", ".join(missing_params))
@@ -9,6 +42,9 @@ def build_param_message(missing_params):
 def build_param_type_message(invalid_params):
 	return "The following parameters were of the wrong type: {0}".format(", ".join(invalid_params))
 
+def build_param_size_message(oversized_params):
+	return "The following parameters were too large: {0}".format(", ".join(oversized_params))
+
 class Param(object):
 	"""
 		A param object defines some properties about each parameter that
@@ -17,23 +53,254 @@ class Param(object):
 		the data objects that get passed around.
 	"""
 
-	def __init__(self, name, type, required=True, default=None):
+	def __init__(self, name, type, required=True, default=None, max_size=None, stream=False, vector=False, schema=None):
 		self.name = name
 		self.type = type
 		self.default = default
 		self.required = required
+		self.is_serialized = type not in (Types.BLOB, Types.FILE)
+
+		# for blob and file params, the most bytes that will be accepted and whether
+		# the handler should receive a memory mapped view instead of the upload itself
+		self.max_size = max_size
+		self.stream = stream
 
-	@property
-	def is_serialized(self):
-		return self.type not in [Types.BLOB, Types.FILE]
+		# for float and integer array params, whether the handler should receive a numpy array
+		# (or an array.array if numpy isn't installed) instead of a list
+		self.vector = vector
+
+		# for object and object array params, a list of params describing the fields of each object.
+		# fields may have schemas of their own. the schema is compiled when the handler is registered.
+		self.schema = schema
 
 	def dictify(self):
 		definition = {'name': self.name, 'type': self.type.value.representation, 'required': self.required}
 		if self.default: definition['default'] = self.default
+		if self.max_size: definition['max_size'] = self.max_size
+		if self.schema: definition['schema'] = [field.dictify() for field in self.schema]
 		return definition
 
 
-@Plugin(key='command_name', module='commands')
+class ParamTypeError(ValueError):
+	"""
+		Raised when a param is read from the request data and turns
+		out not to be of the type that was declared for it.
+	"""
+
+	def __init__(self, name):
+		super().__init__(build_param_type_message([name]))
+		self.name = name
+
+
+class ParamSizeError(ParamTypeError):
+	"""
+		Raised when an uploaded param is larger than the max_size declared for it.
+	"""
+
+	def __init__(self, name):
+		ValueError.__init__(self, build_param_size_message([name]))
+		self.name = name
+
+
+class ParamSpec(object):
+	"""
+		A param spec is the compiled form of a param. It deserializes, type checks and
+		casts the param's value from the request, which happens for every param before
+		the handler is built. It doubles as the descriptor for the param's attribute on
+		the command data, where the costly conversions that can't fail (memory mapping
+		streamed files and building vectors) are left until the param is first read.
+	"""
+
+	def __init__(self, param):
+		self.name = param.name
+		self.required = param.required
+		self.is_serialized = param.is_serialized
+		self.is_valid = param.type.value.is_valid
+		self.cast = param.type.value.cast
+		self.max_size = param.max_size
+		self.stream = param.stream and not param.is_serialized
+
+		# numeric arrays are packed in bulk and may be sent as the bytes of a typed array
+		self.unpack = getattr(param.type.value, 'unpack', None)
+		self.vector = param.vector
+
+		# a single function that checks and casts the whole of a param with a schema
+		self.check = compile_schema(param) if param.schema else None
+
+	# converts the checked value on first read and keeps the result on the instance, which
+	# takes precedence over this descriptor for every read after that
+	def __get__(self, instance, owner):
+		if instance is None:
+			return self
+		value = instance.__dict__[self.name] = self.finish(instance._values.get(self.name))
+		return value
+
+	# reads the param from the request data and checks it. decoded indicates the values were already deserialized.
+	def load(self, data, decoded=False):
+		if self.name not in data:
+			return None
+
+		content = data[self.name]
+
+		# the upload handler only drops oversized files early when it's installed and the client names the
+		# command, so the cap is checked again here for every upload
+		if self.max_size and isinstance(content, UploadedFile) and content.size > self.max_size:
+			raise ParamSizeError(self.name)
+
+		if self.unpack and isinstance(content, UploadedFile):
+			try:
+				content = self.unpack(content.read())
+			except ValueError:
+				raise ParamTypeError(self.name)
+		elif self.is_serialized and not decoded:
+			try:
+				content = get_codec().loads(content)
+			except ValueError:
+				raise ParamTypeError(self.name)
+
+		if self.check:
+			try:
+				return self.check(content)
+			except SchemaError as error:
+				raise ParamTypeError(self.name + error.path)
+
+		if not self.is_valid(content):
+			raise ParamTypeError(self.name)
+
+		try:
+			return self.cast(content)
+		except TypeError:
+			raise ParamTypeError(self.name)
+
+	# converts a value returned by load into the form the handler receives
+	def finish(self, content):
+		if content is None:
+			return None
+		if self.unpack:
+			return to_vector(content) if self.vector else (content.tolist() if isinstance(content, PackedArray) else content)
+		return memory_map(content) if self.stream else content
+
+
+class CommandData(object):
+	"""
+		The base for the data objects passed to normalizers, validators and #handle.
+		Each handler gets its own subclass with a ParamSpec descriptor per param. It
+		holds the checked values of the params, and any other attributes a handler
+		sets on it.
+	"""
+
+	def __init__(self, values):
+		self._values = values
+
+	# converts every param so the data no longer depends on the request, e.g. before it's handed to a
+	# background job. the request closes its uploads once it's over, so they are copied into memory.
+	def detach(self):
+		for name in type(self)._names:
+			value = getattr(self, name)
+			if isinstance(value, UploadedFile):
+				value.seek(0)
+				setattr(self, name, SimpleUploadedFile(value.name, value.read(), value.content_type))
+		return self
+
+
+class RequestData(object):
+	"""
+		A read only view over the POST and FILES of a request so that
+		the command data can be read from them without copying either.
+	"""
+
+	def __init__(self, request):
+		self.post = request.POST
+		self.files = request.FILES
+
+	def __contains__(self, key):
+		return key in self.post or key in self.files
+
+	def __getitem__(self, key):
+		return self.post[key] if key in self.post else self.files[key]
+
+
+class CommandPlan(object):
+	"""
+		A command plan is everything about a command handler that can be known
+		from its static definition. It gets compiled once when the handler class
+		is registered so that dispatching a request is a single pass over
+		precomputed param specs and normalizer / validator chains.
+	"""
+
+	def __init__(self, handler_class):
+		params = tuple(handler_class.params)
+		self.names = tuple(param.name for param in params)
+		self.specs = tuple(ParamSpec(param) for param in params)
+
+		self.normalizers = tuple(sorted([func for func in handler_class.__dict__.values()
+		                                 if getattr(func, 'normalizer', False)], key=lambda normalizer: normalizer.order))
+
+		self.validators = tuple(sorted([func for func in handler_class.__dict__.values()
+		                                if getattr(func, 'validator', False)], key=lambda validator: validator.order))
+
+		# the validators split into stages by order. each stage starts once the one before it has finished,
+		# and the concurrent validators in a stage run alongside the rest of the stage.
+		self.validator_stages = tuple(tuple(stage) for _, stage in groupby(self.validators, key=lambda validator: validator.order))
+
+		self.definition = {'name': handler_class.command_name, 'params': [param.dictify() for param in params]}
+
+		# whether the handle method is a coroutine and can run directly on the event loop
+		self.is_async = inspect.iscoroutinefunction(handler_class.handle)
+
+		# whether the handler replaced the default auth or permission checks with its own
+		self.custom_checks = any(getattr(handler_class, name).__func__ is not getattr(CommandHandlerBase, name).__func__
+		                         for name in ('validate_auth', 'validate_permissions'))
+
+		# results can only be cached if the command declares a timeout and has no uploads. they vary by user if
+		# the command says so, or if anything that runs before the cache is looked up could depend on the user:
+		# a validator of the user, an instance validator or normalizer, or the handler's own auth checks.
+		self.cacheable = handler_class.cache_timeout is not None and all(spec.is_serialized for spec in self.specs)
+		self.cache_per_user = (handler_class.cache_vary_on_user or self.custom_checks or
+		                       any(func.key.lower() == 'user' or func.is_instance for func in self.validators + self.normalizers))
+
+		# enforces the concurrency and rate limits of the command, if it has any
+		self.limiter = CommandLimiter(handler_class) if handler_class.max_concurrency or handler_class.rate_limit else None
+
+		# the data class for the command, with each spec acting as the descriptor for its param
+		namespace = {'_names': self.names}
+		namespace.update((spec.name, spec) for spec in self.specs)
+		self.data_class = type(str(handler_class.command_name or handler_class.__name__), (CommandData,), namespace)
+
+	# checks existence and types of the request data in one pass over the param specs. returns the missing
+	# and invalid params, the uploads that were over their max size, and the checked value of every param
+	# that was sent. decoded indicates that the values were already deserialized (e.g. from a batch payload).
+	def load(self, data, decoded=False):
+		missing, invalid, oversized, values = [], [], [], {}
+
+		for spec in self.specs:
+
+			if spec.name not in data:
+				if spec.required: missing.append(spec.name)
+				continue
+
+			try:
+				values[spec.name] = spec.load(data, decoded)
+			except ParamSizeError as error:
+				oversized.append(error.name)
+			except ParamTypeError as error:
+				invalid.append(error.name)
+
+		return missing, invalid, oversized, values
+
+	# the same as load, but with the values converted and every param present in cleaned_data
+	def check(self, data, decoded=False):
+		missing, invalid, oversized, values = self.load(data, decoded)
+		cleaned_data = {spec.name: spec.finish(values.get(spec.name)) for spec in self.specs}
+		return missing, invalid, oversized, cleaned_data
+
+	# checks the request data and wraps the checked values in the command's data class
+	def bind(self, data, decoded=False):
+		missing, invalid, oversized, values = self.load(data, decoded)
+		return missing, invalid, oversized, self.data_class(values)
+
+
+@Plugin(key='command_name', module='commands', compile='compile_plan', discover='discover_from_manifest')
 class CommandHandlerBase(AjaxMixin):
 	"""
 		This CommandHandlerBase class contains the bulk of dealing with the static data
@@ -69,15 +336,74 @@ class CommandHandlerBase(AjaxMixin):
 	# a list of required user permissions for a command
 	permissions = []
 
+	# the number of seconds to cache the results of an idempotent command for. None means results aren't cached.
+	cache_timeout = None
+
+	# whether cached results are kept separately for each user
+	cache_vary_on_user = False
+
+	# tags that, when invalidated, drop all of the cached results for the command
+	cache_tags = []
+
+	# the most executions of the command that may run at once. None means there is no limit.
+	max_concurrency = None
+
+	# the most calls allowed in a period, as (calls, seconds). None means there is no limit.
+	rate_limit = None
+
+	# whether the limits are counted across every process through the cache instead of per process
+	shared_limits = False
+
+	# the number of seconds clients are told to wait when the command is over its concurrency limit
+	retry_after = 1
+
+	# whether the handle method runs as a background job once validation passes. the request
+	# gets a job id straight away and the result is fetched from the job status endpoint.
+	background = False
+
+	# whether the command only reads. its queries go to the COMMANDS_READ_REPLICA database if one is set.
+	read_only = False
+
+	# whether the command runs in a transaction, which is rolled back if it fails
+	atomic = False
+
+	# the most queries, and the most seconds spent in queries, that the command should need. going over
+	# either is logged or raised depending on the COMMANDS_QUERY_BUDGET_ACTION setting. None means no budget.
+	max_queries = None
+	max_query_time = None
+
+	# the most times the same query may be made before it's reported as a likely N+1.
+	# None follows the COMMANDS_MAX_REPEATED_QUERIES setting.
+	max_repeated_queries = None
+
+	# whether responses are compressed for clients that accept it. None follows the COMMANDS_COMPRESS setting.
+	compress = None
+
+	# the precompiled plan for the command, set when the handler is registered
+	plan = None
+
 	# defining a base init method to maintain the initial request and user as a field
 	def __init__(self, request):
 		self.request = request
 		self.user = self.request.user
 
+	# populates the registry from the command manifest, if one is configured, so handler modules are only
+	# imported when their command is dispatched. called by the plugin metaclass on first access of the registry.
+	@classmethod
+	def discover_from_manifest(cls):
+		path = getattr(settings, 'COMMANDS_MANIFEST', None)
+		if not path or not os.path.exists(path):
+			return False
+
+		for entry in read_manifest(path, cls._registry):
+			cls._registry.setdefault(entry.command_name, entry)
+		return True
+
+
 	# checks that the user on the request is logged in if 'authenticated' is a necessary permission
 	@classmethod
 	def validate_auth(cls, request):
-		return request.user.is_authenticated() if cls.auth_required else True
+		return is_authenticated(request.user) if cls.auth_required else True
 
 
 	# checks that the user on the request has the necessary permissions for the command
@@ -86,10 +412,17 @@ class CommandHandlerBase(AjaxMixin):
 		return request.user.has_perms(cls.permissions)
 
 
+	# compiles the static definition of the handler into a plan. called by the plugin metaclass on registration.
+	@classmethod
+	def compile_plan(cls):
+		cls.plan = CommandPlan(cls)
+		return cls.plan
+
+
 	# checks that the necessary parameters were provided with the command data
 	@classmethod
 	def validate_param_existence(cls, data):
-		missing = [param.name for param in cls.params if (param.required) and (param.name not in data)]
+		missing = [spec.name for spec in cls.plan.specs if spec.required and spec.name not in data]
 		if len(missing) > 0: return False, build_param_message(missing)
 		return True, ''
 
@@ -97,49 +430,55 @@ class CommandHandlerBase(AjaxMixin):
 	# returns a list of the validator functions that have been defined in the class
 	@classmethod
 	def get_validators(cls):
-		return sorted([func for func in cls.__dict__.values() if getattr(func, 'validator', False)], key=lambda validator: validator.order)
+		return cls.plan.validators
 
 
 	# returns a list of the normalizer functions that have been defined in the class
 	@classmethod
 	def get_normalizers(cls):
-		return sorted([func for func in cls.__dict__.values() if getattr(func, 'normalizer', False)], key=lambda normalizer: normalizer.order)
+		return cls.plan.normalizers
 
 
 	# gets a simple serializable definition of the command
 	@classmethod
 	def to_definition(cls):
-		return {'name': cls.command_name, 'params': [param.dictify() for param in cls.params]}
+		return cls.plan.definition
 
 
 	# checks that all of the parameters in the request are of the correct type
 	@classmethod
 	def validate_param_types(cls, data):
-		invalid = []
-		cleaned_data = {}
-		existing = [param for param in cls.params if param.name in data]
-		[cleaned_data.setdefault(param.name, None) for param in cls.params if not param.name in data]
+		_, invalid, oversized, cleaned_data = cls.plan.check(data)
+		if len(oversized) > 0: return False, build_param_size_message(oversized)
+		if len(invalid) > 0: return False, build_param_type_message(invalid)
+		return True, cleaned_data
 
-		for param in existing:
 
-			# getting the appropriate set from the request data
-			content = data[param.name]
+	# checks both existence and types of the parameters in the request in a single pass
+	@classmethod
+	def validate_params(cls, data, decoded=False):
+		missing, invalid, oversized, cleaned_data = cls.plan.check(data, decoded)
+		if len(missing) > 0: return False, build_param_message(missing)
+		if len(oversized) > 0: return False, build_param_size_message(oversized)
+		if len(invalid) > 0: return False, build_param_type_message(invalid)
+		return True, cleaned_data
 
-			# if that type is generally serialized, then deserialize it
-			if param.is_serialized:
-				content = json.loads(content)
 
-			# check if it's valid according to that type
-			if not param.type.value.is_valid(content):
-				invalid.append(param.name)
-			else:
-				try:
-					cleaned_data[param.name] = param.type.value.cast(content)
-				except TypeError:
-					invalid.append(param.name)
+	# checks the existence, size and types of every param. returns (rejection, command data), where the
+	# rejection is the (message, status) of the error response if any of them weren't right, or None.
+	@classmethod
+	def bind_params(cls, data, decoded=False):
+		missing, invalid, oversized, command_data = cls.plan.bind(data, decoded)
+		if len(missing) > 0: return (build_param_message(missing), 400), None
+		if len(oversized) > 0: return (build_param_size_message(oversized), 413), None
+		if len(invalid) > 0: return (build_param_type_message(invalid), 400), None
+		return None, command_data
 
-		if len(invalid) > 0: return False, build_param_type_message(invalid)
-		else: return True, cleaned_data
+
+	# drops the cached results of every command declaring any of the tags. for use by commands that write.
+	@staticmethod
+	def invalidate_cache(*tags):
+		invalidate_tags(*tags)
 
 
 	# runs any normalizers that were defined on the class for individual fields
@@ -160,35 +499,135 @@ class CommandHandlerBase(AjaxMixin):
 
 	# runs any custom validators that were defined on the class for individual fields
 	def perform_custom_validation(self, data):
+		outcomes = []
+		for stage in self.plan.validator_stages:
+			outcomes.extend(self.run_validator_stage(stage, data))
+		return self.collect_validation(outcomes)
+
+
+	# the value a validator is called with, which is the user for 'user' validators. UNMAPPED if there's no value.
+	def get_validator_value(self, func, data):
+		value = getattr(data, func.key, None)
+		if value is not None:
+			return value
+		return self.user if func.key.lower() == 'user' else UNMAPPED
+
+
+	# runs the validators of a stage and returns their outcomes in order. concurrent validators are
+	# handed to the validation pool first so they overlap with the rest of the stage. the pool's threads
+	# have connections of their own, so an atomic command's validators all run in its transaction instead.
+	def run_validator_stage(self, stage, data):
+		values = [self.get_validator_value(func, data) for func in stage]
+		concurrent = len(stage) > 1 and not self.atomic
+
+		# each call gets a copy of the request's context so that it queries the same database as the request
+		futures = {index: get_validation_pool().submit(copy_context().run, call_in_pool, self.call_func, func, value)
+		           for index, (func, value) in enumerate(zip(stage, values))
+		           if concurrent and func.concurrent and value is not UNMAPPED}
+
+		outcomes = [value if value is UNMAPPED or index in futures else self.call_func(func, value)
+		            for index, (func, value) in enumerate(zip(stage, values))]
+
+		for index, future in futures.items():
+			outcomes[index] = future.result()
+		return outcomes
+
+
+	# builds the errors for each key from the outcomes of the validators, in the order the validators were run
+	def collect_validation(self, outcomes):
 		results, valid = {}, True
-		for func in self.get_validators():
-			value = getattr(data, func.key, None)
-			
-			if value is not None:
-				valid = self.call_func(func, value)
-			elif func.key.lower() == 'user':
-				valid = self.call_func(func, self.user)
-			else:
-				valid = False
+		for func, outcome in zip(self.get_validators(), outcomes):
+			if outcome is UNMAPPED:
 				results[func.key] = ['Parameter {0} could not be mapped from the data.'.format(func.key)]
 
-			if not valid:
+			if outcome is UNMAPPED or not outcome:
+				valid = False
 				if not func.key in results:
 					results[func.key] = [func.error]
 				else:
 					results[func.key].append(func.error)
-						
+
 		return valid, results
 
 
+	# runs any normalizers that were defined on the class for individual fields, awaiting any that are async
+	async def aperform_data_normalization(self, data):
+		errors, valid = {}, True
+		for func in self.get_normalizers():
+			value = getattr(data, func.key, None)
+			if value is not None:
+				try:
+					normalized = await self.acall_func(func, value)
+					setattr(data, func.key, normalized)
+				except Exception:
+					errors[func.key] = 'Error occurred during normalization of {0}.'.format(func.key)
+					valid = False
+
+		return data, valid, errors
+
+
+	# runs any custom validators that were defined on the class for individual fields, awaiting any that are async
+	async def aperform_custom_validation(self, data):
+		outcomes = []
+		for stage in self.plan.validator_stages:
+			outcomes.extend(await self.arun_validator_stage(stage, data))
+		return self.collect_validation(outcomes)
+
+
+	# the async counterpart of run_validator_stage. concurrent validators are started as tasks, with the
+	# sync ones each getting a thread of their own, and are gathered once the rest of the stage has run.
+	async def arun_validator_stage(self, stage, data):
+		values = [self.get_validator_value(func, data) for func in stage]
+		concurrent = len(stage) > 1 and not self.atomic
+
+		tasks = {index: asyncio.ensure_future(self.acall_func(func, value, thread_sensitive=False))
+		         for index, (func, value) in enumerate(zip(stage, values))
+		         if concurrent and func.concurrent and value is not UNMAPPED}
+
+		outcomes = []
+		for index, (func, value) in enumerate(zip(stage, values)):
+			outcomes.append(value if value is UNMAPPED or index in tasks else await self.acall_func(func, value))
+
+		for index, outcome in zip(tasks, await asyncio.gather(*tasks.values())):
+			outcomes[index] = outcome
+		return outcomes
+
+
 	# used to dispatch calls appropriately from bound and unbound (imported/static) functions
 	def call_func(self, func, value):
-		if getattr(func, 'is_instance', False):
-			return func(self, value)
-		else:
-			return func(value)
+		args = (self, value) if getattr(func, 'is_instance', False) else (value,)
+		if getattr(func, 'is_async', False):
+			return async_to_sync(func)(*args)
+		return func(*args)
+
+
+	# the async counterpart of call_func. sync functions are run in a thread so they can safely touch the database.
+	# thread_sensitive=False gives them a thread of their own instead of the one shared with the rest of the request.
+	async def acall_func(self, func, value, thread_sensitive=True):
+		args = (self, value) if getattr(func, 'is_instance', False) else (value,)
+		if getattr(func, 'is_async', False):
+			return await func(*args)
+		if not thread_sensitive:
+			# off the request's thread, so the connections of the executor threads are looked after like the pool's
+			return await sync_to_async(call_in_pool, thread_sensitive=False)(func, *args)
+		return await sync_to_async(func)(*args)
+
+
+	# runs the handle method from a synchronous context, whether or not it was declared async
+	def run(self, data):
+		if self.plan.is_async:
+			return async_to_sync(self.handle)(data)
+		return self.handle(data)
+
+
+	# runs the handle method from the event loop, using a thread for handlers that are synchronous
+	async def arun(self, data):
+		if self.plan.is_async:
+			return await self.handle(data)
+		return await sync_to_async(self.handle)(data)
 
 
-	# just a placeholder, but implementations should handle the actual incoming command and return a HTTP response
+	# just a placeholder, but implementations should handle the actual incoming command and return a HTTP response.
+	# implementations may also declare this as an async method.
 	def handle(self, data):
 		raise NotImplementedError("The default handle method was not overridden by the custom handler.")
\ No newline at end of file
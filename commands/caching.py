@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from .compat import is_authenticated
+from collections import Counter
+import hashlib, json
+
+# the prefixes of the keys for cached results and for the versions of invalidation tags
+RESULT_PREFIX = 'commands:result:'
+TAG_PREFIX = 'commands:tag:'
+
+
+# returns the cache chosen by the COMMANDS_CACHE setting
+def get_cache():
+	return caches[getattr(settings, 'COMMANDS_CACHE', 'default')]
+
+
+# returns the current version of each tag. a tag that was never invalidated is at version 0.
+def get_tag_versions(tags):
+	if not tags:
+		return []
+	versions = get_cache().get_many([TAG_PREFIX + tag for tag in tags])
+	return [versions.get(TAG_PREFIX + tag, 0) for tag in tags]
+
+
+# invalidates the cached results of every command that declared any of the tags
+def invalidate_tags(*tags):
+	cache = get_cache()
+	for tag in tags:
+		try:
+			cache.incr(TAG_PREFIX + tag)
+		except ValueError:
+			cache.set(TAG_PREFIX + tag, 1, None)
+
+
+class KeyEncoder(DjangoJSONEncoder):
+	"""
+		Encodes the identity of a cached result. Vector params are keyed by
+		a digest of their bytes rather than by each of their values.
+	"""
+
+	def default(self, o):
+		if hasattr(o, 'tobytes'):
+			return hashlib.sha1(o.tobytes()).hexdigest()
+		return super().default(o)
+
+
+class ResultCache(object):
+	"""
+		The result cache stores the responses of idempotent commands that declare
+		a cache_timeout, keyed by the command name, the normalized params, the
+		versions of the command's tags, and the user if the results vary by user.
+		Results are only looked up once the command's validators have passed.
+		It keeps a count of hits and misses per command for this process.
+	"""
+
+	def __init__(self):
+		self.hits = Counter()
+		self.misses = Counter()
+
+	# builds the key for the request from the normalized values of its params
+	def key(self, request, handler_class, data):
+		user = request.user.pk if handler_class.plan.cache_per_user and is_authenticated(request.user) else None
+		params = [getattr(data, spec.name) for spec in handler_class.plan.specs]
+		identity = [handler_class.command_name, user, get_tag_versions(handler_class.cache_tags), params]
+		content = json.dumps(identity, cls=KeyEncoder, sort_keys=True)
+		return RESULT_PREFIX + hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+	# returns the cached response for the key, or None on a miss
+	def get(self, handler_class, key):
+		cached = get_cache().get(key)
+		if cached is None:
+			self.misses[handler_class.command_name] += 1
+			return None
+
+		self.hits[handler_class.command_name] += 1
+		status, content_type, content = cached
+		return HttpResponse(content, content_type=content_type, status=status)
+
+	# stores the response under the key if it was a complete, successful response
+	def store(self, handler_class, key, response):
+		if response.status_code == 200 and not getattr(response, 'streaming', False):
+			cached = (response.status_code, response['Content-Type'], response.content)
+			get_cache().set(key, cached, handler_class.cache_timeout)
+
+	# the hits and misses for each command that has been looked up
+	def stats(self):
+		names = set(self.hits) | set(self.misses)
+		return {name: {'hits': self.hits[name], 'misses': self.misses[name]} for name in names}
@@ -0,0 +1,188 @@
+from .serializers import get_serializer
+import hashlib, json, re
+
+HEADER = '// Generated by manage.py commands_client from the command definitions. Do not edit.\n'
+
+# the javascript expression checking a value of each scalar type, with {0} standing for the value
+SCALAR_CHECKS = {
+	'boolean': "typeof {0} === 'boolean'",
+	'string': "typeof {0} === 'string'",
+	'float': "typeof {0} === 'number'",
+	'integer': "(typeof {0} === 'number' && {0} === Math.floor({0}))",
+	'blob': '{0} instanceof Blob',
+	'file': '{0} instanceof File',
+	'object': '{0} === Object({0})'
+}
+
+# the typed arrays that commands.js sends as raw bytes for each numeric array type
+TYPED_ARRAYS = {
+	'float[]': ('Float64Array', 'Float32Array'),
+	'integer[]': ('Int32Array', 'Int16Array', 'Int8Array', 'Uint16Array', 'Uint8Array')
+}
+
+# the typescript type of each scalar type
+SCALAR_TYPES = {
+	'boolean': 'boolean',
+	'string': 'string',
+	'float': 'number',
+	'integer': 'number',
+	'blob': 'Blob',
+	'file': 'File',
+	'object': '{ [key: string]: any }'
+}
+
+# the types shared by every command, declared in the commandsClient namespace
+TYPESCRIPT_PRELUDE = '''
+declare namespace commandsClient {
+
+    interface CommandPolicy {
+        latest?: boolean;
+        dedupe?: boolean;
+        debounce?: number;
+    }
+
+    interface Command<P> {
+        name: string;
+        fire(data?: P, success?: (response: any) => void, failure?: (error: any) => void): PromiseLike<any> | null;
+        stream(data: P, item: (result: any) => void, success?: (response: any) => void, failure?: (error: any) => void): PromiseLike<any> | null;
+        configure(options: CommandPolicy): Command<P>;
+    }
+'''
+
+
+# the name of the typescript interface for the params of a command, e.g. PlaceOrderParams for PLACE_ORDER.
+# names that would start with a digit are prefixed with an underscore so they are still identifiers.
+def interface_name(command_name):
+	name = ''.join(part.capitalize() for part in re.split('[^0-9a-zA-Z]+', command_name) if part) + 'Params'
+	return '_' + name if name[0].isdigit() else name
+
+
+# the javascript expression checking that the value of expr matches the param definition. nested
+# schemas are compiled into helper functions, whose source is appended to helpers.
+def js_check(definition, expr, helpers):
+	kind = definition['type']
+
+	if kind.endswith('[]'):
+		entry = js_check(dict(definition, type=kind[:-2]), 'entry', helpers)
+		check = '(Array.isArray({0}) && {0}.every(function (entry) {{ return {1}; }}))'.format(expr, entry)
+		typed = ['{0} instanceof {1}'.format(expr, name) for name in TYPED_ARRAYS.get(kind, ())]
+		return '({0})'.format(' || '.join(typed + [check])) if typed else check
+
+	if kind == 'object' and definition.get('schema'):
+		return '{0}({1})'.format(js_schema(definition['schema'], helpers), expr)
+
+	return SCALAR_CHECKS[kind].format(expr)
+
+
+# compiles the helper function checking an object against a schema and returns its name
+def js_schema(schema, helpers):
+	lines = []
+	for field in schema:
+		value = 'value[{0}]'.format(json.dumps(field['name']))
+		lines.append('        if ({0} === undefined || {0} === null) {{'.format(value))
+		if field['required']:
+			lines.append('            return false;')
+		lines.append('        }} else if (!({0})) {{'.format(js_check(field, value, helpers)))
+		lines.append('            return false;')
+		lines.append('        }')
+
+	name = 'checkSchema{0}'.format(len(helpers))
+	helpers.append('    function {0}(value) {{\n        if (value !== Object(value)) {{\n            return false;\n        }}\n{1}\n        return true;\n    }}\n'.format(name, '\n'.join(lines)))
+	return name
+
+
+# the registration of a command with a validation function specialized to its params
+def js_command(definition, helpers):
+	lines, defaults = [], {}
+	for param in definition['params']:
+		key = json.dumps(param['name'])
+		value = 'data[{0}]'.format(key)
+		if 'default' in param:
+			defaults[param['name']] = param['default']
+
+		if param['required']:
+			lines.append('        if (!data.hasOwnProperty({0})) {{'.format(key))
+			lines.append('            return {0};'.format(json.dumps('Required Parameter: {0} was missing.'.format(param['name']))))
+			lines.append('        }')
+
+		lines.append('        if (data.hasOwnProperty({0})) {{'.format(key))
+		lines.append('            if (!({0})) {{'.format(js_check(param, value, helpers)))
+		lines.append('                return {0};'.format(json.dumps('Invalid property type for property: {0}.'.format(param['name']))))
+		lines.append('            }')
+		if param.get('max_size'):
+			lines.append('            if ({0}.size > {1}) {{'.format(value, param['max_size']))
+			lines.append('                return {0};'.format(json.dumps('Property: {0} is larger than {1} bytes.'.format(param['name'], param['max_size']))))
+			lines.append('            }')
+		lines.append('        }')
+
+	name = json.dumps(definition['name'])
+	return '    client[{0}] = commands.register({0}, {1}, function (data) {{\n{2}\n        return null;\n    }});\n'.format(
+		name, get_serializer()(defaults).decode('utf-8'), '\n'.join(lines))
+
+
+# builds the javascript client for the command definitions. it registers each command with commands.js
+# and exports them, as an AMD module depending on 'commands' or as the commandsClient global.
+def build_client(definitions):
+	helpers, registrations = [], []
+	for definition in sorted(definitions, key=lambda definition: definition['name']):
+		registrations.append(js_command(definition, helpers))
+
+	return HEADER + '''(function (root, factory) {
+    if (typeof define === 'function' && define.amd) {
+        define(['commands'], factory);
+    } else {
+        root.commandsClient = factory(root.commands);
+    }
+}(this, function (commands) {
+
+    var client = {};
+
+''' + '\n'.join(helpers + registrations) + '''
+    return client;
+
+}));
+'''
+
+
+# the typescript type of a value matching the param definition
+def ts_type(definition):
+	kind = definition['type']
+
+	if kind.endswith('[]'):
+		entry = ts_type(dict(definition, type=kind[:-2]))
+		return ' | '.join(['({0})[]'.format(entry)] + list(TYPED_ARRAYS.get(kind, ())))
+
+	if kind == 'object' and definition.get('schema'):
+		return '{{ {0} }}'.format(' '.join(ts_field(field) for field in definition['schema']))
+
+	return SCALAR_TYPES[kind]
+
+
+# the typescript property for the param. params that aren't required or that have a default may be left out.
+def ts_field(definition):
+	optional = '' if definition['required'] and 'default' not in definition else '?'
+	return '{0}{1}: {2};'.format(json.dumps(definition['name']), optional, ts_type(definition))
+
+
+# builds the typescript typings for the client built from the same definitions. they describe the module the
+# way the client exports it, as the value of an AMD module or the commandsClient global, with a property for each
+# command. command names are quoted since they needn't be identifiers.
+def build_typings(definitions):
+	interfaces, properties, names = [], [], set()
+	for definition in sorted(definitions, key=lambda definition: definition['name']):
+		name = interface_name(definition['name'])
+		while name in names:
+			name = '_' + name
+		names.add(name)
+
+		fields = ''.join('        {0}\n'.format(ts_field(param)) for param in definition['params'])
+		interfaces.append('\n    interface {0} {{\n{1}    }}\n'.format(name, fields))
+		properties.append('    {0}: commandsClient.Command<commandsClient.{1}>;\n'.format(json.dumps(definition['name']), name))
+
+	return ''.join([HEADER, TYPESCRIPT_PRELUDE] + interfaces + ['}\n\ndeclare const commandsClient: {\n'] + properties + [
+		'};\n\nexport = commandsClient;\nexport as namespace commandsClient;\n'])
+
+
+# the file name of the client, with a hash of its content so that each version is cached separately
+def client_filename(content):
+	return 'commands-client.{0}.js'.format(hashlib.sha1(content.encode('utf-8')).hexdigest()[:12])
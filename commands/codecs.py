@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+from importlib import import_module
+
+# the codecs that can be chosen by name. anything else is treated as a dotted path to an object with loads and dumps.
+BUILTIN_CODECS = ('json', 'orjson', 'ujson')
+
+_codec = None
+
+
+# loads the codec with the given name or dotted path
+def load_codec(name):
+	if name in BUILTIN_CODECS:
+		return import_module(name)
+	return import_string(name)
+
+
+# returns the codec chosen by the COMMANDS_JSON_CODEC setting, loading it the first time it is needed
+def get_codec():
+	global _codec
+	if _codec is None:
+		_codec = load_codec(getattr(settings, 'COMMANDS_JSON_CODEC', 'json'))
+	return _codec
@@ -0,0 +1,5 @@
+# reads whether the user is authenticated. is_authenticated is a property on every supported version of
+# django, but custom user models written before 1.10 may still define it as a method.
+def is_authenticated(user):
+	value = user.is_authenticated
+	return value() if callable(value) else bool(value)
@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+import gzip
+
+try:
+	import brotli
+except ImportError:
+	brotli = None
+
+try:
+	import zstandard
+except ImportError:
+	zstandard = None
+
+
+def gzip_compress(content):
+	return gzip.compress(content, compresslevel=6)
+
+
+def brotli_compress(content):
+	return brotli.compress(content, quality=5)
+
+
+# compressors aren't thread safe, so each response gets its own
+def zstd_compress(content):
+	return zstandard.ZstdCompressor(level=3).compress(content)
+
+
+# the encodings that are available, in the order they are preferred when the client accepts more than one
+ENCODINGS = tuple((name, compress) for name, compress, available in (
+	('zstd', zstd_compress, zstandard is not None),
+	('br', brotli_compress, brotli is not None),
+	('gzip', gzip_compress, True)
+) if available)
+
+
+# parses an Accept-Encoding header into the quality of each encoding
+def parse_accept_encoding(header):
+	qualities = {}
+	for part in header.split(','):
+		name, _, parameters = part.strip().partition(';')
+		if not name:
+			continue
+		quality = 1.0
+		parameter = parameters.strip()
+		if parameter.startswith('q='):
+			try:
+				quality = float(parameter[2:])
+			except ValueError:
+				quality = 0.0
+		qualities[name.strip().lower()] = quality
+	return qualities
+
+
+# returns the (name, compress) of the most preferred encoding the client accepts, or None
+def choose_encoding(header):
+	qualities = parse_accept_encoding(header)
+	default = qualities.get('*', 0.0)
+	for name, compress in ENCODINGS:
+		if qualities.get(name, default) > 0:
+			return name, compress
+	return None
+
+
+# compresses the content of the response with the best encoding the client accepts, if it's at least
+# the size set by the COMMANDS_COMPRESS_MIN_SIZE setting and compressing it actually makes it smaller
+def compress_response(request, response):
+	if getattr(response, 'streaming', False) or response.has_header('Content-Encoding'):
+		return response
+	if len(response.content) < getattr(settings, 'COMMANDS_COMPRESS_MIN_SIZE', 1024):
+		return response
+
+	patch_vary_headers(response, ('Accept-Encoding',))
+	encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+	if encoding is None:
+		return response
+
+	name, compress = encoding
+	compressed = compress(response.content)
+	if len(compressed) >= len(response.content):
+		return response
+
+	response.content = compressed
+	response['Content-Encoding'] = name
+	response['Content-Length'] = str(len(compressed))
+	return response
@@ -1,7 +1,7 @@
 import inspect
 
 def is_instance_method(method):
-	number_of_args = len(inspect.getargspec(method)[0])
+	number_of_args = len(inspect.getfullargspec(method).args)
 	if number_of_args > 2:
 		raise ValueError('Functions may only take one (static method) or two (instance method) arguments.')
 	return number_of_args == 2
@@ -23,4 +23,5 @@ class normalizer(object):
 		func.key = self.key
 		func.order = self.order
 		func.is_instance = is_instance_method(func)
+		func.is_async = inspect.iscoroutinefunction(func)
 		return func
\ No newline at end of file
@@ -2,8 +2,11 @@
 # to automatically register classes that inherit from it across django apps within your project.
 from django.utils.module_loading import autodiscover_modules
 
-# creating a decorator that effectively sets the above class as the meta class and passes along the key and module
-def Plugin(key, module):
+# creating a decorator that effectively sets the above class as the meta class and passes along the key and module.
+# if a compile hook is provided, it names a classmethod that gets called on each plugin as it is registered.
+# if a discover hook is provided, it names a classmethod that may populate the registry instead of autodiscovery
+# and returns whether it did so.
+def Plugin(key, module, compile=None, discover=None):
 
 	class Plug(type):
 
@@ -24,17 +27,30 @@ def Plugin(key, module):
 				# during the first definition the registry must not have been populated yet.
 				cls._registry_populated = False
 
+				# incremented whenever a plugin is registered so anything derived from the registry knows to rebuild.
+				cls._registry_version = 0
+
+				# keeping track of the base class so plugins can update state that lives on it
+				cls._registry_base = cls
+
 				# we want to store the key by which to hash the plugins as they are registered
 				cls._registry_field_key = kwargs['key']
 
 				# gets the name of the module to look for in each of the apps
 				cls._modules_to_register = kwargs['module']
 
+				# the name of the classmethod used to precompute anything derived from a plugin's static definition
+				cls._registry_compile_hook = kwargs.get('compile')
+
+				# the name of the classmethod used to populate the registry without importing every module
+				cls._registry_discover_hook = kwargs.get('discover')
+
 				# defining a property function that will register all of our plugins in the
 				# various project apps the first time the registry field is accessed.
 				def get_registry(accessor):
 					if not cls._registry_populated:
-						autodiscover_modules(cls._modules_to_register)
+						if not (cls._registry_discover_hook and getattr(cls, cls._registry_discover_hook)()):
+							autodiscover_modules(cls._modules_to_register)
 						cls._registry_populated = True
 					return cls._registry
 
@@ -46,5 +62,10 @@ def Plugin(key, module):
 				# Simply appending it to the list is all that's needed to keep
 				# track of it later.
 				cls._registry[getattr(cls, cls._registry_field_key)] = cls
+				cls._registry_base._registry_version += 1
+
+				# compiling the plugin once here so that nothing static has to be recomputed per use.
+				if cls._registry_compile_hook:
+					getattr(cls, cls._registry_compile_hook)()
 
-	return lambda cls: Plug(cls.__name__, cls.__bases__, dict(cls.__dict__), key=key, module=module)
\ No newline at end of file
+	return lambda cls: Plug(cls.__name__, cls.__bases__, dict(cls.__dict__), key=key, module=module, compile=compile, discover=discover)
\ No newline at end of file
@@ -1,7 +1,7 @@
 import inspect
 
 def is_instance_method(method):
-	number_of_args = len(inspect.getargspec(method)[0])
+	number_of_args = len(inspect.getfullargspec(method).args)
 	if number_of_args > 2:
 		raise ValueError('Functions may only take one (static method) or two (instance method) arguments.')
 	return number_of_args == 2
@@ -12,17 +12,24 @@ class validator(object):
 		a key and an error message indicating which data parameter
 		the method validates and what the error message should be
 		if the validation fails.
+
+		Validators that are independent of the others with the same order and that
+		spend their time waiting on I/O (database lookups, remote checks) may set
+		concurrent=True so that they run at the same time as the rest of their order.
 	"""
 
-	def __init__(self, key, error, order=0, *args, **kwargs):
+	def __init__(self, key, error, order=0, concurrent=False, *args, **kwargs):
 		self.key = key
 		self.error = error
 		self.order = order
+		self.concurrent = concurrent
 
 	def __call__(self, func):
 		func.validator = True
 		func.key = self.key
 		func.error = self.error
 		func.order = self.order
+		func.concurrent = self.concurrent
 		func.is_instance = is_instance_method(func)
+		func.is_async = inspect.iscoroutinefunction(func)
 		return func
\ No newline at end of file
@@ -0,0 +1,102 @@
+from .caching import get_cache
+from .compat import is_authenticated
+from django.conf import settings
+from django.http import HttpResponse
+import hashlib, json
+
+# the header the client sends the idempotency key of a command in
+IDEMPOTENCY_HEADER = 'HTTP_X_IDEMPOTENCY_KEY'
+
+# the prefix of the keys that responses are stored under
+IDEMPOTENCY_PREFIX = 'commands:idempotency:'
+
+# the states of a key: its command is still running, or its response is stored. a repeat sent
+# with params that don't match the ones the key was first used with is MISMATCHED.
+IN_FLIGHT = 'in-flight'
+STORED = 'stored'
+MISMATCHED = 'mismatched'
+
+# statuses below 500 that a retry could do better than: rate limited, and skipped because the client disconnected
+RETRYABLE = (429, 499)
+
+
+class IdempotencyStore(object):
+	"""
+		The idempotency store makes sure a command sent more than once with the same
+		idempotency key only runs once. The first request claims the key in the cache
+		and runs the command. Requests with the key that arrive while it is still running
+		are turned away straight away, and ones that arrive later replay its response, for
+		as long as the COMMANDS_IDEMPOTENCY_TIMEOUT setting says (300 seconds by default).
+		Keys are scoped to the user and the command, and each one remembers a fingerprint
+		of the params it was first sent with so that it can't be reused for other params.
+	"""
+
+	@property
+	def timeout(self):
+		return getattr(settings, 'COMMANDS_IDEMPOTENCY_TIMEOUT', 300)
+
+	# builds the key for the request, or returns None if the client didn't send an idempotency key
+	def key(self, request, command_name):
+		header = request.META.get(IDEMPOTENCY_HEADER)
+		if not header:
+			return None
+		user = request.user.pk if is_authenticated(request.user) else None
+		identity = '{0}:{1}:{2}'.format(command_name, user, header)
+		return IDEMPOTENCY_PREFIX + hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+	# a hash of the command name and its params as they were sent. decoded indicates the params are a dict
+	# of already deserialized values rather than the POST and FILES of the request.
+	def fingerprint(self, command_name, command_data, decoded=False):
+		digest = hashlib.sha1(command_name.encode('utf-8'))
+		if decoded:
+			digest.update(json.dumps(command_data, sort_keys=True, default=repr).encode('utf-8'))
+			return digest.hexdigest()
+
+		for name in sorted(command_data.post):
+			if name != 'command':
+				digest.update(json.dumps([name, command_data.post.getlist(name)]).encode('utf-8'))
+		for name in sorted(command_data.files):
+			digest.update(json.dumps([name]).encode('utf-8'))
+			for upload in command_data.files.getlist(name):
+				for chunk in upload.chunks():
+					digest.update(chunk)
+				upload.seek(0)
+		return digest.hexdigest()
+
+	# claims the key for this request. returns (True, None) if the command should run, and otherwise (False, outcome)
+	# with the stored response to replay, IN_FLIGHT if the first request is still running, or MISMATCHED if the key
+	# was first sent with other params.
+	def begin(self, key, fingerprint):
+		while True:
+			if get_cache().add(key, (IN_FLIGHT, fingerprint), self.timeout):
+				return True, None
+
+			# the key may have been released between the two calls, in which case it can be claimed again
+			record = get_cache().get(key)
+			if record is None:
+				continue
+
+			if record[1] != fingerprint:
+				return False, MISMATCHED
+			if record[0] == IN_FLIGHT:
+				return False, IN_FLIGHT
+			return False, self.replay(record)
+
+	# stores the response for the key so that repeats replay it. responses that can't be stored or that a
+	# retry could do better than release the key instead so the next request runs again.
+	def finish(self, key, fingerprint, response):
+		if getattr(response, 'streaming', False) or response.status_code in RETRYABLE or response.status_code >= 500:
+			return self.abandon(key)
+
+		record = (STORED, fingerprint, response.status_code, response['Content-Type'], response.content)
+		get_cache().set(key, record, self.timeout)
+
+	# releases the key without storing a response, e.g. when the command raised
+	def abandon(self, key):
+		get_cache().delete(key)
+
+	def replay(self, record):
+		_, _, status, content_type, content = record
+		response = HttpResponse(content, content_type=content_type, status=status)
+		response['Idempotent-Replayed'] = 'true'
+		return response
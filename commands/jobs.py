@@ -0,0 +1,101 @@
+from .caching import get_cache
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+from concurrent.futures import ThreadPoolExecutor
+import json, logging, uuid
+
+logger = logging.getLogger(__name__)
+
+# the prefix of the keys that job records are stored under
+JOB_PREFIX = 'commands:job:'
+
+PENDING, RUNNING, COMPLETE = 'pending', 'running', 'complete'
+
+_backend = None
+
+
+class JobBackend(object):
+	"""
+		A job backend runs the handle method of background commands somewhere
+		other than the request that started them. Implementations only need to
+		call the given function, without arguments, at some point.
+	"""
+
+	def submit(self, func):
+		raise NotImplementedError
+
+
+class ThreadPoolJobBackend(JobBackend):
+	"""
+		Runs jobs on a pool of threads in the process that received the command.
+		The size of the pool is set by the COMMANDS_JOB_WORKERS setting.
+	"""
+
+	def __init__(self):
+		self.executor = ThreadPoolExecutor(max_workers=getattr(settings, 'COMMANDS_JOB_WORKERS', 4))
+
+	def submit(self, func):
+		self.executor.submit(func)
+
+
+# returns the backend chosen by the COMMANDS_JOB_BACKEND setting, creating it the first time it is needed
+def get_backend():
+	global _backend
+	if _backend is None:
+		_backend = import_string(getattr(settings, 'COMMANDS_JOB_BACKEND', 'commands.jobs.ThreadPoolJobBackend'))()
+	return _backend
+
+
+def save_job(job_id, record):
+	get_cache().set(JOB_PREFIX + job_id, record, getattr(settings, 'COMMANDS_JOB_TIMEOUT', 3600))
+
+
+# returns the record of the job, or None if it doesn't exist or has expired
+def get_job(job_id):
+	return get_cache().get(JOB_PREFIX + job_id)
+
+
+# records the response of a job so that it can be returned by the status endpoint
+def complete_job(job_id, record, response):
+	if getattr(response, 'streaming', False):
+		content = b''.join(response.streaming_content)
+	else:
+		content = response.content
+
+	record.update(status=COMPLETE, response=(response.status_code, response['Content-Type'], content))
+	save_job(job_id, record)
+
+
+# starts running the function as a job for the user and returns the id of the job
+def submit_job(user, func):
+	job_id = uuid.uuid4().hex
+	record = {'status': PENDING, 'user': user.pk}
+	save_job(job_id, record)
+
+	def run():
+		try:
+			save_job(job_id, dict(record, status=RUNNING))
+			complete_job(job_id, record, func())
+		except Exception:
+			logger.exception('Background command job %s failed.', job_id)
+			content = json.dumps({'error': 'An error occurred while running the command.'})
+			record.update(status=COMPLETE, response=(500, 'application/json', content.encode('utf-8')))
+			save_job(job_id, record)
+		finally:
+			# the job ran on its own thread, which shouldn't keep its database connections open
+			connections.close_all()
+
+	get_backend().submit(run)
+	return job_id
+
+
+# builds the response for the job's current status
+def to_response(record):
+	if record['status'] != COMPLETE:
+		content = json.dumps({'status': record['status']})
+		return HttpResponse(content, content_type='application/json', status=202)
+
+	status, content_type, content = record['response']
+	return HttpResponse(content, content_type=content_type, status=status)
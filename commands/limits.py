@@ -0,0 +1,101 @@
+from .caching import get_cache
+import threading, time
+
+# the prefixes of the keys used to share limits between processes through the cache
+RUNNING_PREFIX = 'commands:running:'
+RATE_PREFIX = 'commands:rate:'
+
+# the seconds a shared running count is kept after the command was last started
+RUNNING_TIMEOUT = 300
+
+
+class CommandLimiter(object):
+	"""
+		A command limiter enforces a handler's max_concurrency and rate_limit. The limits
+		are counted per process, or across every process through the cache if the handler
+		sets shared_limits. Requests over a limit are rejected straight away so that an
+		expensive command can't queue up and take every worker.
+	"""
+
+	def __init__(self, handler_class):
+		self.name = handler_class.command_name
+		self.max_concurrency = handler_class.max_concurrency
+		self.rate_limit = handler_class.rate_limit
+		self.retry_after = handler_class.retry_after
+		self.shared = handler_class.shared_limits
+
+		self.semaphore = threading.BoundedSemaphore(self.max_concurrency) if self.max_concurrency else None
+		self.lock = threading.Lock()
+		self.window, self.count = None, 0
+
+	# claims a slot for an execution. returns None if it may go ahead, otherwise (status, message, retry_after).
+	def acquire(self):
+		if self.max_concurrency and not self.acquire_slot():
+			return 503, 'Too many requests for this command are running. Please try again shortly.', self.retry_after
+
+		if self.rate_limit:
+			retry_after = self.check_rate()
+			if retry_after is not None:
+				self.release()
+				return 429, 'This command has been called too often. Please try again later.', retry_after
+
+		return None
+
+	# gives back the slot claimed by acquire
+	def release(self):
+		if not self.max_concurrency:
+			return
+		if not self.shared:
+			self.semaphore.release()
+			return
+
+		# the count can only drift below zero if it expired while slots were held, so it's clamped there
+		cache, key = get_cache(), RUNNING_PREFIX + self.name
+		try:
+			if cache.decr(key) < 0:
+				cache.set(key, 0, RUNNING_TIMEOUT)
+		except ValueError:
+			pass
+
+	def acquire_slot(self):
+		if not self.shared:
+			return self.semaphore.acquire(blocking=False)
+
+		# the count expires in case a process dies while holding a slot, but not while the command is in use
+		cache, key = get_cache(), RUNNING_PREFIX + self.name
+		cache.add(key, 0, RUNNING_TIMEOUT)
+		try:
+			running = cache.incr(key)
+		except ValueError:
+			running = 1
+			cache.set(key, running, RUNNING_TIMEOUT)
+		if running < 1:
+			running = 1
+			cache.set(key, running, RUNNING_TIMEOUT)
+		cache.touch(key, RUNNING_TIMEOUT)
+
+		if running > self.max_concurrency:
+			self.release()
+			return False
+		return True
+
+	# counts the call against the current fixed window. returns the seconds until the window ends if over the limit.
+	def check_rate(self):
+		calls, seconds = self.rate_limit
+		now = time.time()
+		window = int(now // seconds)
+
+		if self.shared:
+			cache, key = get_cache(), '{0}{1}:{2}'.format(RATE_PREFIX, self.name, window)
+			cache.add(key, 0, seconds)
+			count = cache.incr(key)
+		else:
+			with self.lock:
+				if self.window != window:
+					self.window, self.count = window, 0
+				self.count += 1
+				count = self.count
+
+		if count > calls:
+			return max(1, int(seconds - now % seconds))
+		return None
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import autodiscover_modules
+from django.conf import settings
+from commands.base import CommandHandlerBase
+from commands.client import build_client, build_typings, client_filename
+import os
+
+
+class Command(BaseCommand):
+	help = 'Writes a javascript client with typescript typings for every command, so pages can skip loading definitions at runtime.'
+
+	def add_arguments(self, parser):
+		parser.add_argument('output', nargs='?', default=None,
+		                    help='The directory to write the client to. Defaults to the COMMANDS_CLIENT_DIR setting.')
+
+	def handle(self, *args, **options):
+		output = options['output'] or getattr(settings, 'COMMANDS_CLIENT_DIR', None)
+		if not output:
+			raise CommandError('No directory was given and the COMMANDS_CLIENT_DIR setting is not defined.')
+
+		autodiscover_modules(CommandHandlerBase._modules_to_register)
+		definitions = [handler_class.to_definition() for handler_class in CommandHandlerBase._registry.values()]
+
+		client, typings = build_client(definitions), build_typings(definitions)
+		filename = client_filename(client)
+		os.makedirs(output, exist_ok=True)
+		with open(os.path.join(output, filename), 'w') as file:
+			file.write(client)
+		with open(os.path.join(output, 'commands-client.d.ts'), 'w') as file:
+			file.write(typings)
+
+		self.stdout.write('Wrote {0} commands to {1} and commands-client.d.ts in {2}'.format(len(definitions), filename, output))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import autodiscover_modules
+from django.conf import settings
+from commands.base import CommandHandlerBase
+from commands.manifest import ManifestEntry, write_manifest
+from commands.permissions import has_custom_checks
+
+
+class Command(BaseCommand):
+	help = 'Writes a manifest of every command handler so the registry can be loaded without importing them.'
+
+	def add_arguments(self, parser):
+		parser.add_argument('path', nargs='?', default=None,
+		                    help='Where to write the manifest. Defaults to the COMMANDS_MANIFEST setting.')
+
+	def handle(self, *args, **options):
+		path = options['path'] or getattr(settings, 'COMMANDS_MANIFEST', None)
+		if not path:
+			raise CommandError('No path was given and the COMMANDS_MANIFEST setting is not defined.')
+
+		# importing every commands module directly so the manifest is built from the real handlers
+		autodiscover_modules(CommandHandlerBase._modules_to_register)
+		handlers = [handler_class for handler_class in CommandHandlerBase._registry.values()
+		            if not isinstance(handler_class, ManifestEntry)]
+
+		entries = write_manifest(path, handlers, has_custom_checks)
+		self.stdout.write('Wrote {0} commands to {1}'.format(len(entries), path))
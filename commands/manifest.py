@@ -0,0 +1,69 @@
+from .serializers import CommandJSONEncoder
+from django.core.exceptions import ImproperlyConfigured
+from importlib import import_module
+import json
+
+
+class ManifestEntry(object):
+	"""
+		A manifest entry stands in for a command handler in the registry until
+		the handler is actually needed. It knows enough about the handler to
+		describe it and to decide whether a user may see it, so listing the
+		available commands doesn't import any handler code. The handler's
+		module is imported the first time the command is dispatched.
+	"""
+
+	def __init__(self, registry, name, module, auth_required, permissions, custom_checks, definition):
+		self.registry = registry
+		self.command_name = name
+		self.module = module
+		self.auth_required = auth_required
+		self.permissions = permissions
+		self.custom_checks = custom_checks
+		self.definition = definition
+
+	# imports the handler's module, which registers the real handler in place of this entry
+	def load(self):
+		import_module(self.module)
+		handler_class = self.registry.get(self.command_name)
+		if handler_class is None or isinstance(handler_class, ManifestEntry):
+			raise ImproperlyConfigured('The command manifest is out of date. {0} was not found in {1}.'.format(self.command_name, self.module))
+		return handler_class
+
+	def to_definition(self):
+		return self.definition
+
+	# handlers with their own checks can only be asked once they've been imported
+	def validate_auth(self, request):
+		return self.load().validate_auth(request)
+
+	def validate_permissions(self, request):
+		return self.load().validate_permissions(request)
+
+
+# writes the manifest for the given handler classes to the path. param defaults are encoded the same
+# way as in responses, so e.g. a date default is listed as its iso format.
+def write_manifest(path, handlers, has_custom_checks):
+	entries = {}
+	for handler_class in handlers:
+		entries[handler_class.command_name] = {
+			'module': handler_class.__module__,
+			'auth_required': handler_class.auth_required,
+			'permissions': list(handler_class.permissions),
+			'custom_checks': has_custom_checks(handler_class),
+			'definition': handler_class.to_definition()
+		}
+
+	with open(path, 'w') as manifest:
+		json.dump({'commands': entries}, manifest, indent=2, sort_keys=True, cls=CommandJSONEncoder)
+
+	return entries
+
+
+# reads the manifest at the path into entries bound to the given registry
+def read_manifest(path, registry):
+	with open(path) as manifest:
+		entries = json.load(manifest)['commands']
+
+	return [ManifestEntry(registry, name, entry['module'], entry['auth_required'], entry['permissions'],
+	                      entry['custom_checks'], entry['definition']) for name, entry in entries.items()]
@@ -1,4 +1,89 @@
-from django.http import JsonResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from .serializers import get_serializer
+
+# the content types of the streaming formats
+NDJSON = 'application/x-ndjson'
+JSON = 'application/json'
+
+
+# encodes the content to json with the configured serializer
+def json_response(content, status):
+	return HttpResponse(get_serializer()(content), content_type=JSON, status=status)
+
+
+# encodes the items to json, yielding them in lists of up to chunk_size so each write isn't tiny
+def encoded_chunks(items, chunk_size):
+	serialize, chunk = get_serializer(), []
+	for item in items:
+		chunk.append(serialize(item))
+		if len(chunk) >= chunk_size:
+			yield chunk
+			chunk = []
+	if chunk:
+		yield chunk
+
+
+# encodes the items as newline delimited json
+def ndjson_stream(items, chunk_size):
+	for chunk in encoded_chunks(items, chunk_size):
+		yield b'\n'.join(chunk) + b'\n'
+
+
+# encodes the items as the results array of a regular success response, followed by any meta
+def json_array_stream(items, meta, chunk_size):
+	serialize = get_serializer()
+	yield b'{"results": ['
+	separator = b''
+	for chunk in encoded_chunks(items, chunk_size):
+		yield separator + b', '.join(chunk)
+		separator = b', '
+	yield b']'
+	for key, value in (meta or {}).items():
+		yield b', ' + serialize(key) + b': ' + serialize(value)
+	yield b'}'
+
+
+class ClosingStream(object):
+	"""
+		Wraps the content of a streamed response so that a callback runs once the
+		stream is over, whether it was read to the end or closed early by the server.
+		Given a context, each item is produced inside it, so the content keeps seeing
+		the context variables of the command that returned it while it's being sent.
+	"""
+
+	def __init__(self, content, callback, context=None):
+		self.content = content
+		self.callback = callback
+		self.context = context
+
+	def __iter__(self):
+		try:
+			if self.context is None:
+				yield from self.content
+			else:
+				iterator = iter(self.content)
+				while True:
+					try:
+						item = self.context.run(next, iterator)
+					except StopIteration:
+						return
+					yield item
+		finally:
+			self.close()
+
+	def close(self):
+		callback, self.callback = self.callback, None
+		if callback is not None:
+			callback()
+
+
+# runs the callback once the response has been sent if it's streamed, and returns whether it was. given a
+# context, the rest of the stream is produced inside it.
+def call_on_close(response, callback, context=None):
+	if not getattr(response, 'streaming', False):
+		return False
+	response.streaming_content = ClosingStream(response.streaming_content, callback, context)
+	return True
 
 
 class AjaxMixin(object):
@@ -13,16 +98,33 @@ class AjaxMixin(object):
 			content = {}
 
 		if meta: content.update(meta)
-		return JsonResponse(content, status=status)
+		return json_response(content, status)
 
 	@staticmethod
 	def error(message, meta=None, status=400):
 		content = {'error': message}
 		if meta: content.update(meta)
-		return JsonResponse(content, status=status)
+		return json_response(content, status)
 
 	@staticmethod
 	def errors(fields, meta=None, status=400):
 		content = {'errors': fields}
 		if meta: content.update(meta)
-		return JsonResponse(content, status=status)
+		return json_response(content, status)
+
+	# tells the client the request was turned away because of load and when it may try again
+	@staticmethod
+	def unavailable(status, message, retry_after, meta=None):
+		response = AjaxMixin.error(message, meta=meta, status=status)
+		response['Retry-After'] = str(retry_after)
+		return response
+
+	# streams the items of an iterable (e.g. queryset.iterator()) as they are produced instead of building
+	# the whole response in memory. ndjson sends one item per line and no meta. json sends the same body as #success.
+	@staticmethod
+	def stream(items, meta=None, status=200, format=NDJSON, chunk_size=100):
+		if format == NDJSON:
+			content = ndjson_stream(items, chunk_size)
+		else:
+			content = json_array_stream(items, meta, chunk_size)
+		return StreamingHttpResponse(content, content_type=format, status=status)
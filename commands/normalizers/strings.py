@@ -1,6 +1,9 @@
 from commands.decorators.normalizer import normalizer
 import html, re
 
+# compiled when the module is imported rather than each time a normalizer is made
+NON_DIGITS = re.compile(r'[^\d]+')
+
 
 def lowercase(key, order=0):
 
@@ -49,10 +52,8 @@ def html_decode(key, order=0):
 
 def only_numbers(key, order=0):
 
-	regex = re.compile(r'[^\d]+')
-
 	@normalizer(key, order)
 	def result(value):
-		return regex.sub('', value)
+		return NON_DIGITS.sub('', value)
 
 	return result
\ No newline at end of file
@@ -0,0 +1,115 @@
+from .manifest import ManifestEntry
+from .compat import is_authenticated
+from functools import cached_property
+import hashlib
+
+
+class PermissionSnapshot(object):
+	"""
+		A permission snapshot is everything about a user that decides which
+		commands they may execute. Each part of it is resolved at most once per
+		request, and only when a handler needs it, so checking a handler's
+		permissions is a set operation rather than a call into the auth backends.
+	"""
+
+	def __init__(self, user):
+		self.user = user
+		self.answers = {}
+
+	@cached_property
+	def authenticated(self):
+		return is_authenticated(self.user)
+
+	@cached_property
+	def superuser(self):
+		return getattr(self.user, 'is_active', False) and getattr(self.user, 'is_superuser', False)
+
+	@cached_property
+	def permissions(self):
+		return frozenset(self.user.get_all_permissions())
+
+	@cached_property
+	def fingerprint(self):
+		state = [self.authenticated, self.superuser]
+		state.extend(sorted(self.permissions))
+		return hashlib.sha1(repr(state).encode('utf-8')).hexdigest()
+
+	# returns the snapshot for the user on the request, resolving it the first time it is needed
+	@classmethod
+	def of(cls, request):
+		snapshot = getattr(request, '_command_permissions', None)
+		if snapshot is None:
+			snapshot = request._command_permissions = cls(request.user)
+		return snapshot
+
+	# the snapshot equivalent of user.has_perms. backends that answer has_perm without listing the permissions
+	# in get_all_permissions (e.g. rule based ones) are asked through the user, once per group of permissions.
+	def has_perms(self, permissions):
+		if not permissions:
+			return True
+		if self.superuser or self.permissions.issuperset(permissions):
+			return True
+
+		permissions = frozenset(permissions)
+		if permissions not in self.answers:
+			self.answers[permissions] = bool(self.user.has_perms(permissions))
+		return self.answers[permissions]
+
+
+# checks whether a handler has replaced the default auth or permission checks with its own
+def has_custom_checks(handler_class):
+	if isinstance(handler_class, ManifestEntry):
+		return handler_class.custom_checks
+	return handler_class.plan.custom_checks
+
+
+class PermissionIndex(object):
+	"""
+		The permission index groups handlers by the authentication and permissions
+		they require, so the handlers available to a user can be picked out
+		with one check per distinct group instead of one per handler. Handlers
+		that override validate_auth or validate_permissions are always
+		checked individually.
+	"""
+
+	def __init__(self, handlers):
+		groups, self.custom = {}, []
+
+		for position, handler_class in enumerate(handlers):
+			if has_custom_checks(handler_class):
+				self.custom.append((position, handler_class))
+			else:
+				key = (handler_class.auth_required, frozenset(handler_class.permissions))
+				groups.setdefault(key, []).append((position, handler_class))
+
+		self.groups = [(auth_required, permissions, tuple(members)) for (auth_required, permissions), members in groups.items()]
+		self.custom = tuple(self.custom)
+
+	# returns the handlers available to the user on the request, in registration order
+	def available(self, request):
+		snapshot, found = PermissionSnapshot.of(request), []
+
+		for auth_required, permissions, members in self.groups:
+			if auth_required and not snapshot.authenticated:
+				continue
+			if snapshot.has_perms(permissions):
+				found.extend(members)
+
+		found.extend(member for member, allowed in zip(self.custom, self.check_custom(request)) if allowed)
+
+		return [handler_class for position, handler_class in sorted(found, key=lambda member: member[0])]
+
+	# whether the user has the permissions of each group that requires any. these answers, along with those of
+	# the custom checks, can differ between users with the same permission snapshot fingerprint.
+	def check_groups(self, request):
+		snapshot = PermissionSnapshot.of(request)
+		return tuple(snapshot.has_perms(permissions) for auth_required, permissions, members in self.groups if permissions)
+
+	# runs the checks of the handlers that have their own, once per request, and returns whether each allows the user
+	def check_custom(self, request):
+		checks = getattr(request, '_command_custom_checks', None)
+		if checks is None:
+			checks = request._command_custom_checks = tuple(
+				bool(handler_class.validate_auth(request) and handler_class.validate_permissions(request))
+				for position, handler_class in self.custom)
+		return checks
@@ -0,0 +1,148 @@
+from .codecs import get_codec
+from .serializers import get_serializer
+from django.conf import settings
+from django.db import connections
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+import logging, threading
+
+logger = logging.getLogger(__name__)
+
+# what happens when a command goes over its query budget, chosen by the COMMANDS_QUERY_BUDGET_ACTION setting
+LOG, RAISE = 'log', 'raise'
+
+# the counter of the command that is running, if its queries are being counted
+current_counter = ContextVar('commands_query_counter', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+	"""
+		Raised when a command goes over its query budget and the
+		COMMANDS_QUERY_BUDGET_ACTION setting is 'raise'.
+	"""
+
+	def __init__(self, command_name, problems):
+		super().__init__('{0} {1}.'.format(command_name, '; '.join(problems)))
+		self.command_name = command_name
+		self.problems = problems
+
+
+class QueryCounter(object):
+	"""
+		An execute wrapper that counts the queries of a command, how long they took,
+		and how many times each shape of query was made. The shape is the sql before
+		the params are filled in, so the same query made in a loop for different rows
+		(the N+1 pattern) has one shape. The queries of a command may be made from
+		several threads at once, e.g. by concurrent validators.
+	"""
+
+	def __init__(self):
+		self.count = 0
+		self.time = 0.0
+		self.shapes = Counter()
+		self.lock = threading.Lock()
+
+	def __call__(self, execute, sql, params, many, context):
+		started = perf_counter()
+		try:
+			return execute(sql, params, many, context)
+		finally:
+			elapsed = perf_counter() - started
+			with self.lock:
+				self.count += 1
+				self.time += elapsed
+				self.shapes[sql] += 1
+
+	# the shapes that were made more than the given number of times, most repeated first
+	def repeated(self, limit):
+		if limit is None:
+			return []
+		return [(sql, count) for sql, count in self.shapes.most_common() if count > limit]
+
+	def to_meta(self, limit):
+		return {
+			'count': self.count,
+			'time': round(self.time * 1000, 3),
+			'repeated': [{'sql': sql, 'count': count} for sql, count in self.repeated(limit)]
+		}
+
+
+# the execute wrapper installed on every connection, which counts each query on the counter of the command
+# that made it. the counter is kept in a context variable, so it follows the command into the threads and
+# tasks that its validators and handler run on.
+def count_in_context(execute, sql, params, many, context):
+	counter = current_counter.get()
+	if counter is None:
+		return execute(sql, params, many, context)
+	return counter(execute, sql, params, many, context)
+
+
+# installs count_in_context on the connection. connected to the connection_created signal when the app is ready.
+def install_counter(connection, **kwargs):
+	if count_in_context not in connection.execute_wrappers:
+		connection.execute_wrappers.append(count_in_context)
+
+
+# counts the queries made on any connection by the code running in this context while the block runs
+@contextmanager
+def count_queries():
+	for connection in connections.all():
+		install_counter(connection)
+
+	counter = QueryCounter()
+	token = current_counter.set(counter)
+	try:
+		yield counter
+	finally:
+		current_counter.reset(token)
+
+
+# the number of times the same shape of query can be made before it's reported as a likely N+1
+def get_repeat_limit(handler_class):
+	if handler_class.max_repeated_queries is not None:
+		return handler_class.max_repeated_queries
+	return getattr(settings, 'COMMANDS_MAX_REPEATED_QUERIES', 10)
+
+
+# whether the queries of the handler's commands are counted. they are for handlers with a budget,
+# and for every handler when DEBUG or the COMMANDS_TRACK_QUERIES setting is on.
+def tracks_queries(handler_class):
+	return (handler_class.max_queries is not None or handler_class.max_query_time is not None or
+	        settings.DEBUG or getattr(settings, 'COMMANDS_TRACK_QUERIES', False))
+
+
+# returns the ways the counted queries broke the handler's budget
+def check_budget(handler_class, counter):
+	problems = []
+	if handler_class.max_queries is not None and counter.count > handler_class.max_queries:
+		problems.append('made {0} queries, over its budget of {1}'.format(counter.count, handler_class.max_queries))
+	if handler_class.max_query_time is not None and counter.time > handler_class.max_query_time:
+		problems.append('spent {0:.1f}ms in queries, over its budget of {1:.1f}ms'.format(counter.time * 1000, handler_class.max_query_time * 1000))
+	for sql, count in counter.repeated(get_repeat_limit(handler_class)):
+		problems.append('made the same query {0} times, which is likely an N+1: {1}'.format(count, sql))
+	return problems
+
+
+# logs or raises, depending on the COMMANDS_QUERY_BUDGET_ACTION setting, if the handler went over its budget
+def enforce_budget(handler_class, counter):
+	problems = check_budget(handler_class, counter)
+	if not problems:
+		return
+
+	if getattr(settings, 'COMMANDS_QUERY_BUDGET_ACTION', LOG) == RAISE:
+		raise QueryBudgetExceeded(handler_class.command_name, problems)
+	logger.warning('%s %s.', handler_class.command_name, '; '.join(problems))
+
+
+# adds the counted queries to the meta of a json response, under 'queries'
+def add_query_meta(response, handler_class, counter):
+	if getattr(response, 'streaming', False) or not response['Content-Type'].startswith('application/json'):
+		return response
+
+	content = get_codec().loads(response.content)
+	if isinstance(content, dict):
+		content['queries'] = counter.to_meta(get_repeat_limit(handler_class))
+		response.content = get_serializer()(content)
+	return response
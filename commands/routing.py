@@ -0,0 +1,120 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from contextvars import ContextVar, copy_context
+from .mixins import call_on_close
+import sys, time
+
+# the database alias that the reads of the running command are routed to, if any
+current_alias = ContextVar('commands_database_alias', default=None)
+
+# the session key holding the time until which the session's reads stay on the primary
+PINNED_KEY = '_commands_pinned_until'
+
+
+# the alias of the replica that read only commands are routed to, set by the COMMANDS_READ_REPLICA setting
+def get_replica():
+	return getattr(settings, 'COMMANDS_READ_REPLICA', None)
+
+
+# the alias of the primary that writes and atomic commands use, set by the COMMANDS_PRIMARY_DATABASE setting
+def get_primary():
+	return getattr(settings, 'COMMANDS_PRIMARY_DATABASE', DEFAULT_DB_ALIAS)
+
+
+# whether the session ran a write command recently enough that its reads should still go to the primary
+def is_pinned(request):
+	session = getattr(request, 'session', None)
+	return session is not None and session.get(PINNED_KEY, 0) > time.time()
+
+
+# keeps the session's reads on the primary for COMMANDS_STICKY_SECONDS, so it can read its own writes
+def pin(request):
+	seconds = getattr(settings, 'COMMANDS_STICKY_SECONDS', 0)
+	session = getattr(request, 'session', None)
+	if seconds and session is not None:
+		session[PINNED_KEY] = time.time() + seconds
+
+
+class CommandRoute(object):
+	"""
+		A command route is the database policy of a single command while it runs. Read only
+		commands have their queries routed to the replica, unless the session is pinned to the
+		primary after a recent write. Atomic commands run in a transaction that is rolled back
+		if they fail. The alias is kept in a context variable, so it follows the command into
+		the threads and tasks its validators and handler run on. A streamed response is still
+		running the command as it's sent, so the route stays in place until the stream is over.
+	"""
+
+	def __init__(self, request, handler_class):
+		self.request = request
+		self.read_only = handler_class.read_only
+		self.atomic = handler_class.atomic
+		self.transaction = None
+
+		replica = get_replica()
+		self.alias = replica if self.read_only and replica and not is_pinned(request) else None
+		self.using = self.alias or get_primary()
+
+	def __enter__(self):
+		self.token = current_alias.set(self.alias)
+		self.streaming = False
+		if self.atomic:
+			self.transaction = transaction.atomic(using=self.using)
+			self.transaction.__enter__()
+		return self
+
+	def __exit__(self, *exc_info):
+		try:
+			# the transaction of a streamed response is left open for the stream to close
+			if not self.streaming or exc_info[0] is not None:
+				return self.close_transaction(*exc_info)
+		finally:
+			current_alias.reset(self.token)
+
+	# commits or, if there was an error, rolls back the transaction of an atomic command
+	def close_transaction(self, *exc_info):
+		atomic, self.transaction = self.transaction, None
+		if atomic is not None:
+			return atomic.__exit__(*exc_info)
+
+	# closes the transaction once a streamed response is over. it is rolled back if the stream raised.
+	def close_stream(self):
+		error = sys.exc_info()[1]
+		if isinstance(error, Exception):
+			self.close_transaction(type(error), error, error.__traceback__)
+		else:
+			self.close_transaction(None, None, None)
+
+	# settles the route with the command's response. a failed atomic command is rolled back, and a
+	# successful write command pins the session to the primary. a streamed response is produced in
+	# the context of the route, and closes its transaction when it's done.
+	def finish(self, response):
+		if self.atomic and response.status_code >= 400:
+			transaction.set_rollback(True, using=self.using)
+		if not self.read_only and response.status_code < 400:
+			pin(self.request)
+		if self.alias is not None or self.atomic:
+			self.streaming = call_on_close(response, self.close_stream, copy_context())
+		return response
+
+
+class CommandRouter(object):
+	"""
+		A database router that sends the reads of read only commands to the replica. Add
+		'commands.routing.CommandRouter' to the front of the DATABASE_ROUTERS setting.
+		Outside of a read only command it has no opinion, so the next router decides.
+	"""
+
+	def db_for_read(self, model, **hints):
+		return current_alias.get()
+
+	# writes always go to the primary, even from a command that said it was read only
+	def db_for_write(self, model, **hints):
+		return get_primary() if current_alias.get() is not None else None
+
+	# the replica mirrors the primary, so objects from either may be related
+	def allow_relation(self, obj1, obj2, **hints):
+		aliases = {get_primary(), get_replica()}
+		if obj1._state.db in aliases and obj2._state.db in aliases:
+			return True
+		return None
@@ -0,0 +1,87 @@
+from .types import *
+import copy
+
+
+class SchemaError(TypeError):
+	"""
+		Raised by a compiled schema when part of a value isn't of the type declared
+		for it. The path locates the part, e.g. '.lines[2].quantity'. It is built
+		up as the error passes back out of each nested checker, so checking a
+		value that is valid never has to build a path.
+	"""
+
+	def __init__(self, path=''):
+		super().__init__('The value at {0} was of the wrong type.'.format(path or 'the root'))
+		self.path = path
+
+
+# compiles the checker for a field of a schema. the checker returns the cast value or raises a SchemaError.
+def compile_field(param):
+	if param.schema and param.type == Types.OBJECT:
+		return compile_object(param.schema)
+	if param.schema and param.type == Types.OBJECT_ARRAY:
+		return compile_each(compile_object(param.schema))
+
+	is_valid, cast, vector = param.type.value.is_valid, param.type.value.cast, param.vector
+
+	def check(value):
+		if not is_valid(value):
+			raise SchemaError()
+		try:
+			value = cast(value)
+		except TypeError:
+			raise SchemaError()
+		if isinstance(value, PackedArray):
+			return to_vector(value) if vector else value.tolist()
+		return value
+
+	return check
+
+
+# compiles the checker for an object with the given fields. the fields of the value are cast in place.
+def compile_object(fields):
+	compiled = tuple((field.name, field.required, field.default, compile_field(field)) for field in fields)
+
+	def check(value):
+		if not isinstance(value, dict):
+			raise SchemaError()
+
+		for name, required, default, check_field in compiled:
+			field = value.get(name)
+			if field is not None:
+				try:
+					value[name] = check_field(field)
+				except SchemaError as error:
+					raise SchemaError('.' + name + error.path)
+			elif required:
+				raise SchemaError('.' + name)
+			else:
+				value[name] = copy.deepcopy(default)
+
+		return value
+
+	return check
+
+
+# compiles the checker for an array whose entries are each checked by the given checker
+def compile_each(check_entry):
+
+	def check(value):
+		if not isinstance(value, list):
+			raise SchemaError()
+
+		for index, entry in enumerate(value):
+			try:
+				value[index] = check_entry(entry)
+			except SchemaError as error:
+				raise SchemaError('[{0}]{1}'.format(index, error.path))
+
+		return value
+
+	return check
+
+
+# compiles the schema of an object or object array param into a single function that
+# checks and casts a whole value in one pass, raising a SchemaError at the first mismatch
+def compile_schema(param):
+	return compile_field(param)
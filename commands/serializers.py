@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+from importlib import import_module
+import json
+
+_serializer = None
+
+
+class CommandJSONEncoder(DjangoJSONEncoder):
+	"""
+		The DjangoJSONEncoder (datetimes, decimals, uuids, lazy strings), plus
+		numeric arrays such as vector params, which are encoded as lists.
+	"""
+
+	def default(self, o):
+		if hasattr(o, 'tolist'):
+			return o.tolist()
+		return super().default(o)
+
+
+# encodes with the standard library's json module
+def json_serializer():
+	return lambda obj: json.dumps(obj, cls=CommandJSONEncoder).encode('utf-8')
+
+
+# encodes with orjson. datetimes are passed through to the same encoder as the standard library
+# so both produce the same output, and numpy arrays are encoded natively.
+def orjson_serializer():
+	orjson = import_module('orjson')
+	option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+	default = CommandJSONEncoder().default
+	return lambda obj: orjson.dumps(obj, default=default, option=option)
+
+
+# the serializers that can be chosen by name. anything else is treated as a dotted path to a callable.
+BUILTIN_SERIALIZERS = {'json': json_serializer, 'orjson': orjson_serializer}
+
+
+# loads the serializer with the given name or dotted path. custom callables may return str or bytes.
+def load_serializer(name):
+	if name in BUILTIN_SERIALIZERS:
+		return BUILTIN_SERIALIZERS[name]()
+
+	func = import_string(name)
+
+	def serialize(obj):
+		content = func(obj)
+		return content.encode('utf-8') if isinstance(content, str) else content
+
+	return serialize
+
+
+# returns the function chosen by the COMMANDS_SERIALIZER setting that encodes an object to json bytes,
+# loading it the first time it is needed
+def get_serializer():
+	global _serializer
+	if _serializer is None:
+		_serializer = load_serializer(getattr(settings, 'COMMANDS_SERIALIZER', 'json'))
+	return _serializer
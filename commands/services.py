@@ -1,6 +1,34 @@
 from .base import *
 from .mixins import *
 from .decorators import *
+from .permissions import *
+from .caching import ResultCache
+from .idempotency import IdempotencyStore, IN_FLIGHT, MISMATCHED
+from .jobs import submit_job, get_job, to_response as job_response
+from .timing import PhaseTimer, record_timing
+from .serializers import get_serializer
+from .compression import compress_response
+from .queries import count_queries, tracks_queries, enforce_budget, add_query_meta
+from .routing import CommandRoute
+from contextvars import copy_context
+import hashlib, socket
+
+# the status for commands that weren't run because the client went away, following nginx
+CLIENT_CLOSED_REQUEST = 499
+
+
+# checks whether the client that sent the request has closed its connection. only servers that expose
+# the connection's socket (gunicorn) can be checked, so with anything else the client is assumed to be there.
+def client_disconnected(request):
+	connection = request.META.get('gunicorn.socket')
+	if connection is None:
+		return False
+	try:
+		return connection.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b''
+	except BlockingIOError:
+		return False
+	except OSError:
+		return True
 
 @Singleton
 class CommandService(AjaxMixin):
@@ -16,61 +44,339 @@ class CommandService(AjaxMixin):
 	# handlers
 	handlers = CommandHandlerBase.registry
 
+	# the most permission fingerprints to keep serialized definitions for before starting over
+	definition_cache_size = 1024
+
+	# serialized definitions keyed by permission fingerprint, and the registry version they were built from.
+	# they're kept on the class, like the index below, so that whatever builds them (e.g. the warm up before
+	# the workers fork) builds them for every instance.
+	_definitions = {}
+	_definitions_version = None
+
+	# the permission index and the registry version it was built from
+	_index = None
+	_index_version = None
+
+	# the cache for the results of idempotent commands
+	results = ResultCache()
+
+	# makes sure a command sent again with the same idempotency key only runs once
+	idempotency = IdempotencyStore()
+
 	# used to retrieve a set of all commands and their required parameters
 	def get_all_definitions(self):
 		return [command.to_definition() for command in self.handlers.values()]
 
 	# used to retrieve a set of commands based on a particular user's permissions
 	def get_available_definitions(self, request):
-		return [command.to_definition() for command in self.handlers.values()
-		        if command.validate_auth(request) and command.validate_permissions(request)]
+		return [command.to_definition() for command in self.get_permission_index().available(request)]
+
+	# returns the version of the registry, making sure it has been populated first
+	def get_registry_version(self):
+		# reading the handlers is what triggers the registry to be populated
+		handlers = self.handlers
+		return CommandHandlerBase._registry_version
+
+	# returns the index of handlers by their required permissions, rebuilding it if the registry changed
+	def get_permission_index(self):
+		version = self.get_registry_version()
+		if self._index_version != version:
+			type(self)._index = PermissionIndex(self.handlers.values())
+			type(self)._index_version = version
+		return self._index
+
+	# identifies everything about the user that can affect which commands are available to them. auth backends
+	# may grant permissions they don't list, and handlers with their own checks may decide on anything about the
+	# request, so the answer for each group of permissions and each custom check are part of it too.
+	def get_permission_fingerprint(self, request):
+		index = self.get_permission_index()
+		checks = index.check_groups(request) + index.check_custom(request)
+		fingerprint = PermissionSnapshot.of(request).fingerprint
+		if checks:
+			fingerprint += ':' + ''.join('1' if allowed else '0' for allowed in checks)
+		return fingerprint
+
+	# returns an etag and the json serialized list of available definitions, cached per permission fingerprint
+	def get_serialized_definitions(self, request):
+		version = self.get_registry_version()
+
+		# any change to the registry invalidates everything that was serialized from it
+		if self._definitions_version != version or len(self._definitions) >= self.definition_cache_size:
+			type(self)._definitions = {}
+			type(self)._definitions_version = version
+
+		fingerprint = self.get_permission_fingerprint(request)
+		if fingerprint not in self._definitions:
+			content = get_serializer()(self.get_available_definitions(request)).decode('utf-8')
+			etag = '"{0}"'.format(hashlib.md5(content.encode('utf-8')).hexdigest())
+			self._definitions[fingerprint] = (etag, content)
+
+		return self._definitions[fingerprint]
+
+	# returns the result cache hits and misses for each command
+	def get_cache_stats(self):
+		return self.results.stats()
 
 	# method to check if a handler exists for the command
 	def has_handler(self, command_name):
 		return command_name in self.handlers
 
-	# returns the appropriate handler
+	# returns the appropriate handler, importing it first if it was only known from the manifest
 	def get_handler(self, command_name):
-		return self.handlers[command_name]
+		handler_class = self.handlers[command_name]
+		if isinstance(handler_class, ManifestEntry):
+			handler_class = handler_class.load()
+		return handler_class
 
-	# handles the dispatching and execution of a command
-	def dispatch(self, request):
+	# checks the user's permissions for a handler against the permission snapshot for the request
+	def check_permissions(self, request, handler_class):
+		if has_custom_checks(handler_class):
+			return handler_class.validate_permissions(request)
+		return PermissionSnapshot.of(request).has_perms(handler_class.permissions)
+
+	# checks whether the request was sent with a json body rather than form data
+	def is_json(self, request):
+		return request.META.get('CONTENT_TYPE', '').startswith('application/json')
+
+	# reads the command name and its data from either a json body or form data. the name is None if there wasn't one.
+	def read_command(self, request):
 
-		command_data = request.FILES.copy()
-		command_data.update(request.POST.copy())
+		# a json body holds the command name and its already deserialized params, parsed in one go
+		if self.is_json(request):
+			try:
+				body = get_codec().loads(request.body)
+			except ValueError:
+				return None, None, True
+
+			if not isinstance(body, dict) or not isinstance(body.get('command'), str):
+				return None, None, True
+
+			params = body.get('params')
+			return body['command'], params if isinstance(params, dict) else {}, True
+
+		command_data = RequestData(request)
 
 		# make sure they actually specified a command in the request
 		if not 'command' in command_data:
-			return self.error("No command parameter was received.")
+			return None, None, False
 
 		# retrieving the name of the command
-		command_name = json.loads(command_data.pop('command')[0])
+		try:
+			command_name = get_codec().loads(command_data['command'])
+		except ValueError:
+			return None, None, False
+		return command_name if isinstance(command_name, str) else None, command_data, False
 
-		# make sure a valid handler strategy exists.
+	# handles the dispatching and execution of a command
+	def dispatch(self, request):
+
+		timer = PhaseTimer()
+		command_name, command_data, decoded = self.read_command(request)
+		timer.mark('parse')
+		if command_name is None:
+			return self.error("No command parameter was received.")
+
+		# files that grew past their param's max size were dropped while they were being uploaded
+		oversized = getattr(request, '_command_oversized', None)
+		if oversized: return self.error(build_param_size_message(oversized), status=413)
+
+		response = self.execute_once(request, command_name, command_data, decoded, timer)
+		return self.compress(request, command_name, response)
+
+	# the async counterpart of dispatch, for use from async views under ASGI
+	async def adispatch(self, request):
+
+		timer = PhaseTimer()
+		command_name, command_data, decoded = self.read_command(request)
+		timer.mark('parse')
+		if command_name is None:
+			return self.error("No command parameter was received.")
+
+		# files that grew past their param's max size were dropped while they were being uploaded
+		oversized = getattr(request, '_command_oversized', None)
+		if oversized: return self.error(build_param_size_message(oversized), status=413)
+
+		response = await self.aexecute_once(request, command_name, command_data, decoded, timer)
+		return self.compress(request, command_name, response)
+
+	# handles the dispatching and execution of an ordered list of commands sent in a single request
+	def dispatch_batch(self, request):
+
+		# the commands may be sent as a json body or as a single json encoded form field
+		try:
+			entries = self.read_batch(request)
+		except (KeyError, ValueError):
+			return self.error("No commands parameter was received.")
+		if not isinstance(entries, list):
+			return self.error("The commands parameter must be a list of commands.")
+
+		results = []
+		for entry in entries:
+			if not isinstance(entry, dict) or not isinstance(entry.get('command'), str):
+				response = self.error("No command parameter was received.")
+			elif not isinstance(entry.get('params') or {}, dict):
+				response = self.error("The params of a command must be an object.")
+			else:
+				response = self.execute(request, entry['command'], entry.get('params') or {}, decoded=True)
+			results.append(self.to_entry(response))
+
+		return self.success(results)
+
+	# reads the list of commands from a batch request. raises KeyError if there isn't one and ValueError if it can't be decoded.
+	def read_batch(self, request):
+		if self.is_json(request):
+			body = get_codec().loads(request.body)
+			if not isinstance(body, dict):
+				raise KeyError('commands')
+			return body['commands']
+		return get_codec().loads(request.POST['commands'])
+
+	# converts the response of a single command into an entry of a batch response. a command that answers with
+	# something other than a json object (e.g. a csv download) can't be embedded, so its entry is an error instead.
+	def to_entry(self, response):
+		try:
+			if getattr(response, 'streaming', False):
+				content = b''.join(response.streaming_content).decode(response.charset)
+				if response['Content-Type'].startswith(NDJSON):
+					entry = {'results': [json.loads(line) for line in content.splitlines() if line]}
+				else:
+					entry = json.loads(content)
+			else:
+				entry = json.loads(response.content.decode(response.charset))
+		except ValueError:
+			entry = None
+		if not isinstance(entry, dict):
+			entry = {'error': "The command did not return a json object."}
+
+		entry['status'] = response.status_code
+		return entry
+
+	# runs a single command and records how long each phase took. decoded indicates the params are already deserialized.
+	def execute(self, request, command_name, command_data, decoded=False, timer=None):
+		timer = timer or PhaseTimer()
 		if not self.has_handler(command_name):
-			return self.error("No command handler exists for the requested command")
+			return self.run_command(request, command_name, command_data, decoded, timer)
 
-		# retrieving the class for the command handler
 		handler_class = self.get_handler(command_name)
+		with CommandRoute(request, handler_class) as route:
+			if not tracks_queries(handler_class):
+				response = self.run_command(request, command_name, command_data, decoded, timer)
+			else:
+				with count_queries() as queries:
+					response = self.run_command(request, command_name, command_data, decoded, timer)
+					response = self.account_queries(request, handler_class, queries, response)
+			route.finish(response)
 
-		# First, check if the user needs to be authenticated
-		if not handler_class.validate_auth(request):
-			return self.error("You must be an authenticated user to perform the requested command.", status=401)
+		return record_timing(command_name, timer, response)
 
-		# Next, check will be for the necessary permissions
-		if not handler_class.validate_permissions(request):
-			return self.error("Your user does not have the correct permissions for the requested command.", status=403)
+	# checks the queries a command made against its budget, keeps them on the request for tests to inspect,
+	# and adds them to the response meta when DEBUG is on. a streamed response keeps making queries while
+	# it's sent, so they are counted until it's done and only then checked. must be called while counting.
+	def account_queries(self, request, handler_class, queries, response):
+		request._command_queries = queries
+		if call_on_close(response, lambda: enforce_budget(handler_class, queries), copy_context()):
+			return response
+		enforce_budget(handler_class, queries)
+		return add_query_meta(response, handler_class, queries) if settings.DEBUG else response
+
+	# the async counterpart of execute
+	async def aexecute(self, request, command_name, command_data, decoded=False, timer=None):
+		timer = timer or PhaseTimer()
+		if not self.has_handler(command_name):
+			return await self.arun_command(request, command_name, command_data, decoded, timer)
+
+		# a transaction belongs to a single thread, so atomic commands run entirely in one
+		handler_class = self.get_handler(command_name)
+		if handler_class.atomic:
+			return await sync_to_async(self.execute)(request, command_name, command_data, decoded, timer)
+
+		with CommandRoute(request, handler_class) as route:
+			if not tracks_queries(handler_class):
+				response = await self.arun_command(request, command_name, command_data, decoded, timer)
+			else:
+				with count_queries() as queries:
+					response = await self.arun_command(request, command_name, command_data, decoded, timer)
+					response = self.account_queries(request, handler_class, queries, response)
+			route.finish(response)
+
+		return record_timing(command_name, timer, response)
+
+	# compresses the response if the command's handler asks for it, or if the COMMANDS_COMPRESS setting does
+	# for handlers that don't say. only whole responses are compressed, after they've been cached and stored.
+	def compress(self, request, command_name, response):
+		handler_class = self.get_handler(command_name) if self.has_handler(command_name) else None
+		enabled = getattr(handler_class, 'compress', None)
+		if enabled is None:
+			enabled = getattr(settings, 'COMMANDS_COMPRESS', False)
+		return compress_response(request, response) if enabled else response
+
+	# runs the command unless a request with the same idempotency key already has, in which case its response
+	# is replayed. a request whose key is still running elsewhere, or was used for other params, is turned away.
+	def execute_once(self, request, command_name, command_data, decoded=False, timer=None):
+		key = self.idempotency.key(request, command_name)
+		if key is None:
+			return self.execute(request, command_name, command_data, decoded, timer)
+
+		fingerprint = self.idempotency.fingerprint(command_name, command_data, decoded)
+		claimed, outcome = self.idempotency.begin(key, fingerprint)
+		if not claimed: return self.repeated(outcome)
+
+		try:
+			response = self.execute(request, command_name, command_data, decoded, timer)
+		except BaseException:
+			self.idempotency.abandon(key)
+			raise
 
-		# Next, check if required request parameters exist for the command
-		valid, message = handler_class.validate_param_existence(command_data)
-		if not valid: return self.error(message)
+		self.idempotency.finish(key, fingerprint, response)
+		return response
 
-		# Lastly, try to build an object with the right data types and attribute names
-		valid, result = handler_class.validate_param_types(command_data)
-		if not valid: return self.error(result)
+	# the async counterpart of execute_once
+	async def aexecute_once(self, request, command_name, command_data, decoded=False, timer=None):
+		key = self.idempotency.key(request, command_name)
+		if key is None:
+			return await self.aexecute(request, command_name, command_data, decoded, timer)
 
-		# creating an object with an attribute for each of the command params since type validation was okay
-		data = type(command_name, (object,), result)()
+		fingerprint = self.idempotency.fingerprint(command_name, command_data, decoded)
+		claimed, outcome = await sync_to_async(self.idempotency.begin)(key, fingerprint)
+		if not claimed: return self.repeated(outcome)
+
+		try:
+			response = await self.aexecute(request, command_name, command_data, decoded, timer)
+		except BaseException:
+			await sync_to_async(self.idempotency.abandon)(key)
+			raise
+
+		await sync_to_async(self.idempotency.finish)(key, fingerprint, response)
+		return response
+
+	# the response for a repeat of a command that wasn't run again, given the outcome of claiming its key
+	def repeated(self, outcome):
+		if outcome == MISMATCHED:
+			return self.error("The idempotency key was already used with different params.", status=422)
+		if outcome == IN_FLIGHT:
+			return self.error("A request with the same idempotency key is still running.", status=409)
+		return outcome
+
+	# runs a single command through validation and its handler, marking the end of each phase on the timer
+	def run_command(self, request, command_name, command_data, decoded, timer):
+
+		# make sure a valid handler strategy exists.
+		if not self.has_handler(command_name):
+			return self.error("No command handler exists for the requested command")
+
+		# retrieving the class for the command handler
+		handler_class = self.get_handler(command_name)
+		timer.mark('load')
+
+		# checking authentication and permissions
+		response = self.authorize(request, handler_class)
+		timer.mark('auth')
+		if response is not None: return response
+
+		# Lastly, check that every param exists and is of the right type, before anything has side effects
+		rejection, data = handler_class.bind_params(command_data, decoded)
+		timer.mark('params')
+		if rejection is not None: return self.error(rejection[0], status=rejection[1])
 
 		'''
 		Once we get here, everything that can be known outside of the specific business logic
@@ -79,16 +385,172 @@ class CommandService(AjaxMixin):
 		reasonably determined via the static context.
 		'''
 
+		# a client that has given up on the command, e.g. because it was superseded, doesn't need it run
+		if client_disconnected(request): return self.disconnected()
+
 		# nothing more can be done off of the static class definition, so go ahead and instantiate
 		handler = handler_class(request)
 
 		# performing any normalization prior to running custom validators
 		normalized_data, valid, errors = handler.perform_data_normalization(data)
+		timer.mark('normalize')
 		if not valid: return self.errors(errors)
 
 		# performing any last validation based on custom validation methods defined on the handler
 		valid, result = handler.perform_custom_validation(normalized_data)
+		timer.mark('validate')
 		if not valid: return self.errors(result)
 
-		# pass responsibility off to the actual handle method
-		return handler.handle(normalized_data)
\ No newline at end of file
+		# idempotent commands are served from the result cache once the request is known to be valid
+		key = self.results.key(request, handler_class, normalized_data) if handler_class.plan.cacheable else None
+		if key is not None:
+			response = self.results.get(handler_class, key)
+			timer.mark('cache')
+			if response is not None: return response
+
+		# validation may have taken a while, so check the client is still there before the expensive part
+		if client_disconnected(request): return self.disconnected()
+
+		# commands over their concurrency or rate limits are turned away rather than queued
+		limiter = handler_class.plan.limiter
+		if limiter is not None:
+			rejection = limiter.acquire()
+			if rejection is not None: return self.unavailable(*rejection)
+
+		try:
+			# background commands hand the handle method off to a job, which releases the limiter once it's done
+			if handler_class.background:
+				job_id = self.submit(request, handler, normalized_data, limiter)
+				limiter = None
+				return self.success(None, meta={'job': job_id, 'status': 'pending'}, status=202)
+
+			# pass responsibility off to the actual handle method
+			response = handler.run(normalized_data)
+			timer.mark('handle')
+			if key is not None: self.results.store(handler_class, key, response)
+
+			# a streamed response keeps running as it's sent, so it only gives its slot back once it's done
+			if limiter is not None and call_on_close(response, limiter.release): limiter = None
+			return response
+
+		finally:
+			if limiter is not None: limiter.release()
+
+	# the async counterpart of run_command. async normalizers, validators and handle methods run on the event loop.
+	async def arun_command(self, request, command_name, command_data, decoded, timer):
+
+		# make sure a valid handler strategy exists.
+		if not self.has_handler(command_name):
+			return self.error("No command handler exists for the requested command")
+
+		# retrieving the class for the command handler
+		handler_class = self.get_handler(command_name)
+		timer.mark('load')
+
+		# loading the user and their permissions may touch the database, so it happens in a thread
+		response = await sync_to_async(self.authorize)(request, handler_class)
+		timer.mark('auth')
+		if response is not None: return response
+
+		# check that every param exists and is of the right type, before anything has side effects
+		rejection, data = handler_class.bind_params(command_data, decoded)
+		timer.mark('params')
+		if rejection is not None: return self.error(rejection[0], status=rejection[1])
+
+		# a client that has given up on the command, e.g. because it was superseded, doesn't need it run
+		if client_disconnected(request): return self.disconnected()
+
+		# nothing more can be done off of the static class definition, so go ahead and instantiate
+		handler = handler_class(request)
+
+		# performing any normalization prior to running custom validators
+		normalized_data, valid, errors = await handler.aperform_data_normalization(data)
+		timer.mark('normalize')
+		if not valid: return self.errors(errors)
+
+		# performing any last validation based on custom validation methods defined on the handler
+		valid, result = await handler.aperform_custom_validation(normalized_data)
+		timer.mark('validate')
+		if not valid: return self.errors(result)
+
+		# idempotent commands are served from the result cache once the request is known to be valid
+		key = await sync_to_async(self.results.key)(request, handler_class, normalized_data) if handler_class.plan.cacheable else None
+		if key is not None:
+			response = await sync_to_async(self.results.get)(handler_class, key)
+			timer.mark('cache')
+			if response is not None: return response
+
+		# validation may have taken a while, so check the client is still there before the expensive part
+		if client_disconnected(request): return self.disconnected()
+
+		# commands over their concurrency or rate limits are turned away rather than queued
+		limiter = handler_class.plan.limiter
+		if limiter is not None:
+			rejection = await sync_to_async(limiter.acquire)() if limiter.shared else limiter.acquire()
+			if rejection is not None: return self.unavailable(*rejection)
+
+		try:
+			# background commands hand the handle method off to a job, which releases the limiter once it's done
+			if handler_class.background:
+				job_id = await sync_to_async(self.submit)(request, handler, normalized_data, limiter)
+				limiter = None
+				return self.success(None, meta={'job': job_id, 'status': 'pending'}, status=202)
+
+			# pass responsibility off to the actual handle method
+			response = await handler.arun(normalized_data)
+			timer.mark('handle')
+			if key is not None: await sync_to_async(self.results.store)(handler_class, key, response)
+
+			# a streamed response keeps running as it's sent, so it only gives its slot back once it's done
+			if limiter is not None and call_on_close(response, limiter.release): limiter = None
+			return response
+
+		finally:
+			if limiter is not None: await sync_to_async(limiter.release)() if limiter.shared else limiter.release()
+
+	# runs the handle method as a background job and returns the id of the job. the params are all loaded
+	# first, since the job may run after the request is over and its uploads are closed.
+	def submit(self, request, handler, data, limiter):
+		data.detach()
+
+		# the job runs on another thread after the request is over, so it routes and counts its own queries
+		def run():
+			handler_class = type(handler)
+			try:
+				with CommandRoute(request, handler_class) as route:
+					if not tracks_queries(handler_class):
+						return route.finish(handler.run(data))
+					with count_queries() as queries:
+						response = handler.run(data)
+						if not call_on_close(response, lambda: enforce_budget(handler_class, queries), copy_context()):
+							enforce_budget(handler_class, queries)
+					return route.finish(response)
+			finally:
+				if limiter is not None: limiter.release()
+
+		return submit_job(request.user, run)
+
+	# returns the response for a background job, if it belongs to the user on the request
+	def get_job_response(self, request, job_id):
+		record = get_job(job_id)
+		if record is None or record['user'] != request.user.pk:
+			return self.error("No job exists with the requested id.", status=404)
+		return job_response(record)
+
+	# the response for a command that was skipped because its client disconnected. nobody will read it,
+	# but it makes the skip visible in the access log and the timings.
+	def disconnected(self):
+		return self.error("The client disconnected before the command ran.", status=CLIENT_CLOSED_REQUEST)
+
+	# checks that the user is authenticated and has permissions for the handler, returning an error response if not
+	def authorize(self, request, handler_class):
+
+		# First, check if the user needs to be authenticated
+		if not handler_class.validate_auth(request):
+			return self.error("You must be an authenticated user to perform the requested command.", status=401)
+
+		# Next, check will be for the necessary permissions
+		if not self.check_permissions(request, handler_class):
+			return self.error("Your user does not have the correct permissions for the requested command.", status=403)
+
+		return None
\ No newline at end of file
@@ -0,0 +1,4 @@
+from django.dispatch import Signal
+
+# sent after each command with its name, a list of (phase, seconds) and the total seconds
+command_timed = Signal()
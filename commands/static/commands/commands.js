@@ -47,7 +47,7 @@
             data = this.build(data || {});
             if (Validation.validateCommand(this, data)) {
 
-                var promise = post(this.endpoint, data);
+                var promise = Policy.schedule(this, data);
 
                 if (success) {
                     promise.done(success);
@@ -70,6 +70,106 @@
             }
         },
 
+        /**
+         * Sets how calls of this command that overlap are handled. The policy is kept by command
+         * name, so it still applies after the definitions are reloaded.
+         *
+         * @param {object} options
+         * @param {boolean} [options.latest] Aborts the pending call when a new one is fired, so only the latest settles.
+         * @param {boolean} [options.dedupe] Returns the pending call instead of sending an identical one.
+         * @param {number} [options.debounce] Waits this many milliseconds for the calls to stop before sending
+         *                                    the last one. Every call made while waiting settles with its result.
+         * @returns {Command}
+         */
+        configure: function (options) {
+            Policy.configure(this.name, options);
+            return this;
+        },
+
+        /**
+         * Sends the command data straight away and returns a promise for the result that can be aborted.
+         *
+         * @param {object} data The built command data, including the command name.
+         * @returns {jQuery.Promise}
+         */
+        send: function (data) {
+            var deferred = $.Deferred(), endpoint = this.endpoint, request = null;
+
+            var promise = (exports.batching && !hasBinary(data)) ? Batch.enqueue(data) : awaitJob(request = Idempotency.send(data, function (key) {
+                return post(endpoint, data, {headers: {'X-Idempotency-Key': key}});
+            }));
+            promise.done(deferred.resolve).fail(deferred.reject);
+
+            var result = deferred.promise();
+            result.abort = function () {
+                // aborting the request closes the connection, which lets the server skip the command if it hasn't run yet
+                deferred.reject(null, 'abort', 'superseded');
+                if (request) {
+                    request.abort();
+                }
+            };
+            return result;
+        },
+
+        /**
+         * Executes a command whose handler streams its results as newline delimited json,
+         * calling the item callback with each result as soon as it arrives rather than
+         * waiting for the whole response.
+         *
+         * @param {object} [data]
+         * @param {function} item Called with each streamed result, in order.
+         * @param {function} [success] Called once the whole response has been received.
+         * @param {function} [failure]
+         */
+        stream: function (data, item, success, failure) {
+            data = this.build(data || {});
+            if (!Validation.validateCommand(this, data)) {
+                var message = this.toMessage(data);
+                if (failure) {
+                    failure(new Error(message));
+                }
+                else {
+                    console.error(message);
+                }
+                return null;
+            }
+
+            var offset = 0;
+            var consume = function (text, complete) {
+                var end = complete ? text.length : text.lastIndexOf('\n') + 1;
+                if (end > offset) {
+                    text.slice(offset, end).split('\n').forEach(function (line) {
+                        if (line) {
+                            item(JSON.parse(line));
+                        }
+                    });
+                    offset = end;
+                }
+            };
+
+            var promise = post(this.endpoint, data, {
+                dataType: 'text',
+                headers: {'Accept': 'application/x-ndjson'},
+                xhrFields: {
+                    onprogress: function (event) {
+                        consume(event.target.responseText, false);
+                    }
+                }
+            }).done(function (text) {
+                consume(text, true);
+            });
+
+            if (success) {
+                promise.done(success);
+            }
+
+            if (failure) {
+                promise.fail(failure);
+            }
+
+            return promise;
+        },
+
         /**
          * A method for testing a command during development.
          * It simply takes the response and logs it to the console.
@@ -144,6 +244,13 @@
          * @private
          */
         validateCommand: function (command, data) {
+            if (command.validate) {
+                var problem = command.validate(data);
+                if (problem !== null) {
+                    console.error(problem);
+                }
+                return problem === null;
+            }
             if (exports.hasOwnProperty(command.name)) {
                 for (var key in exports[command.name].params) {
                     var param = exports[command.name].params[key];
@@ -152,10 +259,14 @@
                         return false;
                     }
                     if (data.hasOwnProperty(key)) {
-                        if (!this._validateType(data[key], param.type)) {
+                        if (!this._validateType(data[key], param.type) || (param.schema && !this._validateSchema(data[key], param))) {
                             console.error("Invalid property type for property: " + key + ".");
                             return false;
                         }
+                        if (param.maxSize && data[key].size > param.maxSize) {
+                            console.error("Property: " + key + " is larger than " + param.maxSize + " bytes.");
+                            return false;
+                        }
                     }
                 }
             } else {
@@ -180,6 +291,26 @@
             return this._validators[type](obj);
         },
 
+        /**
+         * Checks the fields of an object, or of each object in an array, against the
+         * schema of the param. Optional fields may be missing or null.
+         *
+         * @param {object|object[]} obj
+         * @param {{type:string, schema:{name:string, type:string, required:boolean}[]}} param
+         */
+        _validateSchema: function (obj, param) {
+            var entries = param.type === 'object[]' ? obj : [obj];
+            return entries.every(function (entry) {
+                return param.schema.every(function (field) {
+                    var value = entry[field.name];
+                    if (value === undefined || value === null) {
+                        return !field.required;
+                    }
+                    return this._validateType(value, field.type) && (!field.schema || this._validateSchema(value, field));
+                }, this);
+            }, this);
+        },
+
         /**
          * Provides a single function for each
          * supported data type that returns a boolean
@@ -220,6 +351,9 @@
                 return (data instanceof Number || data.constructor === Number);
             },
             'float[]': function (data) {
+                if (data instanceof Float64Array || data instanceof Float32Array) {
+                    return true;
+                }
                 if (!Array.isArray(data)) {
                     return false;
                 }
@@ -234,6 +368,10 @@
                 return data === Math.floor(data);
             },
             'integer[]': function (data) {
+                if (data instanceof Int32Array || data instanceof Int16Array || data instanceof Int8Array ||
+                    data instanceof Uint16Array || data instanceof Uint8Array) {
+                    return true;
+                }
                 if (!Array.isArray(data)) {
                     return false;
                 }
@@ -269,6 +407,10 @@
         var form = new FormData();
         for (var key in obj) {
             var entry = obj[key];
+            if (ArrayBuffer.isView(entry)) {
+                form.append(key, packTypedArray(entry), key);
+                continue;
+            }
             switch (entry.constructor) {
                 case File:
                 case Blob:
@@ -281,6 +423,336 @@
         return form;
     };
 
+    /**
+     * Packs a typed array into a blob of its raw bytes, which the server unpacks
+     * in bulk instead of parsing a json array. Float arrays are sent as 64 bit
+     * floats and integer arrays as 32 bit integers.
+     *
+     * @param {ArrayBufferView} entry
+     * @returns {Blob}
+     */
+    var packTypedArray = function (entry) {
+        if (entry instanceof Float32Array) {
+            entry = new Float64Array(entry);
+        } else if (!(entry instanceof Float64Array || entry instanceof Int32Array)) {
+            entry = new Int32Array(entry);
+        }
+        return new Blob([entry], {type: 'application/octet-stream'});
+    };
+
+    /**
+     * Checks whether any of the entries in the data are binary, which
+     * means it has to be sent as its own form rather than in a batch.
+     *
+     * @param {object} obj
+     * @returns {boolean}
+     */
+    var hasBinary = function (obj) {
+        for (var key in obj) {
+            if (obj.hasOwnProperty(key) && (obj[key] instanceof Blob || ArrayBuffer.isView(obj[key]))) {
+                return true;
+            }
+        }
+        return false;
+    };
+
+
+    /**
+     * Polls the status of a background job until it has finished, then settles
+     * the deferred with the job's response as if it came from the command itself.
+     *
+     * @param {string} job The id of the job.
+     * @param {jQuery.Deferred} deferred
+     */
+    var pollJob = function (job, deferred) {
+        setTimeout(function () {
+            $.get(exports.jobs + job + '/').done(function (data, status, xhr) {
+                if (xhr.status === 202) {
+                    pollJob(job, deferred);
+                } else {
+                    deferred.resolve(data, status, xhr);
+                }
+            }).fail(function () {
+                deferred.reject.apply(deferred, arguments);
+            });
+        }, exports.pollInterval);
+    };
+
+
+    /**
+     * Wraps the request for a command so that, if the command was started as a
+     * background job, the promise only settles once the job has finished.
+     *
+     * @param {jQuery.xhr} request
+     * @returns {jQuery.Promise}
+     */
+    var awaitJob = function (request) {
+        var deferred = $.Deferred();
+        request.done(function (data, status, xhr) {
+            if (xhr.status === 202 && data && data.job) {
+                pollJob(data.job, deferred);
+            } else {
+                deferred.resolve(data, status, xhr);
+            }
+        }).fail(function () {
+            deferred.reject.apply(deferred, arguments);
+        });
+        return deferred.promise();
+    };
+
+
+    /**
+     * Applies the concurrency policy of each command to the calls fired for it.
+     */
+    var Policy = {
+
+        state: {},
+
+        /**
+         * Returns the policy and pending calls of the command with the given name.
+         *
+         * @param {string} name
+         * @returns {object}
+         */
+        get: function (name) {
+            if (!this.state.hasOwnProperty(name)) {
+                this.state[name] = {options: {}, pending: {}, current: null, timer: null, waiting: null};
+            }
+            return this.state[name];
+        },
+
+        /**
+         * Sets the policy of the command with the given name.
+         *
+         * @param {string} name
+         * @param {{latest:boolean, dedupe:boolean, debounce:number}} options
+         */
+        configure: function (name, options) {
+            this.get(name.toUpperCase()).options = options || {};
+        },
+
+        /**
+         * Fires the command data according to the command's policy.
+         *
+         * @param {Command} command
+         * @param {object} data The built command data, including the command name.
+         * @returns {jQuery.Promise}
+         */
+        schedule: function (command, data) {
+            var state = this.get(command.name);
+            if (!state.options.debounce) {
+                return this.dispatch(command, data, state);
+            }
+
+            clearTimeout(state.timer);
+            var waiting = state.waiting || (state.waiting = $.Deferred());
+            state.timer = setTimeout(function () {
+                state.waiting = null;
+                Policy.dispatch(command, data, state).done(waiting.resolve).fail(waiting.reject);
+            }, state.options.debounce);
+            return waiting.promise();
+        },
+
+        /**
+         * Sends the command data, unless an identical call is pending and the command dedupes,
+         * and aborts the pending call first if only the latest call should settle.
+         *
+         * @param {Command} command
+         * @param {object} data
+         * @param {object} state
+         * @returns {jQuery.Promise}
+         */
+        dispatch: function (command, data, state) {
+            var signature = (state.options.dedupe && !hasBinary(data)) ? JSON.stringify(data) : null;
+            if (signature !== null && state.pending.hasOwnProperty(signature)) {
+                return state.pending[signature];
+            }
+
+            if (state.options.latest && state.current) {
+                state.current.abort();
+            }
+
+            var call = command.send(data);
+            state.current = call;
+            if (signature !== null) {
+                state.pending[signature] = call;
+            }
+
+            return call.always(function () {
+                if (state.current === call) {
+                    state.current = null;
+                }
+                if (signature !== null) {
+                    delete state.pending[signature];
+                }
+            });
+        }
+    };
+
+
+    /**
+     * Gives each command fired an idempotency key, so the server runs it only once
+     * even if the request reaches it more than once. When the connection drops, or
+     * the server answers that the command is still running, the call is sent again
+     * with the same key, up to exports.retries times, so it settles with the stored
+     * response instead of running the command twice. A command fired again with
+     * the same data while the first is still pending (e.g. from a double click)
+     * shares the first one's request rather than sending another, which the server
+     * would turn away while the first is still running.
+     */
+    var Idempotency = {
+
+        pending: {},
+
+        /**
+         * Generates a new random key.
+         *
+         * @returns {string}
+         */
+        generate: function () {
+            var key = '';
+            for (var index = 0; index < 4; index++) {
+                key += Math.floor((1 + Math.random()) * 0x100000000).toString(16).substring(1);
+            }
+            return key;
+        },
+
+        /**
+         * Returns the request of an identical pending command, or sends the command data with a new key.
+         *
+         * @param {object} data The built command data, including the command name.
+         * @param {function(string):jQuery.xhr} send Sends the data with the given key.
+         * @returns {jQuery.Promise} A promise for the request that can be aborted.
+         */
+        send: function (data, send) {
+            if (hasBinary(data)) {
+                return this.retry(send, this.generate());
+            }
+
+            var signature = JSON.stringify(data), pending = this.pending;
+            if (pending.hasOwnProperty(signature)) {
+                return pending[signature];
+            }
+
+            var request = pending[signature] = this.retry(send, this.generate());
+            request.always(function () {
+                delete pending[signature];
+            });
+            return request;
+        },
+
+        /**
+         * Sends the data with the key, sending it again with the same key if the connection
+         * drops or the first attempt is still running on the server. Other failures, and
+         * aborting the returned promise, settle it straight away.
+         *
+         * @param {function(string):jQuery.xhr} send Sends the data with the given key.
+         * @param {string} key
+         * @returns {jQuery.Promise}
+         */
+        retry: function (send, key) {
+            var deferred = $.Deferred(), retries = exports.retries, current = null, timer = null;
+            var attempt = function () {
+                timer = null;
+                current = send(key);
+                current.done(deferred.resolve).fail(function (xhr, status) {
+                    if (retries > 0 && status !== 'abort' && (xhr.status === 0 || xhr.status === 409)) {
+                        retries--;
+                        timer = setTimeout(attempt, exports.retryDelay);
+                    } else {
+                        deferred.reject.apply(deferred, arguments);
+                    }
+                });
+            };
+            attempt();
+
+            var request = deferred.promise();
+            request.abort = function () {
+                clearTimeout(timer);
+                current.abort();
+                if (deferred.state() === 'pending') {
+                    deferred.reject(current, 'abort', 'abort');
+                }
+            };
+            return request;
+        }
+    };
+
+
+    /**
+     * Collects the commands fired within the same tick so that they
+     * can be sent to the server in a single batch request. Each command
+     * still gets its own promise that is resolved or rejected with its
+     * own entry from the batch response.
+     */
+    var Batch = {
+
+        pending: [],
+
+        /**
+         * Queues up the command data and schedules a flush if one is not already scheduled.
+         *
+         * @param {object} data The built command data, including the command name.
+         * @returns {jQuery.Promise}
+         */
+        enqueue: function (data) {
+            var deferred = $.Deferred(), params = $.extend({}, data);
+            delete params.command;
+
+            this.pending.push({command: data.command, params: params, deferred: deferred});
+            if (this.pending.length === 1) {
+                setTimeout($.proxy(this.flush, this), 0);
+            }
+
+            return deferred.promise();
+        },
+
+        /**
+         * Sends all of the pending commands and settles each of their promises.
+         */
+        flush: function () {
+            var entries = this.pending;
+            this.pending = [];
+
+            var commands = entries.map(function (entry) {
+                return {command: entry.command, params: entry.params};
+            });
+
+            var request;
+            if (exports.json) {
+                request = postJson(exports.batch, {commands: commands});
+            } else {
+                var form = new FormData();
+                form.append('commands', JSON.stringify(commands));
+                request = $.ajax({
+                    url: exports.batch,
+                    type: "POST",
+                    data: form,
+                    cache: false,
+                    contentType: false,
+                    processData: false
+                });
+            }
+
+            request.done(function (response) {
+                response.results.forEach(function (result, index) {
+                    if (result.status === 202 && result.job) {
+                        pollJob(result.job, entries[index].deferred);
+                    } else if (result.status === 200) {
+                        entries[index].deferred.resolve(result);
+                    } else {
+                        entries[index].deferred.reject(result);
+                    }
+                });
+            }).fail(function (error) {
+                entries.forEach(function (entry) {
+                    entry.deferred.reject(error);
+                });
+            });
+        }
+    };
+
+
     /**
      * We're defining our own version of jQuery's post method that will
      * process the data according to our own build method instead of
@@ -288,18 +760,47 @@
      *
      * @param {string} uri
      * @param {object} data
+     * @param {object} [options] Any additional options for the ajax request.
      * @returns {jQuery.xhr}
      */
-    var post = function (uri, data) {
+    var post = function (uri, data, options) {
+        if (exports.json && !hasBinary(data)) {
+            var params = $.extend({}, data);
+            delete params.command;
+            return postJson(uri, {command: data.command, params: params}, options);
+        }
+
         var payload = buildPayload(data);
-        return $.ajax({
+        return $.ajax($.extend(true, {
             url: uri,
             type: "POST",
             data: payload,
+            headers: {'X-Command': data.command},
             cache: false,
             contentType: false,
             processData: false
-        });
+        }, options));
+    };
+
+
+    /**
+     * Posts the body as a single json document, which the server can parse
+     * in one go instead of parsing each param of a form separately.
+     *
+     * @param {string} uri
+     * @param {object} body
+     * @param {object} [options] Any additional options for the ajax request.
+     * @returns {jQuery.xhr}
+     */
+    var postJson = function (uri, body, options) {
+        return $.ajax($.extend(true, {
+            url: uri,
+            type: "POST",
+            data: JSON.stringify(body),
+            cache: false,
+            contentType: 'application/json',
+            processData: false
+        }, options));
     };
 
 
@@ -307,6 +808,21 @@
 
         exports.available = module.config().availableUrl;
         exports.execution = module.config().executionUrl;
+        exports.batch = module.config().batchUrl || exports.execution + 'batch/';
+        exports.batching = !!module.config().batching;
+        exports.json = !!module.config().json;
+        exports.jobs = module.config().jobsUrl || exports.execution + 'jobs/';
+        exports.pollInterval = module.config().pollInterval || 1000;
+        exports.retries = module.config().hasOwnProperty('retries') ? module.config().retries : 2;
+        exports.retryDelay = module.config().retryDelay || 1000;
+
+        // the concurrency policies of commands, keyed by command name
+        var configured = module.config().policies || {};
+        for (var name in configured) {
+            if (configured.hasOwnProperty(name)) {
+                Policy.configure(name, configured[name]);
+            }
+        }
 
         if(module.config().hasOwnProperty('commands')) {
           // if the AMD module has already provided the available commands use those
@@ -315,7 +831,7 @@
               for (var index in def.params) {
                   if (def.params.hasOwnProperty(index)) {
                       var param = def.params[index];
-                      params[param.name] = {type: param.type, required: param.required};
+                      params[param.name] = {type: param.type, required: param.required, maxSize: param.max_size, schema: param.schema};
                       if (param.default !== undefined) {
                           defaults[param.name] = param.default;
                       }
@@ -330,8 +846,21 @@
 
         exports.available = '/commands/available/';
         exports.execution = '/commands/';
+        exports.batch = '/commands/batch/';
+        exports.batching = false;
+        exports.json = false;
+        exports.jobs = '/commands/jobs/';
+        exports.pollInterval = 1000;
+        exports.retries = 2;
+        exports.retryDelay = 1000;
     }
 
+
+    /**
+     * The keys on the exports that are part of the client rather than command definitions.
+     */
+    var reserved = ['UpdateDefinitions', 'register', 'available', 'execution', 'batch', 'batching', 'json', 'jobs', 'pollInterval', 'retries', 'retryDelay'];
+
     /**
      * This is the success function from a command definition retrieval.
      * It will populate the registry with defined commands.
@@ -345,7 +874,7 @@
             for (var index in def.params) {
                 if (def.params.hasOwnProperty(index)) {
                     var param = def.params[index];
-                    params[param.name] = {type: param.type, required: param.required};
+                    params[param.name] = {type: param.type, required: param.required, maxSize: param.max_size, schema: param.schema};
                     if (param.default !== undefined) {
                         defaults[param.name] = param.default;
                     }
@@ -367,6 +896,24 @@
     };
 
 
+    /**
+     * Registers a command with its own validation function instead of a definition. Used by the
+     * client generated with the commands_client management command, so pages don't need to load
+     * any definitions at runtime.
+     *
+     * @param {string} name
+     * @param {object.<string,*>} defaults Any defaults that should be applied.
+     * @param {function(object):?string} validate Returns the problem with the data, or null if there isn't one.
+     * @returns {Command}
+     */
+    exports.register = function (name, defaults, validate) {
+        var command = new Command(name, {}, defaults, exports.execution);
+        command.validate = validate;
+        exports[command.name] = command;
+        return command;
+    };
+
+
     /**
      * A publicly accessible method that reloads the available commands
      * cache that is used to validate commands before they are sent to the server.
@@ -376,7 +923,7 @@
      */
     exports.UpdateDefinitions = function (ready, error) {
         for(key in exports) {
-          if(key !== 'UpdateDefinitions' && key !== 'available' && key !== 'execution') {
+          if(reserved.indexOf(key) === -1) {
             delete exports[key];
           }
         }
@@ -0,0 +1,27 @@
+from .services import CommandService
+from .queries import QueryBudgetExceeded
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, override_settings
+import json
+
+service = CommandService()
+
+
+# runs the command with the params as the user (anonymous by default) and returns the response and the
+# queries it made. the command is dispatched the same way as a request to the execution route, and a
+# streamed response is read to the end so that its queries are counted too. a command that goes over its
+# query budget fails the test with an AssertionError.
+def assert_query_budget(command_name, params=None, user=None):
+	body = json.dumps({'command': command_name, 'params': params or {}})
+	request = RequestFactory().post('/', body, content_type='application/json')
+	request.user = user or AnonymousUser()
+
+	with override_settings(COMMANDS_TRACK_QUERIES=True, COMMANDS_QUERY_BUDGET_ACTION='raise'):
+		try:
+			response = service.dispatch(request)
+			if getattr(response, 'streaming', False):
+				response.streaming_content = [b''.join(response.streaming_content)]
+		except QueryBudgetExceeded as error:
+			raise AssertionError(str(error))
+
+	return response, getattr(request, '_command_queries', None)
@@ -0,0 +1,137 @@
+from .signals import command_timed
+from django.conf import settings
+from django.utils.module_loading import import_string
+from time import perf_counter
+import logging, socket
+
+logger = logging.getLogger(__name__)
+
+_sinks = None
+
+
+class PhaseTimer(object):
+	"""
+		A phase timer records how long each phase of dispatching a command took.
+		Each call to #mark closes the phase that has been running since the
+		previous mark (or since the timer was created).
+	"""
+
+	def __init__(self):
+		self.started = self.last = perf_counter()
+		self.phases = []
+
+	def mark(self, phase):
+		now = perf_counter()
+		self.phases.append((phase, now - self.last))
+		self.last = now
+
+	@property
+	def total(self):
+		return self.last - self.started
+
+	# the value of a Server-Timing header for the phases, in milliseconds
+	def to_header(self):
+		return ', '.join('{0};dur={1:.2f}'.format(phase, seconds * 1000) for phase, seconds in self.phases)
+
+
+class TimingSink(object):
+	"""
+		A timing sink receives the phase timings of every command. Sinks are
+		listed by dotted path in the COMMANDS_TIMING_SINKS setting.
+	"""
+
+	def record(self, command_name, phases, total):
+		raise NotImplementedError
+
+
+class SignalSink(TimingSink):
+	"""
+		Sends the command_timed signal for each command.
+	"""
+
+	def record(self, command_name, phases, total):
+		command_timed.send(sender=self.__class__, command_name=command_name, phases=phases, total=total)
+
+
+class LoggingSink(TimingSink):
+	"""
+		Logs the timings of each command at debug level.
+	"""
+
+	def record(self, command_name, phases, total):
+		breakdown = ', '.join('{0}={1:.2f}ms'.format(phase, seconds * 1000) for phase, seconds in phases)
+		logger.debug('%s took %.2fms (%s)', command_name, total * 1000, breakdown)
+
+
+class StatsdSink(TimingSink):
+	"""
+		Sends the timings of each command to a StatsD server over udp. The server is set by the
+		COMMANDS_STATSD_HOST and COMMANDS_STATSD_PORT settings, and every metric is named
+		<COMMANDS_STATSD_PREFIX>.<command>.<phase>.
+	"""
+
+	def __init__(self):
+		self.address = (getattr(settings, 'COMMANDS_STATSD_HOST', 'localhost'), getattr(settings, 'COMMANDS_STATSD_PORT', 8125))
+		self.prefix = getattr(settings, 'COMMANDS_STATSD_PREFIX', 'commands')
+		self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+	def record(self, command_name, phases, total):
+		lines = ['{0}.{1}.{2}:{3:.3f}|ms'.format(self.prefix, command_name, phase, seconds * 1000) for phase, seconds in phases]
+		lines.append('{0}.{1}.total:{2:.3f}|ms'.format(self.prefix, command_name, total * 1000))
+		try:
+			self.socket.sendto('\n'.join(lines).encode('utf-8'), self.address)
+		except OSError:
+			pass
+
+
+class PrometheusSink(TimingSink):
+	"""
+		Observes the timings of each command in a prometheus_client histogram
+		labelled by command and phase. Requires the prometheus_client package.
+	"""
+
+	histogram = None
+
+	def __init__(self):
+		from prometheus_client import Histogram
+		if PrometheusSink.histogram is None:
+			PrometheusSink.histogram = Histogram('command_phase_seconds', 'Time spent in each phase of a command.', ['command', 'phase'])
+
+	def record(self, command_name, phases, total):
+		for phase, seconds in phases:
+			self.histogram.labels(command_name, phase).observe(seconds)
+		self.histogram.labels(command_name, 'total').observe(total)
+
+
+class MemorySink(TimingSink):
+	"""
+		Keeps every timing in memory. Intended for tests.
+	"""
+
+	records = []
+
+	def record(self, command_name, phases, total):
+		MemorySink.records.append((command_name, phases, total))
+
+	@staticmethod
+	def clear():
+		del MemorySink.records[:]
+
+
+# returns the sinks chosen by the COMMANDS_TIMING_SINKS setting, creating them the first time they are needed
+def get_sinks():
+	global _sinks
+	if _sinks is None:
+		_sinks = [import_string(path)() for path in getattr(settings, 'COMMANDS_TIMING_SINKS', [])]
+	return _sinks
+
+
+# sends the timings of a command to the sinks, and adds a Server-Timing header if it's enabled
+def record_timing(command_name, timer, response):
+	for sink in get_sinks():
+		sink.record(command_name, timer.phases, timer.total)
+
+	if getattr(settings, 'COMMANDS_SERVER_TIMING', False):
+		response['Server-Timing'] = timer.to_header()
+
+	return response
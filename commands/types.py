@@ -1,5 +1,12 @@
 from enum import Enum, unique
-from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.uploadedfile import UploadedFile
+from array import array as PackedArray
+import mmap, sys
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
 
 # a decorator for converting a singular type into the array version
 def array(cls):
@@ -18,6 +25,61 @@ def array(cls):
 
 	return cls
 
+# a decorator for converting a numeric type into an array version that is checked and cast in bulk by
+# packing the values into an array.array of the typecode. the array can also be sent as the raw little
+# endian bytes of a javascript typed array, whose elements are of the wire typecode.
+def packed(typecode, wire_typecode):
+
+	def decorator(cls):
+
+		old_valid = cls.is_valid
+
+		def new_valid(value):
+			return isinstance(value, (list, PackedArray))
+
+		# raises a TypeError if any of the values isn't of the type
+		def new_cast(value):
+			if isinstance(value, PackedArray):
+				return value
+			try:
+				return PackedArray(typecode, value)
+			except OverflowError:
+				# integers too large to pack are still valid, they just stay as a list
+				if all(map(old_valid, value)):
+					return list(value)
+				raise TypeError('The values are not all of the type.')
+
+		# raises a ValueError if the bytes aren't a whole number of elements
+		def unpack(raw):
+			values = PackedArray(wire_typecode)
+			if len(raw) % values.itemsize:
+				raise ValueError('The bytes are not a whole number of elements.')
+			values.frombytes(raw)
+			if sys.byteorder == 'big':
+				values.byteswap()
+			return values if wire_typecode == typecode else PackedArray(typecode, values)
+
+		cls.is_valid = new_valid
+		cls.cast = new_cast
+		cls.unpack = unpack
+
+		return cls
+
+	return decorator
+
+# hands packed values to a handler as a numpy array sharing their memory, or as they are without numpy
+def to_vector(values):
+	if numpy is None or not isinstance(values, PackedArray):
+		return values
+	return numpy.frombuffer(values, dtype=values.typecode)
+
+# returns a read only memory mapped view of an upload that was written to disk
+def memory_map(upload):
+	if not hasattr(upload, 'temporary_file_path') or not upload.size:
+		return upload
+	with open(upload.temporary_file_path(), 'rb') as handle:
+		return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
 class ParamTypeBase(object):
 
 	representation = ''
@@ -35,7 +97,7 @@ class Blob(ParamTypeBase):
 	representation = 'blob'
 
 	def is_valid(value):
-		return isinstance(value, InMemoryUploadedFile)
+		return isinstance(value, UploadedFile)
 
 	def cast(value):
 		return value
@@ -62,7 +124,7 @@ class Float(ParamTypeBase):
 	def cast(value):
 		return float(value)
 
-@array
+@packed('d', 'd')
 class FloatArray(Float):
 	representation = 'float[]'
 
@@ -75,7 +137,7 @@ class Integer(ParamTypeBase):
 	def cast(value):
 		return value
 
-@array
+@packed('q', 'i')
 class IntegerArray(Integer):
 	representation = 'integer[]'
 
@@ -0,0 +1,80 @@
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopFutureHandlers
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from .services import CommandService
+
+# the header the client uses to say which command a multipart upload is for
+COMMAND_HEADER = 'HTTP_X_COMMAND'
+
+service = CommandService()
+
+
+class CommandUploadHandler(FileUploadHandler):
+	"""
+		An upload handler for command requests. Add it to the front of the
+		FILE_UPLOAD_HANDLERS setting. Files for params that declare a max_size
+		or that are streamed are written straight to a temporary file as each
+		chunk arrives, so they never sit in memory. Their size is checked as
+		they are received, and a file that grows past its cap is dropped
+		without reading the rest of it into memory. Every other upload, and
+		every request that isn't for a command, is left to the next handler.
+	"""
+
+	def __init__(self, request=None):
+		super().__init__(request)
+		self.specs = {}
+		self.spec = None
+
+		# looking up the params of the command from the registry, without touching the request body
+		command_name = request.META.get(COMMAND_HEADER) if request is not None else None
+		if command_name and service.has_handler(command_name):
+			plan = service.get_handler(command_name).plan
+			self.specs = {spec.name: spec for spec in plan.specs if spec.max_size or spec.stream}
+
+	# django closes the file attribute of every upload handler that has one when an upload is skipped or
+	# fails, so this handler only has a file while it is writing one of its own
+	def drop_file(self):
+		if hasattr(self, 'file'):
+			self.file.close()
+			del self.file
+
+	# records a param that was too large on the request so dispatch can report it
+	def reject(self, field_name):
+		oversized = getattr(self.request, '_command_oversized', None)
+		if oversized is None:
+			oversized = self.request._command_oversized = []
+		oversized.append(field_name)
+		self.drop_file()
+		raise SkipFile()
+
+	def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+		super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+		self.spec = self.specs.get(field_name)
+
+		if self.spec is not None:
+			if self.spec.max_size and content_length and content_length > self.spec.max_size:
+				self.reject(field_name)
+			self.file = TemporaryUploadedFile(file_name, content_type, 0, charset, content_type_extra)
+
+			# this file is ours, so the handlers after this one shouldn't start buffering it too
+			raise StopFutureHandlers()
+
+	def receive_data_chunk(self, raw_data, start):
+		if not hasattr(self, 'file'):
+			return raw_data
+
+		if self.spec.max_size and start + len(raw_data) > self.spec.max_size:
+			self.reject(self.field_name)
+
+		self.file.write(raw_data)
+		return None
+
+	# hands the finished file over to the request, which closes it once the response has been sent
+	def file_complete(self, file_size):
+		if not hasattr(self, 'file'):
+			return None
+
+		upload = self.file
+		del self.file
+		upload.seek(0)
+		upload.size = file_size
+		return upload
@@ -1,8 +1,16 @@
-from django.conf.urls import patterns, url
+from django.urls import re_path
+from django.conf import settings
 from .views import *
 
+# ASGI deployments can opt into executing commands from the event loop.
+execution_view = AsyncCommandHandler if getattr(settings, 'COMMANDS_ASYNC', False) else CommandHandler
+
+app_name = 'commands'
+
 # Defining routes that apply to the command app.
 urlpatterns = [
-   url(r'^$', CommandHandler.as_view(), name='execution'),
-   url(r'^available/$', AvailableCommandDefinitions.as_view(), name='available'),
+   re_path(r'^$', execution_view.as_view(), name='execution'),
+   re_path(r'^batch/$', BatchCommandHandler.as_view(), name='batch'),
+   re_path(r'^jobs/(?P<job_id>[0-9a-f]+)/$', JobStatus.as_view(), name='job'),
+   re_path(r'^available/$', AvailableCommandDefinitions.as_view(), name='available'),
 ]
@@ -1,6 +1,9 @@
 from commands.decorators.validator import validator
 import re
 
+# compiled when the module is imported rather than each time a validator is made
+EMAIL = re.compile(r'[^@]+@[^@]+\.[^@]+')
+
 
 def not_blank(key, message, order=0):
 
@@ -13,11 +16,9 @@ def not_blank(key, message, order=0):
 
 def email(key, message, order=0):
 
-	regex = re.compile(r'[^@]+@[^@]+\.[^@]+')
-
 	@validator(key, message, order)
 	def result(value):
-		return regex.match(value)
+		return EMAIL.match(value)
 
 	return result
 
@@ -1,4 +1,6 @@
 from django.views.generic import View
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
 from .services import *
 from .mixins import *
 
@@ -18,6 +20,48 @@ class CommandHandler(View, AjaxMixin):
 		# dispatch the request to the appropriate handler along with a mutable copy of the POST contents
 		return self.service.dispatch(request)
 
+'''
+	The async counterpart of the CommandHandler for ASGI deployments. Commands
+	with async handlers run directly on the event loop.
+'''
+class AsyncCommandHandler(View, AjaxMixin):
+
+	service = CommandService()
+
+	async def get(self, request, *args, **kwargs):
+		return self.error("Get requests are not supported for this endpoint.")
+
+	async def post(self, request, *args, **kwargs):
+		return await self.service.adispatch(request)
+
+'''
+	This controller is responsible for receiving an ordered list of commands
+	to execute in a single request and returning a result for each of them.
+'''
+class BatchCommandHandler(View, AjaxMixin):
+
+	service = CommandService()
+
+	def get(self, request, *args, **kwargs):
+		return self.error("Get requests are not supported for this endpoint.")
+
+	def post(self, request, *args, **kwargs):
+		return self.service.dispatch_batch(request)
+
+'''
+	This controller is responsible for reporting the status of a command
+	running in the background, and its response once it has finished.
+'''
+class JobStatus(View, AjaxMixin):
+
+	service = CommandService()
+
+	def get(self, request, job_id, *args, **kwargs):
+		return self.service.get_job_response(request, job_id)
+
+	def post(self, request, *args, **kwargs):
+		return self.error("Post requests are not supported for this endpoint.")
+
 '''
 	This controller is responsible for describing the commands
 	that are available to a particular user based on their authentication
@@ -28,8 +72,18 @@ class AvailableCommandDefinitions(View, AjaxMixin):
 	service = CommandService()
 
 	def get(self, request, *args, **kwargs):
-		commands = self.service.get_available_definitions(request)
-		return self.success(commands)
+		etag, commands = self.service.get_serialized_definitions(request)
+
+		if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+			response = HttpResponseNotModified()
+		else:
+			response = HttpResponse('{"results": ' + commands + '}', content_type='application/json')
+
+		# the definitions depend on the user, so only the user's own browser may reuse them
+		response['ETag'] = etag
+		response['Cache-Control'] = 'private, no-cache'
+		patch_vary_headers(response, ('Cookie',))
+		return response
 
 	def post(self, request, *args, **kwargs):
 		return self.error("Post requests are not supported for this endpoint.")
\ No newline at end of file
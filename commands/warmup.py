@@ -0,0 +1,76 @@
+from .base import CommandHandlerBase
+from .services import CommandService
+# imported for their module level patterns, so they compile before the workers fork
+from .normalizers import strings as normalizer_strings
+from .validators import strings as validator_strings
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpRequest
+from django.utils.module_loading import module_has_submodule
+from importlib import import_module
+from time import perf_counter
+import gc, logging
+
+logger = logging.getLogger(__name__)
+
+# whether freeze has already run in this process
+_frozen = False
+
+
+# imports the commands module of every installed app, like autodiscover_modules, and returns how long each
+# app took as (app label, seconds), slowest first. handler regexes and plans are compiled as their classes register.
+def import_commands_modules():
+	module_name = CommandHandlerBase._modules_to_register
+	timings = []
+	for app_config in apps.get_app_configs():
+		if module_has_submodule(app_config.module, module_name):
+			started = perf_counter()
+			import_module('{0}.{1}'.format(app_config.name, module_name))
+			timings.append((app_config.label, perf_counter() - started))
+	return sorted(timings, key=lambda timing: timing[1], reverse=True)
+
+
+# the request the definitions are serialized for while warming up, which is what an anonymous visitor sends
+def anonymous_request():
+	request = HttpRequest()
+	request.method = 'GET'
+	request.user = AnonymousUser()
+	return request
+
+
+# does everything the first request to a worker would otherwise pay for. the registry is filled with the real
+# handlers instead of waiting for first access or a manifest, and the permission index and the definitions an
+# anonymous user sees are built and serialized. they're kept on the CommandService class, so every worker
+# starts with them. with the COMMANDS_GC_FREEZE setting on, what's been loaded is then frozen (see freeze).
+def warm_up():
+	started = perf_counter()
+	timings = import_commands_modules()
+	CommandHandlerBase._registry_populated = True
+
+	service = CommandService()
+	service.get_permission_index()
+	try:
+		service.get_serialized_definitions(anonymous_request())
+	except Exception:
+		# handlers with custom checks may expect more of the request than warming up can give them
+		logger.warning('Could not serialize the definitions for an anonymous user while warming up', exc_info=True)
+
+	for label, seconds in timings:
+		logger.info('Imported the commands of %s in %.1fms', label, seconds * 1000)
+	logger.info('Warmed up %d commands in %.1fms', len(CommandHandlerBase._registry), (perf_counter() - started) * 1000)
+
+	if getattr(settings, 'COMMANDS_GC_FREEZE', False):
+		freeze()
+	return timings
+
+
+# moves everything allocated so far out of the garbage collector's reach, so collections in forked workers don't
+# write to it and copy the memory they share with the master. only worth it under a preforking server, where it's
+# best called as late as possible before forking, e.g. from gunicorn's pre_fork hook. gc.freeze needs python 3.7.
+def freeze():
+	global _frozen
+	if not _frozen:
+		gc.collect()
+		gc.freeze()
+		_frozen = True
@@ -0,0 +1,25 @@
+"""
+	Runs the test suite against the settings in tests/settings.py:
+
+		python runtests.py                        # everything
+		python runtests.py tests.test_dispatch    # a single module
+"""
+import os, sys
+
+import django
+from django.conf import settings
+from django.test.utils import get_runner
+
+
+def main():
+	os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.settings')
+	sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+	django.setup()
+
+	runner = get_runner(settings)()
+	failures = runner.run_tests(sys.argv[1:] or ['tests'])
+	sys.exit(bool(failures))
+
+
+if __name__ == '__main__':
+	main()
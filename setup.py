@@ -19,15 +19,27 @@ setup(
 	include_package_data=True,
 	long_description=README,
 	packages=["commands"],
+	python_requires='>=3.8',
+	install_requires=[
+		'Django>=3.2',
+		'asgiref>=3.3',
+	],
 	classifiers=[
 		'Environment :: Web Environment',
 		'Framework :: Django',
+		'Framework :: Django :: 3.2',
+		'Framework :: Django :: 4.2',
+		'Framework :: Django :: 5.2',
 		'Intended Audience :: Developers',
 		'License :: OSI Approved :: MIT License',
 		'Operating System :: OS Independent',
 		'Programming Language :: Python',
 		'Programming Language :: Python :: 3',
-		'Programming Language :: Python :: 3.4',
+		'Programming Language :: Python :: 3.8',
+		'Programming Language :: Python :: 3.9',
+		'Programming Language :: Python :: 3.10',
+		'Programming Language :: Python :: 3.11',
+		'Programming Language :: Python :: 3.12',
 		'Topic :: Internet :: WWW/HTTP',
 		'Topic :: Internet :: WWW/HTTP :: Dynamic Content',
 	],
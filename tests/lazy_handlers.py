@@ -0,0 +1,10 @@
+# Handlers that the manifest tests expect not to be imported until their command is dispatched.
+from commands.base import *
+
+
+class LazyHandler(CommandHandlerBase):
+	command_name = 'MANIFEST_LAZY'
+	params = [Param('n', Types.INTEGER)]
+
+	def handle(self, data):
+		return self.success(data.n + 1)
@@ -0,0 +1,52 @@
+# Settings for running the test suite. Run it from the root of the repository with: python runtests.py
+SECRET_KEY = 'tests'
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['*']
+
+INSTALLED_APPS = (
+	'django.contrib.auth',
+	'django.contrib.contenttypes',
+	'django.contrib.sessions',
+	'commands',
+	'tests',
+)
+
+MIDDLEWARE = (
+	'django.contrib.sessions.middleware.SessionMiddleware',
+	'django.contrib.auth.middleware.AuthenticationMiddleware',
+)
+
+# the replica is a separate database rather than a test mirror, so the tests can tell which one a query went to
+DATABASES = {
+	'default': {
+		'ENGINE': 'django.db.backends.sqlite3',
+		'NAME': ':memory:',
+	},
+	'replica': {
+		'ENGINE': 'django.db.backends.sqlite3',
+		'NAME': ':memory:',
+	}
+}
+
+DATABASE_ROUTERS = ['commands.routing.CommandRouter']
+
+CACHES = {
+	'default': {
+		'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+	}
+}
+
+TEMPLATES = [
+	{
+		'BACKEND': 'django.template.backends.django.DjangoTemplates',
+		'APP_DIRS': True,
+	}
+]
+
+ROOT_URLCONF = 'tests.urls'
+
+USE_TZ = True
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
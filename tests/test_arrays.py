@@ -0,0 +1,65 @@
+from commands.base import *
+from commands.types import PackedArray, numpy
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from .utils import post_command, read_json
+import json, sys
+
+
+# the bytes commands.js sends for a typed array, which are always little endian
+def typed_array(typecode, values):
+	packed = PackedArray(typecode, values)
+	if sys.byteorder == 'big':
+		packed.byteswap()
+	return SimpleUploadedFile('values', packed.tobytes())
+
+
+class SumHandler(CommandHandlerBase):
+	command_name = 'ARRAYS_SUM'
+	params = [Param('floats', Types.FLOAT_ARRAY, required=False), Param('integers', Types.INTEGER_ARRAY, required=False)]
+
+	def handle(self, data):
+		return self.success({'floats': data.floats, 'integers': data.integers})
+
+
+class VectorHandler(CommandHandlerBase):
+	command_name = 'ARRAYS_VECTOR'
+	params = [Param('values', Types.FLOAT_ARRAY, vector=True)]
+
+	def handle(self, data):
+		return self.success({'type': type(data.values).__name__, 'sum': float(sum(data.values))})
+
+
+class ArrayTests(TestCase):
+
+	def post_bytes(self, command_name, **files):
+		data = dict(files, command=json.dumps(command_name))
+		return self.client.post('/commands/', data)
+
+	def test_json_arrays_are_cast(self):
+		response = post_command('ARRAYS_SUM', floats=[1, 2.5], integers=[1, 2])
+		self.assertEqual(read_json(response), {'result': {'floats': [1.0, 2.5], 'integers': [1, 2]}})
+
+	def test_wrong_entries_are_rejected(self):
+		self.assertEqual(post_command('ARRAYS_SUM', floats=[1, 'two']).status_code, 400)
+		self.assertEqual(post_command('ARRAYS_SUM', integers=[1, 2.5]).status_code, 400)
+		self.assertEqual(post_command('ARRAYS_SUM', integers=[True, 'x']).status_code, 400)
+
+	def test_integers_too_large_to_pack_stay_a_list(self):
+		response = post_command('ARRAYS_SUM', integers=[1, 2 ** 70])
+		self.assertEqual(read_json(response), {'result': {'floats': None, 'integers': [1, 2 ** 70]}})
+
+	def test_typed_array_bytes(self):
+		response = self.post_bytes('ARRAYS_SUM', floats=typed_array('d', [0.5, 1.5]), integers=typed_array('i', [-3, 4]))
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(read_json(response), {'result': {'floats': [0.5, 1.5], 'integers': [-3, 4]}})
+
+	def test_partial_elements_are_rejected(self):
+		response = self.post_bytes('ARRAYS_SUM', floats=SimpleUploadedFile('floats', b'\x00' * 12))
+		self.assertEqual(response.status_code, 400)
+		self.assertEqual(read_json(response), {'error': 'The following parameters were of the wrong type: floats'})
+
+	def test_vector(self):
+		response = post_command('ARRAYS_VECTOR', values=[1, 2, 3])
+		expected = 'ndarray' if numpy is not None else 'array'
+		self.assertEqual(read_json(response), {'result': {'type': expected, 'sum': 6.0}})
@@ -0,0 +1,64 @@
+from commands.base import *
+from commands.compat import is_authenticated
+from django.test import AsyncClient, TestCase
+from .utils import command_form, post_command, read_json
+import asyncio
+
+
+class AsyncEchoHandler(CommandHandlerBase):
+	command_name = 'ASYNC_ECHO'
+	params = [Param('text', Types.STRING)]
+
+	@validator('text', 'The text cannot be blank.')
+	async def validate_text(text):
+		await asyncio.sleep(0)
+		return bool(text.strip())
+
+	async def handle(self, data):
+		await asyncio.sleep(0)
+		return self.success(data.text)
+
+
+class SyncEchoHandler(CommandHandlerBase):
+	command_name = 'ASYNC_SYNC_ECHO'
+	params = [Param('text', Types.STRING)]
+
+	def handle(self, data):
+		return self.success(data.text)
+
+
+class AsyncDispatchTests(TestCase):
+
+	def test_async_handler_on_the_sync_route(self):
+		response = post_command('ASYNC_ECHO', text='hello')
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(read_json(response), {'result': 'hello'})
+
+	async def test_async_handler_on_the_async_route(self):
+		response = await AsyncClient().post('/async/', command_form('ASYNC_ECHO', text='hello'))
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(read_json(response), {'result': 'hello'})
+
+	async def test_async_validator_failure(self):
+		response = await AsyncClient().post('/async/', command_form('ASYNC_ECHO', text='  '))
+		self.assertEqual(response.status_code, 400)
+		self.assertEqual(read_json(response), {'errors': {'text': ['The text cannot be blank.']}})
+
+	async def test_sync_handler_on_the_async_route(self):
+		response = await AsyncClient().post('/async/', command_form('ASYNC_SYNC_ECHO', text='hello'))
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(read_json(response), {'result': 'hello'})
+
+
+class IsAuthenticatedTests(TestCase):
+
+	def test_property_and_method_forms(self):
+		class PropertyUser(object):
+			is_authenticated = True
+
+		class MethodUser(object):
+			def is_authenticated(self):
+				return True
+
+		self.assertTrue(is_authenticated(PropertyUser()))
+		self.assertTrue(is_authenticated(MethodUser()))
@@ -0,0 +1,69 @@
+from commands.base import *
+from django.http import HttpResponse
+from django.test import TestCase
+from .utils import read_json
+import json
+
+
+class DoubleHandler(CommandHandlerBase):
+	command_name = 'BATCH_DOUBLE'
+	params = [Param('n', Types.INTEGER)]
+
+	def handle(self, data):
+		return self.success(data.n * 2)
+
+
+class CsvHandler(CommandHandlerBase):
+	command_name = 'BATCH_CSV'
+
+	def handle(self, data):
+		return HttpResponse('a,b\n1,2\n', content_type='text/csv')
+
+
+class BatchTests(TestCase):
+
+	def post_form(self, commands):
+		return self.client.post('/commands/batch/', {'commands': commands})
+
+	def post_json(self, body):
+		return self.client.post('/commands/batch/', body, content_type='application/json')
+
+	def test_results_in_order(self):
+		commands = [{'command': 'BATCH_DOUBLE', 'params': {'n': 1}}, {'command': 'BATCH_DOUBLE', 'params': {'n': 'x'}},
+		            {'command': 'BATCH_DOUBLE', 'params': {'n': 3}}, {'params': {}}]
+		for response in (self.post_form(json.dumps(commands)), self.post_json(json.dumps({'commands': commands}))):
+			self.assertEqual(response.status_code, 200)
+			results = read_json(response)['results']
+			self.assertEqual([result['status'] for result in results], [200, 400, 200, 400])
+			self.assertEqual(results[0]['result'], 2)
+			self.assertEqual(results[2]['result'], 6)
+
+	def test_malformed_form_body(self):
+		self.assertEqual(self.post_form('[{"command": ').status_code, 400)
+		self.assertEqual(self.client.post('/commands/batch/', {}).status_code, 400)
+
+	def test_malformed_json_body(self):
+		self.assertEqual(self.post_json('{"commands": [').status_code, 400)
+		self.assertEqual(self.post_json('{}').status_code, 400)
+		self.assertEqual(self.post_json('[]').status_code, 400)
+
+	def test_commands_must_be_a_list(self):
+		self.assertEqual(self.post_json('{"commands": {}}').status_code, 400)
+
+	def test_params_must_be_an_object(self):
+		commands = [{'command': 'BATCH_DOUBLE', 'params': 'nn'}, {'command': 'BATCH_DOUBLE', 'params': [1]},
+		            {'command': 'BATCH_DOUBLE', 'params': {'n': 2}}]
+		response = self.post_json(json.dumps({'commands': commands}))
+		self.assertEqual(response.status_code, 200)
+		results = read_json(response)['results']
+		self.assertEqual([result['status'] for result in results], [400, 400, 200])
+		self.assertEqual(results[0]['error'], "The params of a command must be an object.")
+		self.assertEqual(results[2]['result'], 4)
+
+	def test_responses_that_are_not_json(self):
+		commands = [{'command': 'BATCH_CSV'}, {'command': 'BATCH_DOUBLE', 'params': {'n': 2}}]
+		response = self.post_json(json.dumps({'commands': commands}))
+		self.assertEqual(response.status_code, 200)
+		results = read_json(response)['results']
+		self.assertEqual(results[0], {'error': "The command did not return a json object.", 'status': 200})
+		self.assertEqual(results[1]['result'], 4)
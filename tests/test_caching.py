@@ -0,0 +1,77 @@
+from commands.base import *
+from commands.services import CommandService
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import Client, TestCase
+from .utils import post_command, read_json
+
+calls = []
+allowed = {'codes': {'A', 'B'}}
+
+
+class LookupHandler(CommandHandlerBase):
+	command_name = 'CACHING_LOOKUP'
+	params = [Param('code', Types.STRING)]
+	cache_timeout = 60
+	cache_tags = ['caching-products']
+
+	@normalizer('code')
+	def upper_code(code):
+		return code.upper()
+
+	@validator('code', 'The code is not allowed.')
+	def validate_code(code):
+		return code in allowed['codes']
+
+	def handle(self, data):
+		calls.append(data.code)
+		return self.success(len(calls))
+
+
+class WhoAmIHandler(CommandHandlerBase):
+	command_name = 'CACHING_WHOAMI'
+	params = [Param('code', Types.STRING)]
+	cache_timeout = 60
+
+	@validator('code', 'The code cannot be blank.')
+	def validate_code(self, code):
+		return bool(code)
+
+	def handle(self, data):
+		return self.success(self.user.username)
+
+
+class CachingTests(TestCase):
+
+	def setUp(self):
+		cache.clear()
+		calls.clear()
+		allowed['codes'] = {'A', 'B'}
+
+	def test_repeated_calls_are_cached(self):
+		self.assertEqual(read_json(post_command('CACHING_LOOKUP', code='a')), {'result': 1})
+		self.assertEqual(read_json(post_command('CACHING_LOOKUP', code='A')), {'result': 1})
+		self.assertEqual(read_json(post_command('CACHING_LOOKUP', code='b')), {'result': 2})
+		self.assertEqual(calls, ['A', 'B'])
+
+		stats = CommandService().get_cache_stats()['CACHING_LOOKUP']
+		self.assertGreaterEqual(stats['hits'], 1)
+
+	def test_invalidating_a_tag(self):
+		post_command('CACHING_LOOKUP', code='a')
+		CommandHandlerBase.invalidate_cache('caching-products')
+		self.assertEqual(read_json(post_command('CACHING_LOOKUP', code='a')), {'result': 2})
+
+	def test_validators_run_before_the_cache(self):
+		self.assertEqual(post_command('CACHING_LOOKUP', code='a').status_code, 200)
+		allowed['codes'] = set()
+		self.assertEqual(post_command('CACHING_LOOKUP', code='a').status_code, 400)
+
+	def test_instance_validators_vary_by_user(self):
+		self.assertTrue(WhoAmIHandler.plan.cache_per_user)
+		self.assertFalse(LookupHandler.plan.cache_per_user)
+
+		for username in ('alice', 'bob'):
+			client = Client()
+			client.force_login(User.objects.create_user(username))
+			self.assertEqual(read_json(post_command('CACHING_WHOAMI', client=client, code='x')), {'result': username})
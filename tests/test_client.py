@@ -0,0 +1,104 @@
+from commands.base import *
+from commands.client import build_client, build_typings, interface_name
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from unittest import skipUnless
+import datetime, io, json, os, shutil, subprocess, tempfile
+
+
+class ScheduleHandler(CommandHandlerBase):
+	command_name = 'CLIENT_SCHEDULE'
+	params = [
+		Param('when', Types.STRING, required=False, default=datetime.date(2020, 1, 2)),
+		Param('count', Types.INTEGER),
+		Param('values', Types.FLOAT_ARRAY, required=False),
+		Param('options', Types.OBJECT, required=False, schema=[Param('label', Types.STRING)])
+	]
+
+	def handle(self, data):
+		return self.success(None)
+
+
+class RenderHandler(CommandHandlerBase):
+	command_name = '3d-render'
+
+	def handle(self, data):
+		return self.success(None)
+
+
+DEFINITIONS = [ScheduleHandler.to_definition(), RenderHandler.to_definition()]
+
+# runs the generated client against a stand in for commands.js and prints what each command's validation
+# function says about each of the given data
+RUN_CLIENT = '''
+var vm = require('vm'), input = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+var sandbox = {
+    Blob: function () {}, File: function () {},
+    commands: {register: function (name, defaults, validate) { return {defaults: defaults, validate: validate}; }}
+};
+vm.runInNewContext(input.client, sandbox);
+var client = sandbox.commandsClient;
+console.log(JSON.stringify(input.cases.map(function (entry) {
+    return {defaults: client[entry[0]].defaults, problem: client[entry[0]].validate(entry[1])};
+})));
+'''
+
+
+class ClientTests(SimpleTestCase):
+
+	def test_interface_names_are_identifiers(self):
+		self.assertEqual(interface_name('PLACE_ORDER'), 'PlaceOrderParams')
+		self.assertEqual(interface_name('3d-render'), '_3dRenderParams')
+
+	def test_typings_describe_the_exported_client(self):
+		typings = build_typings(DEFINITIONS)
+		self.assertNotIn('export declare', typings)
+		self.assertIn('    "3d-render": commandsClient.Command<commandsClient._3dRenderParams>;\n', typings)
+		self.assertIn('    "CLIENT_SCHEDULE": commandsClient.Command<commandsClient.ClientScheduleParams>;\n', typings)
+		self.assertIn('        "when"?: string;\n        "count": number;\n', typings)
+		self.assertTrue(typings.endswith('export = commandsClient;\nexport as namespace commandsClient;\n'))
+
+	def test_clashing_interface_names_are_kept_apart(self):
+		definitions = [dict(RenderHandler.to_definition(), name=name) for name in ('A_B', 'A-B')]
+		typings = build_typings(definitions)
+		self.assertIn('"A-B": commandsClient.Command<commandsClient.ABParams>', typings)
+		self.assertIn('"A_B": commandsClient.Command<commandsClient._ABParams>', typings)
+
+	def test_defaults_use_the_serializer(self):
+		self.assertIn('commands.register("CLIENT_SCHEDULE", {"when": "2020-01-02"}', build_client(DEFINITIONS))
+
+	@skipUnless(shutil.which('node'), 'node is not installed')
+	def test_generated_validation(self):
+		cases = [
+			('CLIENT_SCHEDULE', {'count': 1}),
+			('CLIENT_SCHEDULE', {}),
+			('CLIENT_SCHEDULE', {'count': 1.5}),
+			('CLIENT_SCHEDULE', {'count': 1, 'values': [1, 'x']}),
+			('CLIENT_SCHEDULE', {'count': 1, 'options': {'label': 2}}),
+			('CLIENT_SCHEDULE', {'count': 1, 'options': {'label': 'x'}}),
+			('3d-render', {})
+		]
+		stdin = json.dumps({'client': build_client(DEFINITIONS), 'cases': cases})
+		output = subprocess.run(['node', '-e', RUN_CLIENT], input=stdin, capture_output=True, text=True, check=True).stdout
+		self.assertEqual([result['problem'] for result in json.loads(output)], [
+			None,
+			'Required Parameter: count was missing.',
+			'Invalid property type for property: count.',
+			'Invalid property type for property: values.',
+			'Invalid property type for property: options.',
+			None,
+			None
+		])
+		self.assertEqual(json.loads(output)[0]['defaults'], {'when': '2020-01-02'})
+
+	def test_management_command(self):
+		output = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, output)
+		stdout = io.StringIO()
+		call_command('commands_client', output, stdout=stdout)
+
+		files = set(os.listdir(output))
+		self.assertIn('commands-client.d.ts', files)
+		[client] = files - {'commands-client.d.ts'}
+		with open(os.path.join(output, client)) as file:
+			self.assertIn('client["CLIENT_SCHEDULE"] = commands.register(', file.read())
@@ -0,0 +1,53 @@
+from commands.base import *
+from django.contrib.auth.models import User
+from django.test import Client, TestCase
+from .utils import read_json
+
+
+class AliceOnlyHandler(CommandHandlerBase):
+	command_name = 'DEFINITIONS_ALICE_ONLY'
+
+	@classmethod
+	def validate_auth(cls, request):
+		return request.user.username == 'alice'
+
+	def handle(self, data):
+		return self.success(None)
+
+
+class DefinitionTests(TestCase):
+
+	def client_for(self, username):
+		client = Client()
+		client.force_login(User.objects.create_user(username))
+		return client
+
+	def names(self, client):
+		return {definition['name'] for definition in read_json(client.get('/commands/available/'))['results']}
+
+	def test_custom_checks_are_not_shared_between_users_with_the_same_permissions(self):
+		alice, bob = self.client_for('alice'), self.client_for('bob')
+		self.assertIn('DEFINITIONS_ALICE_ONLY', self.names(alice))
+		self.assertNotIn('DEFINITIONS_ALICE_ONLY', self.names(bob))
+		self.assertIn('DEFINITIONS_ALICE_ONLY', self.names(alice))
+
+	def test_etag(self):
+		client = self.client_for('carol')
+		response = client.get('/commands/available/')
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+		etag = response['ETag']
+		self.assertEqual(client.get('/commands/available/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+		self.assertNotEqual(self.client_for('alice').get('/commands/available/')['ETag'], etag)
+
+	def test_template_tag(self):
+		from django.template import RequestContext, Template
+		from django.test import RequestFactory
+		from django.contrib.auth.models import AnonymousUser
+
+		request = RequestFactory().get('/')
+		request.user = AnonymousUser()
+		content = Template('{% load commands %}{% commands %}').render(RequestContext(request))
+		self.assertNotIn('DEFINITIONS_ALICE_ONLY', content)
+		self.assertIn('"commands": [', content)
@@ -0,0 +1,53 @@
+from commands.base import *
+from django.test import Client, TestCase
+from .utils import command_form, read_json
+import socket
+
+runs = []
+
+
+class SaveHandler(CommandHandlerBase):
+	command_name = 'DISCONNECT_SAVE'
+	params = [Param('value', Types.STRING)]
+
+	def handle(self, data):
+		runs.append(data.value)
+		return self.success(None)
+
+
+class DisconnectTests(TestCase):
+
+	def setUp(self):
+		runs.clear()
+		# stands in for the connection gunicorn exposes in the environ, with the client at the other end
+		self.server, self.client_end = socket.socketpair()
+
+	def tearDown(self):
+		self.server.close()
+		self.client_end.close()
+
+	def post(self, **params):
+		return Client().post('/commands/', command_form('DISCONNECT_SAVE', **params), **{'gunicorn.socket': self.server})
+
+	def test_connected_client(self):
+		self.assertEqual(self.post(value='a').status_code, 200)
+		self.assertEqual(runs, ['a'])
+
+	def test_pending_request_data_is_left_unread(self):
+		self.client_end.sendall(b'pipelined')
+		self.assertEqual(self.post(value='a').status_code, 200)
+		self.assertEqual(self.server.recv(16), b'pipelined')
+
+	def test_disconnected_client_is_skipped(self):
+		self.client_end.close()
+		response = self.post(value='a')
+		self.assertEqual(response.status_code, 499)
+		self.assertEqual(read_json(response), {'error': 'The client disconnected before the command ran.'})
+		self.assertEqual(runs, [])
+
+	def test_params_are_still_checked_first(self):
+		self.client_end.close()
+		self.assertEqual(self.post(value=1).status_code, 400)
+
+	def test_servers_without_a_socket(self):
+		self.assertEqual(Client().post('/commands/', command_form('DISCONNECT_SAVE', value='a')).status_code, 200)
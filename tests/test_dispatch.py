@@ -0,0 +1,75 @@
+from commands.base import *
+from django.test import TestCase
+from .utils import post_command, read_json
+
+
+class OrderHandler(CommandHandlerBase):
+	command_name = 'DISPATCH_ORDER'
+	params = [
+		Param('product', Types.STRING),
+		Param('quantity', Types.INTEGER),
+		Param('note', Types.STRING, required=False)
+	]
+
+	@normalizer('product')
+	def strip_product(product):
+		return product.strip()
+
+	@normalizer('product', order=1)
+	def upper_product(product):
+		return product.upper()
+
+	@validator('quantity', 'The quantity must be positive.')
+	def validate_quantity(quantity):
+		return quantity > 0
+
+	@validator('product', 'The product is unknown.')
+	def validate_product(self, product):
+		return product in ('APPLE', 'PEAR')
+
+	def handle(self, data):
+		return self.success({'product': data.product, 'quantity': data.quantity, 'note': data.note})
+
+
+class DispatchTests(TestCase):
+
+	def test_success(self):
+		response = post_command('DISPATCH_ORDER', product=' apple ', quantity=2)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(read_json(response), {'result': {'product': 'APPLE', 'quantity': 2, 'note': None}})
+
+	def test_no_command(self):
+		response = self.client.post('/commands/', {})
+		self.assertEqual(response.status_code, 400)
+
+	def test_unknown_command(self):
+		response = post_command('DISPATCH_UNKNOWN')
+		self.assertEqual(response.status_code, 400)
+		self.assertEqual(read_json(response), {'error': 'No command handler exists for the requested command'})
+
+	def test_missing_params(self):
+		response = post_command('DISPATCH_ORDER')
+		self.assertEqual(response.status_code, 400)
+		self.assertEqual(read_json(response), {'error': 'The following parameters were missing: product, quantity'})
+
+	def test_wrong_type(self):
+		response = post_command('DISPATCH_ORDER', product='apple', quantity='two')
+		self.assertEqual(response.status_code, 400)
+		self.assertEqual(read_json(response), {'error': 'The following parameters were of the wrong type: quantity'})
+
+	def test_validators_report_every_failure(self):
+		response = post_command('DISPATCH_ORDER', product='plum', quantity=0)
+		self.assertEqual(response.status_code, 400)
+		self.assertEqual(read_json(response), {'errors': {
+			'quantity': ['The quantity must be positive.'],
+			'product': ['The product is unknown.']
+		}})
+
+	def test_plan_is_compiled_at_registration(self):
+		plan = OrderHandler.plan
+		self.assertEqual(plan.names, ('product', 'quantity', 'note'))
+		self.assertEqual([func.__name__ for func in plan.normalizers], ['strip_product', 'upper_product'])
+		self.assertEqual(OrderHandler.to_definition()['params'][2], {'name': 'note', 'type': 'string', 'required': False})
+
+	def test_get_is_rejected(self):
+		self.assertEqual(self.client.get('/commands/').status_code, 400)
@@ -0,0 +1,88 @@
+from commands.base import *
+from django.core.cache import cache
+from django.test import Client, TestCase
+from .utils import command_form, command_json, read_json
+import time
+
+runs = []
+repeats = []
+
+
+class CountHandler(CommandHandlerBase):
+	command_name = 'IDEMPOTENCY_COUNT'
+	params = [Param('amount', Types.INTEGER), Param('repeat', Types.BOOLEAN, required=False)]
+
+	def handle(self, data):
+		runs.append(data.amount)
+
+		# sends the same command again while this one is still running, like a retry after a timeout would
+		if data.repeat:
+			started = time.monotonic()
+			response = send(amount=data.amount, repeat=True)
+			repeats.append((response.status_code, time.monotonic() - started))
+
+		return self.success(len(runs))
+
+
+class StreamHandler(CommandHandlerBase):
+	command_name = 'IDEMPOTENCY_STREAM'
+
+	def handle(self, data):
+		runs.append(None)
+		return self.stream(iter([1]))
+
+
+def send(command_name='IDEMPOTENCY_COUNT', key='key-1', client=None, **params):
+	return (client or Client()).post('/commands/', command_form(command_name, **params), HTTP_X_IDEMPOTENCY_KEY=key)
+
+
+class IdempotencyTests(TestCase):
+
+	def setUp(self):
+		cache.clear()
+		runs.clear()
+		repeats.clear()
+
+	def test_repeat_replays_the_response(self):
+		first, second = send(amount=1), send(amount=1)
+		self.assertEqual(runs, [1])
+		self.assertEqual(read_json(second), read_json(first))
+		self.assertEqual(second['Idempotent-Replayed'], 'true')
+		self.assertFalse(first.has_header('Idempotent-Replayed'))
+
+	def test_repeat_with_other_params_is_rejected(self):
+		send(amount=1)
+		response = send(amount=2)
+		self.assertEqual(response.status_code, 422)
+		self.assertEqual(runs, [1])
+
+	def test_json_body_repeat_with_other_params_is_rejected(self):
+		post = lambda amount: Client().post('/commands/', command_json('IDEMPOTENCY_COUNT', amount=amount),
+		                                    content_type='application/json', HTTP_X_IDEMPOTENCY_KEY='key-1')
+		self.assertEqual(post(1).status_code, 200)
+		self.assertEqual(post(1)['Idempotent-Replayed'], 'true')
+		self.assertEqual(post(2).status_code, 422)
+
+	def test_repeat_while_running_is_turned_away_at_once(self):
+		self.assertEqual(send(amount=1, repeat=True).status_code, 200)
+		[(status, waited)] = repeats
+		self.assertEqual(status, 409)
+		self.assertLess(waited, 1)
+		self.assertEqual(runs, [1])
+
+	def test_other_keys_and_commands_run(self):
+		send(amount=1)
+		send(amount=1, key='key-2')
+		self.assertEqual(runs, [1, 1])
+
+	def test_streamed_responses_are_not_stored(self):
+		for _ in range(2):
+			response = send('IDEMPOTENCY_STREAM')
+			read_json(response)
+		self.assertEqual(runs, [None, None])
+
+	def test_rejections_are_replayed(self):
+		self.assertEqual(send(amount='x').status_code, 400)
+		response = send(amount='x')
+		self.assertEqual(response.status_code, 400)
+		self.assertEqual(response['Idempotent-Replayed'], 'true')
@@ -0,0 +1,90 @@
+from commands.base import *
+from commands.jobs import JobBackend
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from .utils import post_command, read_json
+import commands.jobs, json
+
+
+class DeferredJobBackend(JobBackend):
+	"""
+		Holds on to jobs until the test runs them, after the request that started them is over.
+	"""
+
+	jobs = []
+
+	def submit(self, func):
+		self.jobs.append(func)
+
+	@classmethod
+	def run_all(cls):
+		while cls.jobs:
+			cls.jobs.pop(0)()
+
+
+class ReportHandler(CommandHandlerBase):
+	command_name = 'JOBS_REPORT'
+	background = True
+	params = [Param('title', Types.STRING), Param('attachment', Types.FILE, required=False)]
+
+	def handle(self, data):
+		content = data.attachment.read().decode('utf-8') if data.attachment else None
+		return self.success({'title': data.title, 'attachment': content})
+
+
+class FailingHandler(CommandHandlerBase):
+	command_name = 'JOBS_FAILING'
+	background = True
+
+	def handle(self, data):
+		raise RuntimeError('failed')
+
+
+@override_settings(COMMANDS_JOB_BACKEND='tests.test_jobs.DeferredJobBackend')
+class JobTests(TestCase):
+
+	def setUp(self):
+		cache.clear()
+		commands.jobs._backend = None
+		DeferredJobBackend.jobs = []
+		self.client = Client()
+		self.client.force_login(User.objects.create_user('owner'))
+
+	def tearDown(self):
+		commands.jobs._backend = None
+
+	def start(self, data):
+		response = self.client.post('/commands/', data)
+		self.assertEqual(response.status_code, 202)
+		response.close()
+		return read_json(response)['job']
+
+	def status(self, job_id, client=None):
+		return (client or self.client).get('/commands/jobs/{0}/'.format(job_id))
+
+	def test_job_runs_after_the_request_with_its_upload(self):
+		job_id = self.start({'command': json.dumps('JOBS_REPORT'), 'title': json.dumps('weekly'),
+		                     'attachment': SimpleUploadedFile('notes.txt', b'attached')})
+		self.assertEqual(self.status(job_id).status_code, 202)
+
+		DeferredJobBackend.run_all()
+		response = self.status(job_id)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(read_json(response), {'result': {'title': 'weekly', 'attachment': 'attached'}})
+
+	def test_bad_params_are_rejected_before_the_job(self):
+		response = post_command('JOBS_REPORT', client=self.client, title=3)
+		self.assertEqual(response.status_code, 400)
+		self.assertEqual(DeferredJobBackend.jobs, [])
+
+	def test_failed_job(self):
+		job_id = self.start({'command': json.dumps('JOBS_FAILING')})
+		with self.assertLogs('commands.jobs', 'ERROR'):
+			DeferredJobBackend.run_all()
+		self.assertEqual(self.status(job_id).status_code, 500)
+
+	def test_jobs_belong_to_their_user(self):
+		job_id = self.start({'command': json.dumps('JOBS_REPORT'), 'title': json.dumps('private')})
+		self.assertEqual(self.status(job_id, Client()).status_code, 404)
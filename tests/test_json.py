@@ -0,0 +1,57 @@
+from commands.base import *
+from django.test import TestCase, override_settings
+from .utils import command_json, read_json
+import commands.codecs, json
+
+
+class CountingCodec(object):
+	calls = 0
+
+	@classmethod
+	def loads(cls, content):
+		cls.calls += 1
+		return json.loads(content)
+
+	dumps = staticmethod(json.dumps)
+
+
+class SumHandler(CommandHandlerBase):
+	command_name = 'JSON_SUM'
+	params = [Param('values', Types.INTEGER_ARRAY), Param('label', Types.STRING, required=False)]
+
+	def handle(self, data):
+		return self.success({'sum': sum(data.values), 'label': data.label})
+
+
+class JsonRequestTests(TestCase):
+
+	def post(self, body):
+		return self.client.post('/commands/', body, content_type='application/json')
+
+	def test_json_body(self):
+		response = self.post(command_json('JSON_SUM', values=[1, 2, 3], label='total'))
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(read_json(response), {'result': {'sum': 6, 'label': 'total'}})
+
+	def test_json_body_is_type_checked(self):
+		response = self.post(command_json('JSON_SUM', values=[1, 'two']))
+		self.assertEqual(read_json(response), {'error': 'The following parameters were of the wrong type: values'})
+
+	def test_malformed_json_body(self):
+		self.assertEqual(self.post('{"command": ').status_code, 400)
+		self.assertEqual(self.post('[]').status_code, 400)
+		self.assertEqual(self.post('{"params": {}}').status_code, 400)
+
+	def test_malformed_command_field(self):
+		self.assertEqual(self.client.post('/commands/', {'command': '"JSON_'}).status_code, 400)
+		self.assertEqual(self.client.post('/commands/', {'command': '["JSON_SUM"]'}).status_code, 400)
+
+	def test_codec_setting(self):
+		try:
+			with override_settings(COMMANDS_JSON_CODEC='tests.test_json.CountingCodec'):
+				commands.codecs._codec = None
+				response = self.post(command_json('JSON_SUM', values=[1]))
+				self.assertEqual(response.status_code, 200)
+				self.assertEqual(CountingCodec.calls, 1)
+		finally:
+			commands.codecs._codec = None
@@ -0,0 +1,84 @@
+from commands.base import *
+from commands.limits import RUNNING_PREFIX
+from django.core.cache import cache
+from django.test import TestCase
+from .utils import post_command, read_json
+
+
+class SlowStreamHandler(CommandHandlerBase):
+	command_name = 'LIMITS_STREAM'
+	max_concurrency = 1
+	retry_after = 2
+
+	def handle(self, data):
+		return self.stream(iter([1, 2, 3]))
+
+
+class SharedHandler(CommandHandlerBase):
+	command_name = 'LIMITS_SHARED'
+	max_concurrency = 1
+	shared_limits = True
+
+	def handle(self, data):
+		return self.success(cache.get(RUNNING_PREFIX + self.command_name))
+
+
+class RateHandler(CommandHandlerBase):
+	command_name = 'LIMITS_RATE'
+	rate_limit = (2, 60)
+
+	def handle(self, data):
+		return self.success(None)
+
+
+class LimitTests(TestCase):
+
+	def setUp(self):
+		cache.clear()
+
+	def test_streamed_response_holds_its_slot_until_sent(self):
+		first = post_command('LIMITS_STREAM')
+		self.assertEqual(first.status_code, 200)
+
+		second = post_command('LIMITS_STREAM')
+		self.assertEqual(second.status_code, 503)
+		self.assertEqual(second['Retry-After'], '2')
+
+		b''.join(first.streaming_content)
+		self.assertEqual(post_command('LIMITS_STREAM').status_code, 200)
+
+	def test_closing_a_stream_early_releases_its_slot(self):
+		first = post_command('LIMITS_STREAM')
+		first.close()
+		response = post_command('LIMITS_STREAM')
+		self.assertEqual(response.status_code, 200)
+		response.close()
+
+	def test_rate_limit(self):
+		self.assertEqual(post_command('LIMITS_RATE').status_code, 200)
+		self.assertEqual(post_command('LIMITS_RATE').status_code, 200)
+		response = post_command('LIMITS_RATE')
+		self.assertEqual(response.status_code, 429)
+		self.assertTrue(int(response['Retry-After']) >= 1)
+
+	def test_shared_count_is_released(self):
+		self.assertEqual(read_json(post_command('LIMITS_SHARED')), {'result': 1})
+		self.assertEqual(cache.get(RUNNING_PREFIX + 'LIMITS_SHARED'), 0)
+
+	def test_shared_count_recovers_from_drift(self):
+		key = RUNNING_PREFIX + 'LIMITS_SHARED'
+		cache.set(key, -3)
+		self.assertEqual(read_json(post_command('LIMITS_SHARED')), {'result': 1})
+		self.assertEqual(cache.get(key), 0)
+
+		# a count that expired while the command ran doesn't go below zero when it's released
+		limiter = SharedHandler.plan.limiter
+		self.assertIsNone(limiter.acquire())
+		cache.delete(key)
+		limiter.release()
+		self.assertIn(cache.get(key), (None, 0))
+
+	def test_shared_count_over_the_limit(self):
+		cache.set(RUNNING_PREFIX + 'LIMITS_SHARED', 1)
+		self.assertEqual(post_command('LIMITS_SHARED').status_code, 503)
+		self.assertEqual(cache.get(RUNNING_PREFIX + 'LIMITS_SHARED'), 1)
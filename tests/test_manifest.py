@@ -0,0 +1,68 @@
+from commands.base import *
+from commands.manifest import ManifestEntry, read_manifest
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import TestCase
+from .test_dispatch import OrderHandler
+from .utils import post_command, read_json
+import datetime, json, os, sys, tempfile
+
+DEFINITION = {'name': 'MANIFEST_LAZY', 'params': [{'name': 'n', 'type': 'integer', 'required': True}]}
+
+
+class DatedHandler(CommandHandlerBase):
+	command_name = 'MANIFEST_DATED'
+	params = [Param('since', Types.STRING, required=False, default=datetime.date(2020, 1, 2))]
+
+	def handle(self, data):
+		return self.success(None)
+
+
+class ManifestTests(TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.path = os.path.join(self.directory.name, 'manifest.json')
+		sys.modules.pop('tests.lazy_handlers', None)
+
+	def tearDown(self):
+		self.directory.cleanup()
+		CommandHandlerBase._registry.pop('MANIFEST_LAZY', None)
+		CommandHandlerBase._registry_version += 1
+
+	def add_entry(self, module='tests.lazy_handlers'):
+		with open(self.path, 'w') as manifest:
+			json.dump({'commands': {'MANIFEST_LAZY': {'module': module, 'auth_required': False, 'permissions': [],
+			                                          'custom_checks': False, 'definition': DEFINITION}}}, manifest)
+
+		registry = CommandHandlerBase._registry
+		for entry in read_manifest(self.path, registry):
+			registry[entry.command_name] = entry
+		CommandHandlerBase._registry_version += 1
+
+	def test_listing_does_not_import_the_handler(self):
+		self.add_entry()
+		names = [definition['name'] for definition in read_json(self.client.get('/commands/available/'))['results']]
+		self.assertIn('MANIFEST_LAZY', names)
+		self.assertNotIn('tests.lazy_handlers', sys.modules)
+
+	def test_dispatch_imports_the_handler(self):
+		self.add_entry()
+		response = post_command('MANIFEST_LAZY', n=1)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(read_json(response), {'result': 2})
+		self.assertIn('tests.lazy_handlers', sys.modules)
+		self.assertNotIsInstance(CommandHandlerBase._registry['MANIFEST_LAZY'], ManifestEntry)
+
+	def test_out_of_date_manifest(self):
+		self.add_entry(module='tests.utils')
+		with self.assertRaises(ImproperlyConfigured):
+			CommandHandlerBase._registry['MANIFEST_LAZY'].load()
+
+	def test_management_command_writes_every_handler(self):
+		call_command('commands_manifest', self.path, stdout=open(os.devnull, 'w'))
+		with open(self.path) as manifest:
+			entries = json.load(manifest)['commands']
+		self.assertEqual(entries[OrderHandler.command_name]['module'], OrderHandler.__module__)
+		self.assertEqual(entries[OrderHandler.command_name]['definition'], OrderHandler.to_definition())
+		self.assertEqual(entries[DatedHandler.command_name]['definition']['params'][0]['default'], '2020-01-02')
@@ -0,0 +1,70 @@
+from commands.base import *
+from django.test import TestCase
+from .utils import post_command, read_json
+
+effects = []
+
+
+class EchoHandler(CommandHandlerBase):
+	command_name = 'PARAMS_ECHO'
+	params = [Param('a', Types.STRING), Param('b', Types.INTEGER, required=False), Param('c', Types.FLOAT_ARRAY, required=False)]
+
+	def handle(self, data):
+		effects.append(data.a)
+		data.seen = True
+		try:
+			return self.success({'a': data.a, 'b': data.b, 'seen': data.seen})
+		except ValueError:
+			return self.success('swallowed')
+
+
+class OrderHandler(CommandHandlerBase):
+	command_name = 'PARAMS_ORDER'
+	params = [Param('order', Types.OBJECT, schema=[
+		Param('lines', Types.OBJECT_ARRAY, schema=[Param('product', Types.STRING), Param('quantity', Types.INTEGER, required=False)])
+	])]
+
+	def handle(self, data):
+		return self.success(data.order)
+
+
+class ParamTests(TestCase):
+
+	def setUp(self):
+		effects.clear()
+
+	def test_data_accepts_other_attributes(self):
+		response = post_command('PARAMS_ECHO', a='x', b=1)
+		self.assertEqual(read_json(response), {'result': {'a': 'x', 'b': 1, 'seen': True}})
+
+	def test_bad_param_is_rejected_before_handle(self):
+		response = post_command('PARAMS_ECHO', a='x', b='not a number')
+		self.assertEqual(response.status_code, 400)
+		self.assertEqual(read_json(response), {'error': 'The following parameters were of the wrong type: b'})
+		self.assertEqual(effects, [])
+
+	def test_unread_bad_param_is_rejected(self):
+		response = post_command('PARAMS_ECHO', a='x', c=['not', 'floats'])
+		self.assertEqual(response.status_code, 400)
+		self.assertEqual(effects, [])
+
+	def test_every_bad_param_is_reported(self):
+		response = post_command('PARAMS_ECHO', a=1, b='x', c='y')
+		self.assertEqual(read_json(response), {'error': 'The following parameters were of the wrong type: a, b, c'})
+
+	def test_malformed_json_is_a_wrong_type(self):
+		response = self.client.post('/commands/', {'command': '"PARAMS_ECHO"', 'a': '{"unterminated'})
+		self.assertEqual(read_json(response), {'error': 'The following parameters were of the wrong type: a'})
+
+	def test_missing_params_are_reported_first(self):
+		response = post_command('PARAMS_ECHO', b='x')
+		self.assertEqual(read_json(response), {'error': 'The following parameters were missing: a'})
+
+	def test_schema(self):
+		order = {'lines': [{'product': 'apple', 'quantity': 2}, {'product': 'pear'}]}
+		response = post_command('PARAMS_ORDER', order=order)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(read_json(response)['result']['lines'][0], {'product': 'apple', 'quantity': 2})
+
+		response = post_command('PARAMS_ORDER', order={'lines': [{'product': 'apple'}, {'product': 3}]})
+		self.assertEqual(read_json(response), {'error': 'The following parameters were of the wrong type: order.lines[1].product'})
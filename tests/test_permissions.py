@@ -0,0 +1,118 @@
+from commands.base import *
+from commands.services import CommandService
+from django.contrib.auth.models import AnonymousUser, Permission, User
+from django.test import Client, RequestFactory, TestCase, override_settings
+from .utils import command_form, post_command, read_json
+
+
+class PublicHandler(CommandHandlerBase):
+	command_name = 'PERMISSIONS_PUBLIC'
+
+	def handle(self, data):
+		return self.success('public')
+
+
+class MembersHandler(CommandHandlerBase):
+	command_name = 'PERMISSIONS_MEMBERS'
+	auth_required = True
+
+	def handle(self, data):
+		return self.success('members')
+
+
+class StaffHandler(CommandHandlerBase):
+	command_name = 'PERMISSIONS_STAFF'
+	auth_required = True
+	permissions = ['auth.view_user']
+
+	def handle(self, data):
+		return self.success('staff')
+
+
+class TrackingUser(AnonymousUser):
+	"""
+		An anonymous user that counts how often it is asked about itself.
+	"""
+
+	def __init__(self):
+		self.reads = []
+
+	@property
+	def is_authenticated(self):
+		self.reads.append('is_authenticated')
+		return False
+
+	def get_all_permissions(self, obj=None):
+		self.reads.append('get_all_permissions')
+		return set()
+
+
+class RuleBackend(object):
+	"""
+		An auth backend that grants permissions by rule, answering has_perm
+		without listing anything from get_all_permissions.
+	"""
+
+	def authenticate(self, request, **credentials):
+		return None
+
+	def has_perm(self, user_obj, perm, obj=None):
+		return user_obj.username == 'ruled' and perm == 'auth.view_user'
+
+
+class PermissionTests(TestCase):
+
+	def setUp(self):
+		self.user = User.objects.create_user('member', password='secret')
+		self.client = Client()
+
+	def login(self, *permissions):
+		for codename in permissions:
+			self.user.user_permissions.add(Permission.objects.get(codename=codename))
+		self.client.force_login(User.objects.get(pk=self.user.pk))
+
+	def test_public_command_never_reads_the_user(self):
+		request = RequestFactory().post('/', command_form('PERMISSIONS_PUBLIC'))
+		request.user = TrackingUser()
+		response = CommandService().dispatch(request)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(request.user.reads, [])
+
+	def test_auth_required(self):
+		self.assertEqual(post_command('PERMISSIONS_MEMBERS', client=self.client).status_code, 401)
+		self.login()
+		self.assertEqual(post_command('PERMISSIONS_MEMBERS', client=self.client).status_code, 200)
+
+	def test_permissions_required(self):
+		self.login()
+		self.assertEqual(post_command('PERMISSIONS_STAFF', client=self.client).status_code, 403)
+		self.login('view_user')
+		self.assertEqual(post_command('PERMISSIONS_STAFF', client=self.client).status_code, 200)
+
+	def test_available_definitions_follow_the_user(self):
+		names = lambda: {definition['name'] for definition in read_json(self.client.get('/commands/available/'))['results']}
+
+		self.assertIn('PERMISSIONS_PUBLIC', names())
+		self.assertNotIn('PERMISSIONS_MEMBERS', names())
+
+		self.login()
+		self.assertIn('PERMISSIONS_MEMBERS', names())
+		self.assertNotIn('PERMISSIONS_STAFF', names())
+
+		self.login('view_user')
+		self.assertIn('PERMISSIONS_STAFF', names())
+
+	@override_settings(AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.ModelBackend', 'tests.test_permissions.RuleBackend'])
+	def test_backends_that_only_answer_has_perm(self):
+		ruled, other = Client(), Client()
+		ruled.force_login(User.objects.create_user('ruled'), backend='django.contrib.auth.backends.ModelBackend')
+		other.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+
+		self.assertEqual(post_command('PERMISSIONS_STAFF', client=ruled).status_code, 200)
+		self.assertEqual(post_command('PERMISSIONS_STAFF', client=other).status_code, 403)
+
+		# both users have the same listed permissions, so the cached definitions mustn't be shared between them
+		names = lambda client: {definition['name'] for definition in read_json(client.get('/commands/available/'))['results']}
+		self.assertIn('PERMISSIONS_STAFF', names(ruled))
+		self.assertNotIn('PERMISSIONS_STAFF', names(other))
+		self.assertIn('PERMISSIONS_STAFF', names(ruled))
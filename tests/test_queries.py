@@ -0,0 +1,127 @@
+from commands.base import *
+from commands.testing import assert_query_budget
+from django.contrib.auth.models import Group, Permission
+from django.test import AsyncClient, TestCase, override_settings
+from .test_jobs import DeferredJobBackend
+from .utils import command_form, post_command, read_json
+from asgiref.sync import sync_to_async
+import commands.jobs
+
+
+# makes one query per group, the N+1 pattern
+def count_members():
+	return [group.user_set.count() for group in Group.objects.all()]
+
+
+class ListHandler(CommandHandlerBase):
+	command_name = 'QUERIES_LIST'
+	max_queries = 2
+	max_repeated_queries = 2
+
+	def handle(self, data):
+		return self.success(count_members())
+
+
+class AsyncListHandler(CommandHandlerBase):
+	command_name = 'QUERIES_ASYNC_LIST'
+	max_queries = 2
+
+	async def handle(self, data):
+		return self.success(await sync_to_async(count_members)())
+
+
+class StreamHandler(CommandHandlerBase):
+	command_name = 'QUERIES_STREAM'
+	max_queries = 2
+
+	def handle(self, data):
+		return self.stream(group.user_set.count() for group in Group.objects.all())
+
+
+class ValidatedHandler(CommandHandlerBase):
+	command_name = 'QUERIES_VALIDATED'
+	params = [Param('name', Types.STRING), Param('other', Types.STRING)]
+	max_queries = 1
+
+	# the validators run on threads with connections of their own, so they read a table the tests don't write to
+	@validator('name', 'The name is taken.', concurrent=True)
+	def validate_name(name):
+		return not Permission.objects.filter(codename=name).exists()
+
+	@validator('other', 'The name is taken.', concurrent=True)
+	def validate_other(other):
+		return not Permission.objects.filter(codename=other).exists()
+
+	def handle(self, data):
+		return self.success(None)
+
+
+class BackgroundListHandler(CommandHandlerBase):
+	command_name = 'QUERIES_BACKGROUND_LIST'
+	background = True
+	max_queries = 2
+
+	def handle(self, data):
+		return self.success(count_members())
+
+
+class QueryBudgetTests(TestCase):
+
+	@classmethod
+	def setUpTestData(cls):
+		Group.objects.bulk_create([Group(name='group {0}'.format(index)) for index in range(3)])
+
+	def test_over_budget(self):
+		with self.assertRaisesRegex(AssertionError, 'made 4 queries, over its budget of 2'):
+			assert_query_budget('QUERIES_LIST')
+
+	def test_repeated_query_is_reported(self):
+		with self.assertRaisesRegex(AssertionError, 'made the same query 3 times, which is likely an N\\+1'):
+			assert_query_budget('QUERIES_LIST')
+
+	def test_within_budget(self):
+		Group.objects.exclude(name='group 0').delete()
+		response, queries = assert_query_budget('QUERIES_LIST')
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(queries.count, 2)
+
+	def test_async_handler(self):
+		with self.assertRaisesRegex(AssertionError, 'made 4 queries'):
+			assert_query_budget('QUERIES_ASYNC_LIST')
+
+	def test_streamed_response_is_counted_once_sent(self):
+		with self.assertRaisesRegex(AssertionError, 'made 4 queries'):
+			assert_query_budget('QUERIES_STREAM')
+
+	def test_concurrent_validators_are_counted(self):
+		with self.assertRaisesRegex(AssertionError, 'made 2 queries'):
+			assert_query_budget('QUERIES_VALIDATED', {'name': 'a', 'other': 'b'})
+
+	def test_budget_is_logged_by_default(self):
+		with self.assertLogs('commands.queries', 'WARNING') as logs:
+			self.assertEqual(post_command('QUERIES_LIST').status_code, 200)
+		self.assertIn('QUERIES_LIST made 4 queries', logs.output[0])
+
+	async def test_async_dispatch_is_counted(self):
+		with self.assertLogs('commands.queries', 'WARNING') as logs:
+			response = await AsyncClient().post('/async/', command_form('QUERIES_ASYNC_LIST'))
+		self.assertEqual(response.status_code, 200)
+		self.assertIn('QUERIES_ASYNC_LIST made 4 queries', logs.output[0])
+
+	@override_settings(DEBUG=True)
+	def test_queries_are_added_to_the_meta_in_debug(self):
+		with self.assertLogs('commands.queries', 'WARNING'):
+			content = read_json(post_command('QUERIES_LIST'))
+		self.assertEqual(content['queries']['count'], 4)
+		self.assertEqual(content['queries']['repeated'][0]['count'], 3)
+
+	@override_settings(COMMANDS_JOB_BACKEND='tests.test_jobs.DeferredJobBackend')
+	def test_background_jobs_are_counted(self):
+		commands.jobs._backend, DeferredJobBackend.jobs = None, []
+		try:
+			self.assertEqual(post_command('QUERIES_BACKGROUND_LIST').status_code, 202)
+			with self.assertLogs('commands.queries', 'WARNING') as logs:
+				DeferredJobBackend.run_all()
+		finally:
+			commands.jobs._backend = None
+		self.assertIn('QUERIES_BACKGROUND_LIST made 4 queries', logs.output[0])
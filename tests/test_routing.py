@@ -0,0 +1,134 @@
+from commands.base import *
+from django.contrib.auth.models import Group
+from django.test import Client, TestCase, override_settings
+from .utils import post_command, read_json
+import json, threading
+
+validator_threads = []
+
+
+# the results of an ndjson response
+def read_lines(response):
+	return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+
+class CountHandler(CommandHandlerBase):
+	command_name = 'ROUTING_COUNT'
+	read_only = True
+
+	def handle(self, data):
+		return self.success(Group.objects.count())
+
+
+class StreamCountHandler(CommandHandlerBase):
+	command_name = 'ROUTING_STREAM_COUNT'
+	read_only = True
+
+	def handle(self, data):
+		return self.stream(Group.objects.count() for _ in range(2))
+
+
+class CreateHandler(CommandHandlerBase):
+	command_name = 'ROUTING_CREATE'
+	params = [Param('name', Types.STRING), Param('fail', Types.BOOLEAN, required=False)]
+	atomic = True
+
+	@validator('name', 'The name is taken.', concurrent=True)
+	def validate_unique(name):
+		validator_threads.append(threading.get_ident())
+		return not Group.objects.filter(name=name).exists()
+
+	@validator('name', 'The name is too long.', concurrent=True)
+	def validate_length(name):
+		validator_threads.append(threading.get_ident())
+		return len(name) < 20
+
+	def handle(self, data):
+		Group.objects.create(name=data.name)
+		return self.error('Failed.') if data.fail else self.success(None)
+
+
+class ReadOnlyWriteHandler(CommandHandlerBase):
+	command_name = 'ROUTING_READ_ONLY_WRITE'
+	read_only = True
+
+	def handle(self, data):
+		return self.success(Group.objects.create(name='written').pk)
+
+
+class StreamCreateHandler(CommandHandlerBase):
+	command_name = 'ROUTING_STREAM_CREATE'
+	params = [Param('fail_at', Types.INTEGER, required=False)]
+	atomic = True
+
+	def handle(self, data):
+		return self.stream(self.create(data.fail_at))
+
+	# creates a group for each item that is sent, raising at fail_at
+	def create(self, fail_at):
+		for index in range(3):
+			if index == fail_at:
+				raise ValueError('failed while streaming')
+			yield Group.objects.create(name='streamed {0}'.format(index)).pk
+
+
+@override_settings(COMMANDS_READ_REPLICA='replica')
+class RoutingTests(TestCase):
+	databases = {'default', 'replica'}
+
+	def setUp(self):
+		validator_threads.clear()
+		Group.objects.using('replica').create(name='on the replica')
+
+	def test_read_only_command_reads_the_replica(self):
+		self.assertEqual(read_json(post_command('ROUTING_COUNT')), {'result': 1})
+		with self.settings(COMMANDS_READ_REPLICA=None):
+			self.assertEqual(read_json(post_command('ROUTING_COUNT')), {'result': 0})
+
+	def test_streamed_reads_stay_on_the_replica(self):
+		self.assertEqual(read_lines(post_command('ROUTING_STREAM_COUNT')), [1, 1])
+
+	def test_writes_go_to_the_primary(self):
+		post_command('ROUTING_READ_ONLY_WRITE')
+		self.assertTrue(Group.objects.using('default').filter(name='written').exists())
+		self.assertFalse(Group.objects.using('replica').filter(name='written').exists())
+
+	@override_settings(COMMANDS_STICKY_SECONDS=5)
+	def test_session_reads_its_writes_after_a_write(self):
+		client = Client()
+		self.assertEqual(read_json(post_command('ROUTING_COUNT', client=client)), {'result': 1})
+		post_command('ROUTING_CREATE', client=client, name='mine')
+		self.assertEqual(read_json(post_command('ROUTING_COUNT', client=client)), {'result': 1})
+		self.assertEqual(Group.objects.using('default').count(), 1)
+		self.assertEqual(read_json(post_command('ROUTING_COUNT')), {'result': 1})
+		Group.objects.using('replica').all().delete()
+		self.assertEqual(read_json(post_command('ROUTING_COUNT', client=client)), {'result': 1})
+		self.assertEqual(read_json(post_command('ROUTING_COUNT')), {'result': 0})
+
+
+class TransactionTests(TestCase):
+
+	def setUp(self):
+		validator_threads.clear()
+
+	def test_atomic_command_commits(self):
+		self.assertEqual(post_command('ROUTING_CREATE', name='kept').status_code, 200)
+		self.assertTrue(Group.objects.filter(name='kept').exists())
+
+	def test_error_response_rolls_back(self):
+		self.assertEqual(post_command('ROUTING_CREATE', name='dropped', fail=True).status_code, 400)
+		self.assertFalse(Group.objects.filter(name='dropped').exists())
+
+	def test_validators_run_in_the_transaction(self):
+		post_command('ROUTING_CREATE', name='validated')
+		self.assertEqual(validator_threads, [threading.get_ident()] * 2)
+
+	def test_streamed_writes_are_committed_with_the_command(self):
+		self.assertEqual(len(read_lines(post_command('ROUTING_STREAM_CREATE'))), 3)
+		self.assertEqual(Group.objects.filter(name__startswith='streamed').count(), 3)
+
+	def test_stream_that_raises_rolls_back(self):
+		response = post_command('ROUTING_STREAM_CREATE', fail_at=2)
+		with self.assertRaisesMessage(ValueError, 'failed while streaming'):
+			b''.join(response.streaming_content)
+		self.assertEqual(Group.objects.filter(name__startswith='streamed').count(), 0)
@@ -0,0 +1,67 @@
+from commands.base import *
+from commands.schemas import SchemaError, compile_schema
+from django.test import SimpleTestCase, TestCase
+from .utils import post_command, read_json
+
+SHIPMENT = Param('shipment', Types.OBJECT, schema=[
+	Param('address', Types.STRING),
+	Param('tags', Types.STRING_ARRAY, required=False, default=[]),
+	Param('parcels', Types.OBJECT_ARRAY, required=False, schema=[
+		Param('weights', Types.FLOAT_ARRAY),
+		Param('fragile', Types.BOOLEAN, required=False, default=False)
+	])
+])
+
+
+class ShipmentHandler(CommandHandlerBase):
+	command_name = 'SCHEMAS_SHIPMENT'
+	params = [SHIPMENT]
+
+	def handle(self, data):
+		return self.success(data.shipment)
+
+
+class CompiledSchemaTests(SimpleTestCase):
+
+	def setUp(self):
+		self.check = compile_schema(SHIPMENT)
+
+	def test_fills_defaults_and_casts(self):
+		value = self.check({'address': 'here', 'parcels': [{'weights': [1, 2]}]})
+		self.assertEqual(value, {'address': 'here', 'tags': [], 'parcels': [{'weights': [1.0, 2.0], 'fragile': False}]})
+
+	def test_defaults_are_not_shared(self):
+		first, second = self.check({'address': 'a'}), self.check({'address': 'b'})
+		first['tags'].append('x')
+		self.assertEqual(second['tags'], [])
+
+	def test_error_paths(self):
+		cases = [
+			([], ''),
+			({}, '.address'),
+			({'address': 'here', 'tags': ['a', 1]}, '.tags'),
+			({'address': 'here', 'parcels': {}}, '.parcels'),
+			({'address': 'here', 'parcels': [{'weights': [1]}, {'weights': ['heavy']}]}, '.parcels[1].weights'),
+			({'address': 'here', 'parcels': [{'weights': [], 'fragile': 'yes'}]}, '.parcels[0].fragile')
+		]
+		for value, path in cases:
+			with self.subTest(path=path), self.assertRaises(SchemaError) as context:
+				self.check(value)
+			self.assertEqual(context.exception.path, path)
+
+
+class SchemaDispatchTests(TestCase):
+
+	def test_valid_value(self):
+		response = post_command('SCHEMAS_SHIPMENT', shipment={'address': 'here', 'parcels': [{'weights': [3]}]})
+		self.assertEqual(read_json(response), {'result': {'address': 'here', 'tags': [], 'parcels': [{'weights': [3.0], 'fragile': False}]}})
+
+	def test_mismatch_is_located(self):
+		response = post_command('SCHEMAS_SHIPMENT', shipment={'address': 'here', 'parcels': [{'weights': ['x']}]})
+		self.assertEqual(response.status_code, 400)
+		self.assertEqual(read_json(response), {'error': 'The following parameters were of the wrong type: shipment.parcels[0].weights'})
+
+	def test_definition_includes_the_schema(self):
+		[definition] = ShipmentHandler.to_definition()['params']
+		self.assertEqual([field['name'] for field in definition['schema']], ['address', 'tags', 'parcels'])
+		self.assertEqual([field['name'] for field in definition['schema'][2]['schema']], ['weights', 'fragile'])
@@ -0,0 +1,106 @@
+from commands.base import *
+from commands.compression import choose_encoding, parse_accept_encoding
+from decimal import Decimal
+from django.test import SimpleTestCase, TestCase, override_settings
+from .utils import command_form, post_command, read_json
+import commands.serializers, datetime, gzip, json, uuid
+
+
+# a custom serializer chosen by dotted path, which returns str rather than bytes
+def upper_serializer(obj):
+	return json.dumps(obj).upper()
+
+
+class ValuesHandler(CommandHandlerBase):
+	command_name = 'SERIALIZATION_VALUES'
+
+	def handle(self, data):
+		return self.success({
+			'when': datetime.datetime(2020, 1, 2, 3, 4, 5),
+			'amount': Decimal('1.50'),
+			'id': uuid.UUID(int=1)
+		})
+
+
+class LargeHandler(CommandHandlerBase):
+	command_name = 'SERIALIZATION_LARGE'
+	compress = True
+	params = [Param('size', Types.INTEGER)]
+
+	def handle(self, data):
+		return self.success('x' * data.size)
+
+
+class StreamHandler(CommandHandlerBase):
+	command_name = 'SERIALIZATION_STREAM'
+	compress = True
+
+	def handle(self, data):
+		return self.stream(iter(['x' * 2048]))
+
+
+class SerializerTests(TestCase):
+
+	def setUp(self):
+		commands.serializers._serializer = None
+
+	def tearDown(self):
+		commands.serializers._serializer = None
+
+	def test_default_serializer(self):
+		response = post_command('SERIALIZATION_VALUES')
+		self.assertEqual(read_json(response), {'result': {
+			'when': '2020-01-02T03:04:05',
+			'amount': '1.50',
+			'id': '00000000-0000-0000-0000-000000000001'
+		}})
+
+	@override_settings(COMMANDS_SERIALIZER='tests.test_serialization.upper_serializer')
+	def test_custom_serializer(self):
+		response = post_command('SERIALIZATION_LARGE', size=2)
+		self.assertEqual(read_json(response), {'RESULT': 'XX'})
+
+
+class CompressionTests(TestCase):
+
+	def post(self, command_name, encoding='gzip', **params):
+		return self.client.post('/commands/', command_form(command_name, **params), HTTP_ACCEPT_ENCODING=encoding)
+
+	def test_large_response_is_compressed(self):
+		response = self.post('SERIALIZATION_LARGE', size=4096)
+		self.assertEqual(response['Content-Encoding'], 'gzip')
+		self.assertEqual(response['Content-Length'], str(len(response.content)))
+		self.assertIn('Accept-Encoding', response['Vary'])
+		self.assertEqual(json.loads(gzip.decompress(response.content)), {'result': 'x' * 4096})
+
+	def test_small_response_is_left_alone(self):
+		response = self.post('SERIALIZATION_LARGE', size=10)
+		self.assertFalse(response.has_header('Content-Encoding'))
+
+	def test_client_that_refuses_every_encoding(self):
+		response = self.post('SERIALIZATION_LARGE', encoding='gzip;q=0, identity', size=4096)
+		self.assertFalse(response.has_header('Content-Encoding'))
+		self.assertIn('Accept-Encoding', response['Vary'])
+
+	def test_streamed_response_is_left_alone(self):
+		response = self.post('SERIALIZATION_STREAM')
+		self.assertFalse(response.has_header('Content-Encoding'))
+		self.assertIn(b'x' * 2048, b''.join(response.streaming_content))
+
+	@override_settings(COMMANDS_COMPRESS=True)
+	def test_setting_applies_to_handlers_that_dont_say(self):
+		self.assertFalse(self.post('SERIALIZATION_VALUES').has_header('Content-Encoding'))
+		response = self.post('SERIALIZATION_LARGE', size=4096)
+		self.assertEqual(response['Content-Encoding'], 'gzip')
+
+
+class AcceptEncodingTests(SimpleTestCase):
+
+	def test_parse(self):
+		self.assertEqual(parse_accept_encoding('gzip, br;q=0.5, *;q=0, bad;q=x'), {'gzip': 1.0, 'br': 0.5, '*': 0.0, 'bad': 0.0})
+
+	def test_choose(self):
+		self.assertEqual(choose_encoding('gzip')[0], 'gzip')
+		self.assertEqual(choose_encoding('*')[0], choose_encoding('zstd, br, gzip')[0])
+		self.assertIsNone(choose_encoding(''))
+		self.assertIsNone(choose_encoding('identity'))
@@ -0,0 +1,39 @@
+from commands.base import *
+from commands.mixins import JSON, NDJSON
+from django.test import TestCase
+from .utils import post_command, read_json
+import json
+
+
+class CountHandler(CommandHandlerBase):
+	command_name = 'STREAMING_COUNT'
+	params = [Param('to', Types.INTEGER), Param('format', Types.STRING, required=False)]
+
+	def handle(self, data):
+		items = ({'n': n} for n in range(data.to))
+		return self.stream(items, meta={'total': data.to}, format=data.format or NDJSON, chunk_size=2)
+
+
+class StreamingTests(TestCase):
+
+	def test_ndjson(self):
+		response = post_command('STREAMING_COUNT', to=5)
+		self.assertTrue(response.streaming)
+		self.assertEqual(response['Content-Type'], NDJSON)
+		lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+		self.assertEqual([json.loads(line) for line in lines], [{'n': n} for n in range(5)])
+
+	def test_json_array(self):
+		response = post_command('STREAMING_COUNT', to=3, format=JSON)
+		self.assertEqual(read_json(response), {'results': [{'n': 0}, {'n': 1}, {'n': 2}], 'total': 3})
+
+	def test_empty_json_array(self):
+		response = post_command('STREAMING_COUNT', to=0, format=JSON)
+		self.assertEqual(read_json(response), {'results': [], 'total': 0})
+
+	def test_streams_in_a_batch(self):
+		commands = [{'command': 'STREAMING_COUNT', 'params': {'to': 2}},
+		            {'command': 'STREAMING_COUNT', 'params': {'to': 2, 'format': JSON}}]
+		results = read_json(self.client.post('/commands/batch/', {'commands': json.dumps(commands)}))['results']
+		self.assertEqual(results[0], {'results': [{'n': 0}, {'n': 1}], 'status': 200})
+		self.assertEqual(results[1], {'results': [{'n': 0}, {'n': 1}], 'total': 2, 'status': 200})
@@ -0,0 +1,64 @@
+from commands.base import *
+from commands.signals import command_timed
+from commands.timing import MemorySink, PhaseTimer
+from django.test import TestCase, override_settings
+from .utils import post_command
+import commands.timing
+
+
+class TimedHandler(CommandHandlerBase):
+	command_name = 'TIMING_ECHO'
+	params = [Param('value', Types.STRING)]
+
+	def handle(self, data):
+		return self.success(data.value)
+
+
+@override_settings(COMMANDS_TIMING_SINKS=['commands.timing.MemorySink', 'commands.timing.SignalSink'])
+class TimingTests(TestCase):
+
+	def setUp(self):
+		commands.timing._sinks = None
+		MemorySink.clear()
+
+	def tearDown(self):
+		commands.timing._sinks = None
+
+	def test_every_phase_is_recorded(self):
+		self.assertEqual(post_command('TIMING_ECHO', value='a').status_code, 200)
+
+		[(command_name, phases, total)] = MemorySink.records
+		self.assertEqual(command_name, 'TIMING_ECHO')
+		self.assertEqual([phase for phase, seconds in phases], ['parse', 'load', 'auth', 'params', 'normalize', 'validate', 'handle'])
+		self.assertAlmostEqual(sum(seconds for phase, seconds in phases), total)
+
+	def test_rejected_commands_are_timed_up_to_the_failing_phase(self):
+		self.assertEqual(post_command('TIMING_ECHO', value=1).status_code, 400)
+
+		[(command_name, phases, total)] = MemorySink.records
+		self.assertEqual([phase for phase, seconds in phases], ['parse', 'load', 'auth', 'params'])
+
+	def test_signal_sink(self):
+		received = []
+		handler = lambda sender, **kwargs: received.append(kwargs['command_name'])
+		command_timed.connect(handler)
+		try:
+			post_command('TIMING_ECHO', value='a')
+		finally:
+			command_timed.disconnect(handler)
+		self.assertEqual(received, ['TIMING_ECHO'])
+
+	def test_server_timing_header_is_opt_in(self):
+		self.assertNotIn('Server-Timing', post_command('TIMING_ECHO', value='a'))
+		with self.settings(COMMANDS_SERVER_TIMING=True):
+			header = post_command('TIMING_ECHO', value='a')['Server-Timing']
+		self.assertTrue(header.startswith('parse;dur='))
+		self.assertIn('handle;dur=', header)
+
+
+class PhaseTimerTests(TestCase):
+
+	def test_header(self):
+		timer = PhaseTimer()
+		timer.phases = [('parse', 0.001), ('handle', 0.0125)]
+		self.assertEqual(timer.to_header(), 'parse;dur=1.00, handle;dur=12.50')
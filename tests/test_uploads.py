@@ -0,0 +1,67 @@
+from commands.base import *
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.test import TestCase, override_settings
+from .utils import read_json
+import json
+
+UPLOAD_HANDLERS = (
+	'commands.uploads.CommandUploadHandler',
+	'django.core.files.uploadhandler.MemoryFileUploadHandler',
+	'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+)
+
+
+class UploadHandler(CommandHandlerBase):
+	command_name = 'UPLOADS_CAPPED'
+	params = [Param('capped', Types.FILE, max_size=1024), Param('other', Types.FILE, required=False)]
+
+	def handle(self, data):
+		return self.success({'capped': data.capped.size, 'on_disk': isinstance(data.capped, TemporaryUploadedFile),
+		                     'other': data.other.size if data.other else None})
+
+
+class StreamHandler(CommandHandlerBase):
+	command_name = 'UPLOADS_STREAMED'
+	params = [Param('content', Types.FILE, stream=True)]
+
+	def handle(self, data):
+		return self.success({'length': len(data.content), 'head': bytes(data.content[:3]).decode('ascii')})
+
+
+@override_settings(FILE_UPLOAD_HANDLERS=UPLOAD_HANDLERS)
+class UploadTests(TestCase):
+
+	def post(self, command_name, **files):
+		data = {name: SimpleUploadedFile(name, content) for name, content in files.items()}
+		data['command'] = json.dumps(command_name)
+		return self.client.post('/commands/', data, HTTP_X_COMMAND=command_name)
+
+	def test_under_the_cap_is_written_to_disk(self):
+		response = self.post('UPLOADS_CAPPED', capped=b'x' * 1024, other=b'y' * 10)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(read_json(response), {'result': {'capped': 1024, 'on_disk': True, 'other': 10}})
+
+	def test_over_the_cap_is_rejected(self):
+		response = self.post('UPLOADS_CAPPED', capped=b'x' * (256 * 1024), other=b'y' * 10)
+		self.assertEqual(response.status_code, 413)
+		self.assertEqual(read_json(response), {'error': 'The following parameters were too large: capped'})
+
+	def test_over_the_cap_after_another_file(self):
+		response = self.post('UPLOADS_CAPPED', other=b'y' * 10, capped=b'x' * (256 * 1024))
+		self.assertEqual(response.status_code, 413)
+
+	def test_streamed_file_is_memory_mapped(self):
+		response = self.post('UPLOADS_STREAMED', content=b'abc' + b'x' * 5000)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(read_json(response), {'result': {'length': 5003, 'head': 'abc'}})
+
+	def test_over_the_cap_without_the_header_is_rejected(self):
+		data = {'command': json.dumps('UPLOADS_CAPPED'), 'capped': SimpleUploadedFile('capped', b'x' * 500000)}
+		response = self.client.post('/commands/', data)
+		self.assertEqual(response.status_code, 413)
+		self.assertEqual(read_json(response), {'error': 'The following parameters were too large: capped'})
+
+	def test_requests_without_the_header_use_the_next_handler(self):
+		data = {'command': json.dumps('UPLOADS_CAPPED'), 'capped': SimpleUploadedFile('capped', b'x' * 10)}
+		response = self.client.post('/commands/', data)
+		self.assertEqual(read_json(response)['result']['on_disk'], False)
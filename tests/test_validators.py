@@ -0,0 +1,70 @@
+from commands.base import *
+from django.test import AsyncClient, TestCase
+from .utils import command_form, post_command, read_json
+from unittest import mock
+import threading
+
+# each concurrent validator waits at the barrier, which only opens once both are running at the same time
+barrier = threading.Barrier(2, timeout=5)
+calls = []
+
+
+class SignupHandler(CommandHandlerBase):
+	command_name = 'VALIDATORS_SIGNUP'
+	params = [Param('username', Types.STRING), Param('email', Types.STRING)]
+
+	@validator('username', 'That username is taken.', concurrent=True)
+	def validate_unique(username):
+		barrier.wait()
+		return username != 'taken'
+
+	@validator('email', 'That address can not receive mail.', concurrent=True)
+	def validate_deliverable(email):
+		barrier.wait()
+		return '@' in email
+
+	@validator('username', 'The username is too long.', order=1)
+	def validate_length(username):
+		calls.append(username)
+		return len(username) < 10
+
+	def handle(self, data):
+		return self.success(None)
+
+
+class ConcurrentValidatorTests(TestCase):
+
+	def setUp(self):
+		barrier.reset()
+		calls.clear()
+
+	def test_validators_of_an_order_overlap(self):
+		response = post_command('VALIDATORS_SIGNUP', username='someone', email='someone@example.com')
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(calls, ['someone'])
+
+	def test_errors_keep_their_shape_and_order(self):
+		response = post_command('VALIDATORS_SIGNUP', username='taken', email='nowhere')
+		self.assertEqual(response.status_code, 400)
+		self.assertEqual(read_json(response)['errors'], {
+			'username': ['That username is taken.'],
+			'email': ['That address can not receive mail.']
+		})
+
+	def test_later_orders_wait_for_the_earlier_ones(self):
+		response = post_command('VALIDATORS_SIGNUP', username='someone else', email='nowhere')
+		self.assertEqual(read_json(response)['errors'], {
+			'username': ['The username is too long.'],
+			'email': ['That address can not receive mail.']
+		})
+		self.assertEqual(calls, ['someone else'])
+
+	async def test_validators_overlap_on_the_async_route(self):
+		response = await AsyncClient().post('/async/', command_form('VALIDATORS_SIGNUP', username='someone', email='someone@example.com'))
+		self.assertEqual(response.status_code, 200)
+
+	async def test_async_route_looks_after_the_connections_of_its_threads(self):
+		with mock.patch('commands.base.close_old_connections') as close_old_connections:
+			response = await AsyncClient().post('/async/', command_form('VALIDATORS_SIGNUP', username='someone', email='someone@example.com'))
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(close_old_connections.call_count, 2)
@@ -0,0 +1,59 @@
+from commands.base import CommandHandlerBase
+from commands.services import CommandService
+from django.apps import apps
+from django.test import TestCase, override_settings
+from unittest import mock
+import commands.warmup
+
+
+class WarmUpTests(TestCase):
+
+	def setUp(self):
+		self.service_class = type(CommandService())
+		self.service_class._definitions, self.service_class._definitions_version = {}, None
+		self.service_class._index, self.service_class._index_version = None, None
+		commands.warmup._frozen = False
+
+		gc = mock.patch('commands.warmup.gc')
+		self.gc = gc.start()
+		self.addCleanup(gc.stop)
+
+	def test_builds_the_index_and_definitions_for_every_instance(self):
+		commands.warmup.warm_up()
+		self.assertIsNotNone(self.service_class._index)
+		self.assertEqual(len(self.service_class._definitions), 1)
+
+		# a new instance serves the anonymous definitions without building them again
+		[serialized] = self.service_class._definitions.values()
+		service = self.service_class()
+		with mock.patch.object(self.service_class, 'get_available_definitions', side_effect=AssertionError):
+			self.assertEqual(service.get_serialized_definitions(commands.warmup.anonymous_request()), serialized)
+
+	def test_anonymous_definitions_are_served_to_anonymous_visitors(self):
+		commands.warmup.warm_up()
+		[(etag, content)] = self.service_class._definitions.values()
+		response = self.client.get('/commands/available/')
+		self.assertEqual(response['ETag'], etag)
+
+	def test_does_not_freeze_by_default(self):
+		commands.warmup.warm_up()
+		self.gc.freeze.assert_not_called()
+
+	@override_settings(COMMANDS_GC_FREEZE=True)
+	def test_freezes_when_asked(self):
+		commands.warmup.warm_up()
+		self.gc.collect.assert_called_once_with()
+		self.gc.freeze.assert_called_once_with()
+
+	def test_freeze_only_runs_once(self):
+		commands.warmup.freeze()
+		commands.warmup.freeze()
+		self.gc.freeze.assert_called_once_with()
+
+	def test_app_config_keeps_the_import_times(self):
+		config = apps.get_app_config('commands')
+		with override_settings(COMMANDS_WARM_UP=True), mock.patch('commands.warmup.import_commands_modules', return_value=[('tests', 0.5)]):
+			config.ready()
+		self.addCleanup(setattr, config, 'import_times', ())
+		self.assertEqual(config.import_times, [('tests', 0.5)])
+		self.assertTrue(CommandHandlerBase._registry_populated)
@@ -0,0 +1,7 @@
+from django.urls import include, path
+from commands.views import AsyncCommandHandler
+
+urlpatterns = [
+	path('commands/', include('commands.urls', namespace='commands')),
+	path('async/', AsyncCommandHandler.as_view()),
+]
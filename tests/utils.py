@@ -0,0 +1,23 @@
+from django.test import Client
+import json
+
+
+# the form data for a command, with each param json encoded the way commands.js sends it
+def command_form(command_name, **params):
+	data = {key: json.dumps(value) for key, value in params.items()}
+	data['command'] = json.dumps(command_name)
+	return data
+
+
+# the json body for a command
+def command_json(command_name, **params):
+	return json.dumps({'command': command_name, 'params': params})
+
+
+# posts the command as form data and returns the response
+def post_command(command_name, client=None, path='/commands/', **params):
+	return (client or Client()).post(path, command_form(command_name, **params))
+
+
+def read_json(response):
+	return json.loads(b''.join(response.streaming_content) if response.streaming else response.content)